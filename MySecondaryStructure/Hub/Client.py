@@ -0,0 +1,93 @@
+import json
+import os
+import socket
+import threading
+
+# Address of the server when none is given. A Unix domain socket where the
+# platform has them, a localhost TCP port otherwise.
+if hasattr(socket, "AF_UNIX") and hasattr(os, "getuid"):
+    DEFAULT_ADDRESS = f"/tmp/mss-{os.getuid()}.sock"
+else:
+    DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+def parse_address(address: str):
+    """
+    About
+    ---------------
+    Reads a server address. 'host:port' is a TCP address, anything else is
+    the path of a Unix domain socket.
+    
+    Parameters
+    ---------------
+    address : str
+        The address
+    
+    Returns
+    ---------------
+    int
+        The socket family
+    str or tuple
+        The address in the form 'socket' takes for that family
+    """
+    
+    host, _, port = address.rpartition(":")
+    if host != "" and port.isdigit():
+        return socket.AF_INET, (host, int(port))
+    
+    return socket.AF_UNIX, address
+
+def connect(address: str = DEFAULT_ADDRESS) -> socket.socket:
+    # An open connection to a server made by 'Server.serve'
+    family, socket_address = parse_address(address)
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    connection.connect(socket_address)
+    
+    return connection
+
+def request(requests: list, address: str = DEFAULT_ADDRESS):
+    """
+    About
+    ---------------
+    Sends requests to a server over one connection and gives back its
+    answers as they arrive. Requests are written from a second thread, so the
+    server works on all of them while the answers are read.
+    
+    A request is a dictionary with either 'path' (a file the server can read)
+    or 'pdb' (the text of a file, with an optional 'name' and 'format', 'pdb'
+    or 'cif'), and an optional 'summary' flag (see 'Hub.app.summarize').
+    
+    Parameters
+    ---------------
+    requests : list
+        The requests
+    address : str
+        Address of the server (see 'parse_address')
+    
+    Yields
+    ---------------
+    dict
+        The answer to every request (see 'Output.flat_record'), in the order 
+        of 'requests'
+    """
+    
+    connection = connect(address)
+    
+    def send():
+        try:
+            for item in requests:
+                connection.sendall(json.dumps(item, separators=(",", ":")).encode() + b"\n")
+            connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            # The server hung up, which the reader sees as well
+            pass
+    
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    
+    try:
+        with connection.makefile("rb") as answers:
+            for line in answers:
+                yield json.loads(line)
+    finally:
+        connection.close()
+        sender.join()
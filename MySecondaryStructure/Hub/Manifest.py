@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import tempfile
+from functools import partial
+
+from MySecondaryStructure.PDBparser import ReadCIF
+from MySecondaryStructure.PDBparser import ReadPDB
+from MySecondaryStructure.PDBparser.Cache import HASH_BLOCK_SIZE
+
+# Version of the manifest file layout
+MANIFEST_VERSION = 2
+
+class Manifest():
+    """
+    About
+    ---------------
+    A record of the files of the last run with their size, modification time,
+    content hash and summary result, kept in one JSON file. A file whose size
+    and modification time are unchanged reuses its stored result after a
+    single 'stat', a file whose stat changed is hashed and only parsed again
+    if its contents changed. Entries are keyed by the path and the run
+    options (such as 'summary'), so a result is only reused by a run with
+    the same options, and errors are never reused so failed files are tried
+    again. Stored results are dropped when a parser version changes.
+    """
+    def __init__(self, manifest_path: str, options: dict = None):
+        self.manifest_path = manifest_path
+        self.options = dict() if options is None else dict(options)
+        self.parsers = {"pdb": ReadPDB.PARSER_VERSION, "cif": ReadCIF.PARSER_VERSION}
+        self.entries = dict()
+        self._seen = dict()
+        
+        try:
+            with open(manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        
+        if manifest.get("version") == MANIFEST_VERSION and manifest.get("parsers") == self.parsers:
+            self.entries = manifest["files"]
+    
+    def lookup(self, file_path: str, stat: os.stat_result) -> dict:
+        """
+        About
+        ---------------
+        Finds the stored result of a file if the file has not changed since it
+        was stored.
+        
+        Parameters
+        ---------------
+        file_path : str
+            Path to a file
+        stat : os.stat_result
+            The current stat of the file
+        
+        Returns
+        ---------------
+        dict
+            The stored result (see 'Hub.app.summarize'), None if the file is
+            new or changed, or its stored result is an error
+        """
+        
+        key = self.key(file_path)
+        entry = self.entries.get(key)
+        if entry is None or "error" in entry["result"]:
+            return None
+        
+        if entry["size"] != stat.st_size:
+            return None
+        
+        if entry["mtime_ns"] != stat.st_mtime_ns:
+            # Touched or copied, but the contents may still be the same
+            digest = file_digest(file_path)
+            if digest != entry["sha256"]:
+                return None
+            entry = {**entry, "mtime_ns": stat.st_mtime_ns}
+        
+        self._seen[key] = entry
+        
+        return entry["result"]
+    
+    def record(self, file_path: str, stat: os.stat_result, result: dict):
+        """
+        About
+        ---------------
+        Stores the result of a file that was parsed in this run.
+        
+        Parameters
+        ---------------
+        file_path : str
+            Path to the file
+        stat : os.stat_result
+            The stat of the file taken before it was parsed
+        result : dict
+            The result made by 'Hub.app.summarize'
+        """
+        
+        self._seen[self.key(file_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_digest(file_path),
+            "result": {key: value for key, value in result.items() if key != "profile"},
+        }
+    
+    def key(self, file_path: str) -> str:
+        # Key of the entry of a file, the path and the options of this run
+        return json.dumps({"path": file_path, **self.options}, sort_keys=True)
+    
+    def update(self, file_paths: list, summarize_all):
+        """
+        About
+        ---------------
+        Gives the result of every file in order, reusing stored results and
+        only summarizing the files that are new or changed. Results are
+        yielded as they are ready.
+        
+        Parameters
+        ---------------
+        file_paths : list
+            Paths to the files of this run
+        summarize_all : callable
+            Takes a list of paths and gives their results in the same order
+        
+        Yields
+        ---------------
+        dict
+            The result of every file in 'file_paths'
+        """
+        
+        stats = dict()
+        reused = dict()
+        pending = list()
+        
+        for file_path in file_paths:
+            try:
+                stats[file_path] = os.stat(file_path)
+            except OSError:
+                # Summarizing it reports what is wrong with it
+                pending.append(file_path)
+                continue
+            
+            result = self.lookup(file_path, stats[file_path])
+            if result is None:
+                pending.append(file_path)
+            else:
+                reused[file_path] = result
+        
+        fresh_results = iter(summarize_all(pending))
+        
+        for file_path in file_paths:
+            if file_path in reused:
+                yield reused[file_path]
+                continue
+            
+            result = next(fresh_results)
+            if file_path in stats:
+                self.record(file_path, stats[file_path], result)
+            yield result
+    
+    def save(self):
+        """
+        About
+        ---------------
+        Writes the files seen in this run to the manifest file. Files of
+        earlier runs with the same options that were not part of this run are
+        left out, entries of runs with other options are kept. The file is
+        written next to the manifest and renamed over it, so a run that stops
+        early never leaves half of a manifest.
+        """
+        
+        files = {key: entry for key, entry in self.entries.items() if not self._has_options(key)}
+        files.update(self._seen)
+        manifest = {"version": MANIFEST_VERSION, "parsers": self.parsers, "files": files}
+        
+        manifest_dir = os.path.dirname(os.path.abspath(self.manifest_path))
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=manifest_dir)
+        try:
+            with os.fdopen(file_descriptor, "w") as file:
+                json.dump(manifest, file, separators=(",", ":"))
+            os.replace(temp_path, self.manifest_path)
+        except OSError:
+            os.unlink(temp_path)
+            raise
+        
+        self.entries = files
+    
+    def _has_options(self, key: str) -> bool:
+        # If an entry was made with the options of this run
+        options = json.loads(key)
+        del options["path"]
+        
+        return options == self.options
+
+def file_digest(file_path: str) -> str:
+    # SHA-256 hex digest of the contents of a file
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(partial(file.read, HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    
+    return digest.hexdigest()
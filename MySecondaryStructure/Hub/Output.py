@@ -0,0 +1,121 @@
+import csv
+import json
+import sys
+
+from MySecondaryStructure.Structures.X3D import print_about
+
+# Output formats of the command line, 'text' is the printed table
+FORMATS = ("text", "jsonl", "csv")
+
+# Columns of a CSV record. The per-chain columns hold 'chain:count' pairs
+# separated by ';'.
+CSV_COLUMNS = [
+    "path",
+    "name",
+    "total_amino_acids",
+    "num_chains",
+    "num_loops",
+    "num_helices",
+    "num_sheets",
+    "amino_acids_per_chain",
+    "loops_per_chain",
+    "helices_per_chain",
+    "sheets_per_chain",
+    "error",
+]
+
+class ResultWriter():
+    """
+    About
+    ---------------
+    Writes the records made by 'Hub.app.summarize' to a stream, one record per
+    file. In the 'jsonl' and 'csv' formats every record is one line that is
+    flushed as soon as it is written, so a consumer can read the results while
+    the batch is still running. The 'text' format is always printed to
+    standard output.
+    """
+    def __init__(self, output_format: str = "text", stream=None):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}' (expected one of {', '.join(FORMATS)})")
+        
+        self.output_format = output_format
+        self.stream = stream if stream is not None else sys.stdout
+        self._csv_writer = None
+        
+        if output_format == "csv":
+            self._csv_writer = csv.DictWriter(self.stream, fieldnames=CSV_COLUMNS, lineterminator="\n")
+            self._csv_writer.writeheader()
+            self.stream.flush()
+    
+    def write(self, result: dict):
+        """
+        About
+        ---------------
+        Writes one record.
+        
+        Parameters
+        ---------------
+        result : dict
+            A summary or error record
+        """
+        
+        if self.output_format == "text":
+            print_result(result)
+            return
+        
+        if self.output_format == "jsonl":
+            self.stream.write(json.dumps(flat_record(result), separators=(",", ":")) + "\n")
+        else:
+            self._csv_writer.writerow(csv_record(result))
+        
+        self.stream.flush()
+
+def print_result(result: dict):
+    """
+    About
+    ---------------
+    Prints a record made by 'Hub.app.summarize'.
+    
+    Parameters
+    ---------------
+    result : dict
+        A summary or error record
+    """
+    
+    if "error" in result:
+        print(f"ERROR: {result['error']} ({result['path']})")
+    else:
+        print_about(result["summary"])
+
+def flat_record(result: dict) -> dict:
+    """
+    About
+    ---------------
+    Turns a record made by 'Hub.app.summarize' into one flat record of the
+    file, leaving out the profile.
+    
+    Parameters
+    ---------------
+    result : dict
+        A summary or error record
+    
+    Returns
+    ---------------
+    dict
+        'path' and either the fields of the summary or 'error'
+    """
+    
+    if "error" in result:
+        return {"path": result["path"], "error": str(result["error"])}
+    
+    return {"path": result["path"], **result["summary"]}
+
+def csv_record(result: dict) -> dict:
+    # A flat record with the per-chain counts joined into one field each
+    record = flat_record(result)
+    
+    for column in ("amino_acids_per_chain", "loops_per_chain", "helices_per_chain", "sheets_per_chain"):
+        if column in record:
+            record[column] = ";".join(f"{c}:{n}" for c, n in record[column].items())
+    
+    return record
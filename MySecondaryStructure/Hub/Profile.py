@@ -0,0 +1,270 @@
+import functools
+import json
+import sys
+import time
+
+import numpy as np
+
+from MySecondaryStructure.PDBparser import ReadCIF
+from MySecondaryStructure.PDBparser import ReadPDB
+from MySecondaryStructure.PDBparser.Cache import ParseCache
+from MySecondaryStructure.Structures import DSSP
+from MySecondaryStructure.Structures.X3D import Protein
+
+# Functions that are timed while profiling (owner, attribute name, stage)
+HOOKS = (
+    (ReadPDB,       "parse_lines",          "dispatch"),
+    (ReadCIF,       "read_categories",      "dispatch"),
+    (ReadPDB,       "parse_atom_block",     "dataframes"),
+    (ReadPDB,       "parse_record_lines",   "dataframes"),
+    (ReadCIF,       "build_protein",        "dataframes"),
+    (ReadPDB,       "_field_to_number",     "numeric"),
+    (ReadPDB,       "change_col_type",      "numeric"),
+    (ReadCIF,       "_to_array",            "numeric"),
+    (ReadCIF,       "_number",              "numeric"),
+    (DSSP,          "assign",               "structure_assignment"),
+    (Protein,       "get_loops",            "loops"),
+    (Protein,       "summary",              "summary"),
+    (ParseCache,    "key",                  "cache"),
+    (ParseCache,    "load",                 "cache"),
+    (ParseCache,    "store",                "cache"),
+)
+
+# Modules whose 'open_pdb' is replaced so reads from the file are timed
+FILE_OPENERS = (ReadPDB, ReadCIF)
+
+# Bytes of lines read from a file at a time while profiling
+READ_HINT = 1024 * 1024
+
+# Percentiles of the per-file stage times in the report
+PERCENTILES = (50, 90, 99)
+
+# The profiler of this process, None while the hooks are not installed
+_profiler = None
+
+class Profiler():
+    """
+    About
+    ---------------
+    Records the wall time, number of calls and net change in live memory
+    blocks ('sys.getallocatedblocks') of every stage of one file. Stages can
+    be nested, and the time and blocks of a stage do not include the stages
+    inside it, so the stages of a file add up to the time spent in them.
+    
+    'net_live_blocks' is the number of blocks a stage left allocated, not
+    the number it allocated. It is negative when a stage frees more blocks
+    than it makes, for example when it drops the tables of a stage before it.
+    """
+    def __init__(self):
+        self.stages = dict()
+        self._stack = []
+    
+    def start_file(self):
+        self.stages = dict()
+        self._stack = []
+    
+    def enter(self):
+        self._stack.append([time.perf_counter(), sys.getallocatedblocks(), 0.0, 0])
+    
+    def exit(self, stage: str):
+        start, blocks, child_seconds, child_blocks = self._stack.pop()
+        seconds = time.perf_counter() - start
+        live_blocks = sys.getallocatedblocks() - blocks
+        
+        record = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "net_live_blocks": 0})
+        record["seconds"] += seconds - child_seconds
+        record["calls"] += 1
+        record["net_live_blocks"] += live_blocks - child_blocks
+        
+        if len(self._stack) > 0:
+            self._stack[-1][2] += seconds
+            self._stack[-1][3] += live_blocks
+
+class _TimedFile():
+    # A text file whose reads are timed as the 'file_read' stage. Lines are
+    # read in blocks so the timing adds little to every line.
+    def __init__(self, file):
+        self.file = file
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.file.close()
+    
+    def __iter__(self):
+        while True:
+            _profiler.enter()
+            try:
+                lines = self.file.readlines(READ_HINT)
+            finally:
+                _profiler.exit("file_read")
+            
+            if len(lines) == 0:
+                return
+            yield from lines
+    
+    def read(self, *args):
+        _profiler.enter()
+        try:
+            return self.file.read(*args)
+        finally:
+            _profiler.exit("file_read")
+
+def _timed(function, stage: str):
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        _profiler.enter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _profiler.exit(stage)
+    
+    return timed_function
+
+def install():
+    """
+    About
+    ---------------
+    Wraps the functions listed in 'HOOKS' and the file openers so they are
+    timed, until the returned function is called. Nothing is wrapped outside
+    of that, so the hooks cost nothing when profiling is off. While the hooks
+    are installed, calling this again wraps nothing and returns a function
+    that does nothing.
+    
+    Returns
+    ---------------
+    callable
+        Puts back the functions that were wrapped
+    """
+    
+    global _profiler
+    
+    if _profiler is not None:
+        return lambda: None
+    
+    _profiler = Profiler()
+    
+    originals = [(owner, name, getattr(owner, name)) for owner, name, _ in HOOKS]
+    originals += [(module, "open_pdb", module.open_pdb) for module in FILE_OPENERS]
+    
+    for owner, name, stage in HOOKS:
+        setattr(owner, name, _timed(getattr(owner, name), stage))
+    
+    open_pdb = ReadPDB.open_pdb
+    for module in FILE_OPENERS:
+        module.open_pdb = lambda file_path: _TimedFile(open_pdb(file_path))
+    
+    def uninstall():
+        global _profiler
+        
+        for owner, name, original in originals:
+            setattr(owner, name, original)
+        _profiler = None
+    
+    return uninstall
+
+def profile_file(function, *args):
+    """
+    About
+    ---------------
+    Runs the work for one file and records its stages. Time that is not
+    spent in any stage is recorded as 'other'. The hooks are only installed
+    while the file is worked on.
+    
+    Parameters
+    ---------------
+    function : callable
+        The work for the file
+    *args
+        Arguments of 'function'
+    
+    Returns
+    ---------------
+    object
+        What 'function' returned
+    dict
+        Total seconds of the file and the record of every stage
+    """
+    
+    uninstall = install()
+    profiler = _profiler
+    profiler.start_file()
+    
+    profiler.enter()
+    try:
+        result = function(*args)
+    finally:
+        profiler.exit("other")
+        uninstall()
+    total_seconds = sum(record["seconds"] for record in profiler.stages.values())
+    
+    return result, {"seconds": total_seconds, "stages": profiler.stages}
+
+def report(results: list, wall_seconds: float) -> dict:
+    """
+    About
+    ---------------
+    Puts the per-file profiles of a batch together. Every stage gets its
+    totals over the batch and percentiles of its time per file (files that
+    never reached a stage count as 0 seconds).
+    
+    Parameters
+    ---------------
+    results : list
+        Records made by 'Hub.app.summarize' with a 'profile'
+    wall_seconds : float
+        Wall time of the whole batch
+    
+    Returns
+    ---------------
+    dict
+        The batch report, with every file under 'files'
+    """
+    
+    files = [{"path": result["path"], **result["profile"]} for result in results if "profile" in result]
+    
+    stage_names = sorted({stage for file in files for stage in file["stages"]})
+    stages = dict()
+    for stage in stage_names:
+        seconds = np.array([file["stages"].get(stage, {"seconds": 0.0})["seconds"] for file in files])
+        stages[stage] = {
+            "total_seconds": float(seconds.sum()),
+            "calls": sum(file["stages"][stage]["calls"] for file in files if stage in file["stages"]),
+            "net_live_blocks": sum(file["stages"][stage]["net_live_blocks"] for file in files if stage in file["stages"]),
+            **{f"p{p}_seconds": float(np.percentile(seconds, p)) for p in PERCENTILES},
+            "max_seconds": float(seconds.max()),
+        }
+    
+    file_seconds = np.array([file["seconds"] for file in files]) if len(files) > 0 else np.zeros(1)
+    
+    return {
+        "num_files": len(files),
+        "wall_seconds": wall_seconds,
+        "files_per_second": len(files) / wall_seconds if wall_seconds > 0 else None,
+        "file_seconds": {f"p{p}": float(np.percentile(file_seconds, p)) for p in PERCENTILES},
+        "stages": stages,
+        "files": files,
+    }
+
+def write_report(batch_report: dict, output: str = None):
+    """
+    About
+    ---------------
+    Writes a report made by 'report' as JSON.
+    
+    Parameters
+    ---------------
+    batch_report : dict
+        The report
+    output : str
+        File to write to, standard error if None
+    """
+    
+    text = json.dumps(batch_report, indent=2)
+    
+    if output is None:
+        print(text, file=sys.stderr)
+    else:
+        with open(output, "w") as file:
+            file.write(text + "\n")
@@ -0,0 +1,283 @@
+import ipaddress
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from MySecondaryStructure.Hub import Output
+from MySecondaryStructure.Hub import app
+from MySecondaryStructure.Hub.Client import DEFAULT_ADDRESS, parse_address
+from MySecondaryStructure.PDBparser import ReadCIF
+from MySecondaryStructure.PDBparser import ReadPDB
+from MySecondaryStructure.PDBparser.Cache import ParseCache
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    # Answers the JSON requests of one connection, one per line. Every request
+    # is handed to the worker pool as soon as it is read, and the answers (the
+    # records 'Output.flat_record' makes) are written back in order from a
+    # second thread as they finish.
+    def handle(self):
+        pending = queue.Queue()
+        writer = threading.Thread(target=self.write_answers, args=(pending,), daemon=True)
+        writer.start()
+        
+        try:
+            for line in self.rfile:
+                if line.strip() != b"":
+                    pending.put(self.server.submit(line))
+        finally:
+            pending.put(None)
+            writer.join()
+    
+    def write_answers(self, pending: queue.Queue):
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            
+            try:
+                answer = future.result()
+                if "path" in answer:
+                    answer = Output.flat_record(answer)
+            except Exception as e:
+                answer = {"error": f"{type(e).__name__}: {e}"}
+            
+            try:
+                self.wfile.write(json.dumps(answer, separators=(",", ":")).encode() + b"\n")
+                self.wfile.flush()
+            except OSError:
+                # The client went away, the rest of its answers are dropped
+                pass
+
+class _ServerMixIn():
+    # What the Unix and TCP servers share
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def submit(self, line: bytes) -> Future:
+        """
+        About
+        ---------------
+        Hands one request to the worker pool.
+        
+        Parameters
+        ---------------
+        line : bytes
+            A request as a line of JSON (see 'Client.request')
+        
+        Returns
+        ---------------
+        Future
+            Becomes the answer, a record like the ones 'Hub.app.summarize' makes
+        """
+        
+        try:
+            item = json.loads(line)
+            summary = bool(item.get("summary", self.summary))
+            
+            if "path" in item:
+                return self.executor.submit(app.summarize, item["path"], summary, self.cache)
+            
+            if "pdb" in item:
+                return self.executor.submit(summarize_text, item["pdb"], item.get("name", "<pdb>"),
+                                            item.get("format", "pdb"), summary)
+            
+            error = "Request needs a 'path' or 'pdb'"
+        except (ValueError, AttributeError) as e:
+            error = f"Bad request: {e}"
+        
+        future = Future()
+        future.set_result({"error": error})
+        return future
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixServer(_ServerMixIn, socketserver.ThreadingUnixStreamServer):
+        pass
+
+class TCPServer(_ServerMixIn, socketserver.ThreadingTCPServer):
+    pass
+
+def summarize_text(text: str, name: str, file_format: str = "pdb", summary: bool = False) -> dict:
+    """
+    About
+    ---------------
+    Summarizes the text of a PDB or mmCIF file sent to the server.
+    
+    Parameters
+    ---------------
+    text : str
+        The whole file
+    name : str
+        Name to report the file under
+    file_format : str
+        'pdb' or 'cif'
+    summary : bool
+        Only parse the records 'cmd_about' needs
+    
+    Returns
+    ---------------
+    dict
+        'path' (set to 'name') and either 'summary' (see 'Protein.summary') or 'error'
+    """
+    
+    try:
+        lines = text.splitlines()
+        
+        if file_format == "cif":
+            stop = ReadCIF._has_summary_categories if summary else None
+            protein = ReadCIF.build_protein(ReadCIF.read_categories(lines, ReadCIF.WANTED_CATEGORIES, stop))
+        elif file_format == "pdb":
+            records = ReadPDB.SUMMARY_RECORDS if summary else None
+            protein = ReadPDB.parse_lines(lines, records, summary)
+        else:
+            return {"path": name, "error": f"Unknown format '{file_format}'"}
+        
+        return {"path": name, "summary": protein.summary()}
+    except Exception as e:
+        return {"path": name, "error": f"{type(e).__name__}: {e}"}
+
+def make_server(address: str, executor: ProcessPoolExecutor, summary: bool = False, cache: ParseCache = None):
+    """
+    About
+    ---------------
+    Binds a server to an address. The server runs requests on any path it is
+    sent, so TCP servers only bind to loopback hosts and Unix sockets are
+    made readable and writable by their owner only. A stale Unix socket left
+    by a server that did not shut down cleanly is replaced, but anything else
+    at the path (a file, or the socket of a server that is still running)
+    raises FileExistsError.
+    
+    Parameters
+    ---------------
+    address : str
+        'host:port' for TCP on a loopback host or the path of a Unix domain
+        socket
+    executor : ProcessPoolExecutor
+        The worker pool requests are run on
+    summary : bool
+        Default of the 'summary' flag of a request
+    cache : ParseCache
+        Parse cache the workers read from and write to, none if None
+    
+    Returns
+    ---------------
+    socketserver.BaseServer
+        The bound server
+    """
+    
+    family, socket_address = parse_address(address)
+    
+    if family == socket.AF_INET:
+        if not _is_loopback(socket_address[0]):
+            raise ValueError(f"Refusing to serve on '{socket_address[0]}', only loopback hosts are allowed")
+        server = TCPServer(socket_address, _RequestHandler)
+    else:
+        _remove_stale_socket(socket_address)
+        # The socket file is made while the umask hides it from everyone else
+        old_umask = os.umask(0o077)
+        try:
+            server = UnixServer(socket_address, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        # The socket this server made, so only it is removed on shut down
+        bound = os.lstat(socket_address)
+        server.socket_id = (bound.st_dev, bound.st_ino)
+    
+    server.executor = executor
+    server.summary = summary
+    server.cache = cache
+    
+    return server
+
+def serve(address: str = DEFAULT_ADDRESS, jobs: int = None, summary: bool = False, cache: ParseCache = None):
+    """
+    About
+    ---------------
+    Runs an analysis server until it is interrupted. The worker processes are
+    started (and have imported the parser) before the first request comes
+    in, so a request only pays for its own parse. Every connection is served
+    by its own thread and its requests run concurrently on the pool.
+    
+    Parameters
+    ---------------
+    address : str
+        'host:port' for TCP on a loopback host or the path of a Unix domain
+        socket
+    jobs : int
+        Number of worker processes, one per CPU if None
+    summary : bool
+        Default of the 'summary' flag of a request
+    cache : ParseCache
+        Parse cache the workers read from and write to, none if None
+    """
+    
+    jobs = jobs or os.cpu_count() or 1
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Start every worker now instead of on the first requests
+        for future in [executor.submit(os.getpid) for _ in range(jobs)]:
+            future.result()
+        
+        server = make_server(address, executor, summary, cache)
+        # Stopping the server with SIGTERM cleans up like an interrupt does
+        signal.signal(signal.SIGTERM, _stop)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # The socket is removed while it is still open, so its inode
+            # cannot have been reused by a file another process made
+            family, socket_address = parse_address(address)
+            if family != socket.AF_INET:
+                _remove_own_socket(socket_address, server.socket_id)
+            server.server_close()
+
+def _remove_stale_socket(path: str):
+    # Removes a Unix socket nothing listens on any more. Anything else at the
+    # path is left alone and raises FileExistsError.
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"'{path}' exists and is not a socket")
+    
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    
+    raise FileExistsError(f"A server is already listening on '{path}'")
+
+def _remove_own_socket(path: str, socket_id: tuple):
+    # Removes the socket a server bound, unless another file has replaced it
+    try:
+        current = os.lstat(path)
+    except FileNotFoundError:
+        return
+    
+    if (current.st_dev, current.st_ino) == socket_id:
+        os.unlink(path)
+
+def _is_loopback(host: str) -> bool:
+    # If a TCP host only takes connections from this machine
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _stop(signal_number, frame):
+    raise KeyboardInterrupt
@@ -1,7 +1,33 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from MySecondaryStructure.Hub import Output
+from MySecondaryStructure.Hub.Manifest import Manifest
+from MySecondaryStructure.Hub.Output import print_result
+from MySecondaryStructure.Hub import Profile
+
+from MySecondaryStructure.PDBparser import ReadCIF
 from MySecondaryStructure.PDBparser import ReadPDB
+from MySecondaryStructure.PDBparser.Cache import ParseCache
 from MySecondaryStructure.PDBparser import Validate
+from MySecondaryStructure.Structures import Segments
 
-def run(pdb_file_path):
+# Slice and type of the fields 'quick_summary' reads from each record, in 
+# the order of the record layout
+HELIX_FIELDS = [(start, end, col_type) for col_name, start, end, col_type in ReadPDB.HELIX_COLUMNS 
+                if col_name in ("Helix Identifier", "1st Chain Identifier", "1st Residue Sequence Number", 
+                                "2nd Residue Sequence Number")]
+SHEET_FIELDS = [(start, end, col_type) for col_name, start, end, col_type in ReadPDB.SHEET_COLUMNS 
+                if col_name in ("1st Chain Identifier", "1st Residue Sequence Number", "2nd Residue Sequence Number")]
+SEQRES_FIELDS = [(start, end, col_type) for col_name, start, end, col_type in ReadPDB.SEQRES_COLUMNS 
+                 if col_name in ("Chain Identifier", "Number of Residuals")]
+
+def run(pdb_file_path, summary: bool = False, cache: ParseCache = None, profile: bool = False) -> dict:
     """
     About
     ---------------
@@ -11,12 +37,312 @@ def run(pdb_file_path):
     ---------------
     pdb_file_path : str
         Path to a pdb file
+    summary : bool
+        Only parse the records 'cmd_about' needs and skip the coordinate 
+        section where possible
+    cache : ParseCache
+        Parse cache to read from and write to, none if None
+    profile : bool
+        Time every stage of the run (see 'Profile')
+    
+    Returns
+    ---------------
+    dict
+        The profile report (see 'Profile.report') if 'profile' is set, None otherwise
     """
+    if profile:
+        start = time.perf_counter()
+        result = summarize(pdb_file_path, summary, cache, profile)
+        print_result(result)
+        return Profile.report([result], time.perf_counter() - start)
+    
     valid_file, e = Validate.check_file(pdb_file_path)
     
     if valid_file == True:
-        protein = ReadPDB.read(pdb_file_path)
+        protein = read(pdb_file_path, summary, cache)
         protein.cmd_about()
-        
+    
+    else:
+        print(f"ERROR: {e} ({pdb_file_path})")
+
+def run_batch(pdb_file_paths: list, jobs: int = 1, summary: bool = False, cache: ParseCache = None, 
+              profile: bool = False, output_format: str = "text", manifest: Manifest = None) -> dict:
+    """
+    About
+    ---------------
+    Runs the MySecondaryStructure application over many files. With more 
+    than one job the files are parsed and summarized in a pool of worker 
+    processes that only send back summary records. Results are printed in 
+    the order of 'pdb_file_paths', and a file that fails is reported 
+    without stopping the rest of the batch.
+    
+    Parameters
+    ---------------
+    pdb_file_paths : list
+        Paths to pdb files
+    jobs : int
+        Number of worker processes
+    summary : bool
+        Only parse the records 'cmd_about' needs and skip the coordinate 
+        section where possible
+    cache : ParseCache
+        Parse cache to read from and write to, none if None
+    profile : bool
+        Time every stage of every file (see 'Profile')
+    output_format : str
+        How every result is written, one of 'Output.FORMATS'
+    manifest : Manifest
+        Results of an earlier run to reuse for unchanged files, updated and 
+        saved at the end of the run, none if None
+    
+    Returns
+    ---------------
+    dict
+        The profile report (see 'Profile.report') if 'profile' is set, None otherwise
+    """
+    
+    start = time.perf_counter()
+    profiled_results = list()
+    writer = Output.ResultWriter(output_format)
+    
+    summarize_files = partial(summarize_all, jobs=jobs, summary=summary, cache=cache, profile=profile)
+    
+    if manifest is None:
+        results = summarize_files(pdb_file_paths)
     else:
-        print(f"ERROR: {e} ({pdb_file_path})")
\ No newline at end of file
+        results = manifest.update(pdb_file_paths, summarize_files)
+    
+    for result in results:
+        writer.write(result)
+        if "profile" in result:
+            profiled_results.append(result)
+    
+    if manifest is not None:
+        manifest.save()
+    
+    if profile:
+        return Profile.report(profiled_results, time.perf_counter() - start)
+
+def summarize_all(pdb_file_paths: list, jobs: int = 1, summary: bool = False, cache: ParseCache = None, 
+                  profile: bool = False):
+    """
+    About
+    ---------------
+    Summarizes many files, in a pool of worker processes if there is more 
+    than one job.
+    
+    Parameters
+    ---------------
+    pdb_file_paths : list
+        Paths to pdb files
+    jobs : int
+        Number of worker processes
+    summary : bool
+        Only parse the records 'cmd_about' needs
+    cache : ParseCache
+        Parse cache to read from and write to, none if None
+    profile : bool
+        Time every stage of every file (see 'Profile')
+    
+    Yields
+    ---------------
+    dict
+        The record made by 'summarize' of every file, in the order of 'pdb_file_paths'
+    """
+    
+    if jobs <= 1 or len(pdb_file_paths) <= 1:
+        for pdb_file_path in pdb_file_paths:
+            yield summarize(pdb_file_path, summary, cache, profile)
+        return
+    
+    # A few chunks per worker keeps the pool busy without sending every 
+    # path as its own task
+    chunksize = max(1, len(pdb_file_paths) // (jobs * 4))
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        num_files = len(pdb_file_paths)
+        yield from executor.map(summarize, pdb_file_paths, [summary] * num_files, [cache] * num_files, 
+                                [profile] * num_files, chunksize=chunksize)
+
+def find_files(paths: list) -> list:
+    """
+    About
+    ---------------
+    Expands the directories in a list of paths into the PDB and mmCIF files 
+    under them (found by extension, in sorted order). Other paths are kept 
+    as they are.
+    
+    Parameters
+    ---------------
+    paths : list
+        Paths to files and directories
+    
+    Returns
+    ---------------
+    list
+        Paths to files
+    """
+    
+    file_paths = list()
+    
+    for path in paths:
+        if not os.path.isdir(path):
+            file_paths.append(path)
+            continue
+        
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if Validate.has_structure_extension(file_name):
+                    file_paths.append(os.path.join(dir_path, file_name))
+    
+    return file_paths
+
+def summarize(pdb_file_path, summary: bool = False, cache: ParseCache = None, profile: bool = False) -> dict:
+    """
+    About
+    ---------------
+    Reads a pdb file and summarizes it, catching anything that goes wrong.
+    
+    Parameters
+    ---------------
+    pdb_file_path : str
+        Path to a pdb file
+    summary : bool
+        Only parse the records 'cmd_about' needs, with 'quick_summary' if 
+        the file allows it
+    cache : ParseCache
+        Parse cache to read from and write to, none if None
+    profile : bool
+        Add the time of every stage under 'profile' (see 'Profile.profile_file')
+    
+    Returns
+    ---------------
+    dict
+        'path' and either 'summary' (see 'Protein.summary') or 'error'
+    """
+    
+    if profile:
+        result, file_profile = Profile.profile_file(summarize, pdb_file_path, summary, cache)
+        result["profile"] = file_profile
+        return result
+    
+    valid_file, e = Validate.check_file(pdb_file_path)
+    if valid_file == False:
+        return {"path": pdb_file_path, "error": e}
+    
+    try:
+        if summary and not Validate.is_cif(pdb_file_path):
+            # Most PDB files can be summarized from their records without pandas
+            quick = quick_summary(pdb_file_path)
+            if quick is not None:
+                return {"path": pdb_file_path, "summary": quick}
+        
+        protein = read(pdb_file_path, summary, cache)
+        return {"path": pdb_file_path, "summary": protein.summary()}
+    except Exception as e:
+        return {"path": pdb_file_path, "error": f"{type(e).__name__}: {e}"}
+
+def read(pdb_file_path, summary: bool = False, cache: ParseCache = None):
+    # The reader is picked from the file name, mmCIF files have their own backend
+    if Validate.is_cif(pdb_file_path):
+        return ReadCIF.read(pdb_file_path, summary=summary, cache=cache)
+    
+    if summary:
+        return ReadPDB.read(pdb_file_path, records=ReadPDB.SUMMARY_RECORDS, summary=True, cache=cache)
+    
+    return ReadPDB.read(pdb_file_path, cache=cache)
+
+def quick_summary(pdb_file_path) -> dict:
+    """
+    About
+    ---------------
+    Makes the same summary as 'Protein.summary' straight from the HEADER, 
+    HELIX, SHEET and SEQRES records of a PDB file, with plain Python and 
+    numpy instead of dataframes, so pandas is never imported. Like the 
+    summary mode of 'ReadPDB.parse_lines' it stops at the first coordinate 
+    line.
+    
+    Files without SEQRES records (their chains come from the atoms) or 
+    without HELIX and SHEET records (their structure is assigned from the 
+    coordinates) need the full reader, and so do files with fields that are 
+    not numbers where numbers belong.
+    
+    Parameters
+    ---------------
+    pdb_file_path : str
+        Path to a pdb file
+    
+    Returns
+    ---------------
+    dict
+        The summary (see 'Protein.summary'), None if the file needs the full reader
+    """
+    
+    name = ""
+    helices = list()
+    sheets = list()
+    chain_lengths = dict()
+    
+    try:
+        with ReadPDB.open_pdb(pdb_file_path) as file:
+            for line in file:
+                line = line.rstrip("\r\n")
+                record = line[:6].rstrip()
+                
+                if record in ReadPDB.COORDINATE_RECORDS:
+                    break
+                elif record == "HEADER":
+                    name = line[62:66]
+                elif record == "HELIX":
+                    helices.append(tuple(_fields(line, HELIX_FIELDS)))
+                elif record == "SHEET":
+                    sheets.append(tuple(_fields(line, SHEET_FIELDS)))
+                elif record == "SEQRES":
+                    chain, length = _fields(line, SEQRES_FIELDS)
+                    if chain not in chain_lengths:
+                        chain_lengths[chain] = length
+    except ValueError:
+        return None
+    
+    if len(chain_lengths) == 0 or len(helices) + len(sheets) == 0:
+        return None
+    
+    # Helices are told apart by identifier, sheets by their first residue in each chain
+    helix_ids = {helix_id for helix_id, _, _, _ in helices}
+    helix_chains = _count_per_chain({(chain, helix_id) for helix_id, chain, _, _ in helices})
+    sheet_chains = _count_per_chain({(chain, start) for chain, start, _ in sheets})
+    
+    intervals = [(chain, start, end) for _, chain, start, end in helices] + sheets
+    chains, starts, ends = zip(*intervals)
+    segments = Segments.merge_intervals(np.array(chains), np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+    loop_chains = Segments.find_loops(*segments, chain_lengths)[0].tolist()
+    
+    return {
+        "name": name,
+        "total_amino_acids": sum(chain_lengths.values()),
+        "num_chains": len(chain_lengths),
+        "amino_acids_per_chain": chain_lengths,
+        "num_loops": len(loop_chains),
+        "loops_per_chain": _per_chain(chain_lengths, dict(Counter(loop_chains))),
+        "num_helices": len(helix_ids),
+        "helices_per_chain": _per_chain(chain_lengths, helix_chains),
+        "num_sheets": sum(sheet_chains.values()),
+        "sheets_per_chain": _per_chain(chain_lengths, sheet_chains),
+    }
+
+def _fields(line: str, fields: list):
+    # Values of the fields of a line, 'Int' fields as int (ValueError if they are not)
+    for start, end, col_type in fields:
+        value = line[start:end].strip()
+        yield int(value) if col_type == "Int" else value
+
+def _count_per_chain(pairs: set) -> dict:
+    # Number of distinct values in each chain, by sorted chain like a pandas groupby
+    counts = Counter(chain for chain, _ in pairs)
+    return {chain: counts[chain] for chain in sorted(counts)}
+
+def _per_chain(chain_lengths: dict, counts: dict) -> dict:
+    # Counts keyed by chain, every SEQRES chain first (see 'Protein._per_chain')
+    chains = list(chain_lengths) + [c for c in counts if c not in chain_lengths]
+    return {c: counts.get(c, 0) for c in chains}
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import partial
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures.X3D import Protein, TABLE_NAMES
+
+# Default size limit of a cache directory in bytes
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Name of the file describing a cache entry
+META_FILE = "meta.json"
+
+# Bytes read at a time while hashing a file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+class ParseCache():
+    """
+    About
+    ---------------
+    An on-disk cache of parsed 'Protein' tables. Entries are keyed by the
+    content hash of the PDB file and the parser version, and every table
+    column is stored as its own '.npy' file so it can be memory-mapped back
+    when the table is first read. The total size of the directory is kept
+    under 'max_bytes' by removing the least recently used entries.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def key(self, file_path: str, parser_version: str) -> str:
+        """
+        About
+        ---------------
+        Makes the cache key of a file.
+        
+        Parameters
+        ---------------
+        file_path : str
+            Path to a PDB file
+        parser_version : str
+            Version of the parser that made (or will make) the tables
+        
+        Returns
+        ---------------
+        str
+            Hex digest of the file contents and the parser version
+        """
+        
+        digest = hashlib.sha256(parser_version.encode())
+        with open(file_path, "rb") as file:
+            for block in iter(partial(file.read, HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        
+        return digest.hexdigest()
+    
+    def load(self, key: str) -> Protein:
+        """
+        About
+        ---------------
+        Loads a cached Protein. Its tables are only memory-mapped from disk
+        when they are first read.
+        
+        Parameters
+        ---------------
+        key : str
+            A key made by 'key'
+        
+        Returns
+        ---------------
+        Protein
+            The cached protein, None if there is no entry for 'key'
+        """
+        
+        entry_dir = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        
+        try:
+            with open(meta_path, "r") as file:
+                meta = json.load(file)
+            # The modification time of the meta file marks when an entry was last used
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        
+        tables = {
+            table_name: partial(_load_table, entry_dir, table_name, meta["tables"][table_name]) for table_name in TABLE_NAMES
+        }
+        
+        return Protein(**tables, name=meta["name"], chain_ids=meta["chain_ids"], num_atoms=meta["num_atoms"], 
+                       num_models=meta["num_models"])
+    
+    def store(self, key: str, protein: Protein):
+        """
+        About
+        ---------------
+        Writes every table of a Protein to the cache, then evicts the least
+        recently used entries if the cache has grown past 'max_bytes'.
+        
+        Parameters
+        ---------------
+        key : str
+            A key made by 'key'
+        protein : Protein
+            The protein parsed from the file 'key' was made from
+        """
+        
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.exists(entry_dir):
+            return
+        
+        # The entry is written next to its final place and renamed into it, so
+        # other processes never see half of an entry
+        temp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            meta = {
+                "name": protein.name,
+                "chain_ids": protein.chain_ids,
+                "num_atoms": None if protein.num_atoms is None else int(protein.num_atoms),
+                "num_models": protein.num_models,
+                "tables": {table_name: _store_table(temp_dir, table_name, getattr(protein, table_name)) for table_name in TABLE_NAMES},
+            }
+            with open(os.path.join(temp_dir, META_FILE), "w") as file:
+                json.dump(meta, file)
+            
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        
+        self.evict()
+    
+    def evict(self):
+        """
+        About
+        ---------------
+        Removes the least recently used entries until the cache fits in
+        'max_bytes'.
+        """
+        
+        entries = []
+        total_bytes = 0
+        
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            try:
+                last_used = os.stat(os.path.join(entry_dir, META_FILE)).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            
+            entries.append((last_used, size, entry_dir))
+            total_bytes += size
+        
+        for _, size, entry_dir in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_bytes -= size
+    
+    def clear(self):
+        """
+        About
+        ---------------
+        Removes every entry from the cache.
+        """
+        
+        for key in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+def _store_table(entry_dir: str, table_name: str, df: pd.DataFrame) -> dict:
+    """
+    About
+    ---------------
+    Writes each column of a table to its own '.npy' file. Numeric columns
+    keep their dtype and text columns are stored as fixed-width unicode.
+    Nullable integer columns (see 'ReadPDB._field_to_number') are stored as
+    float64 with NaN for missing values, and their type is kept in the
+    returned dict.
+    
+    Parameters
+    ---------------
+    entry_dir : str
+        Directory of the cache entry
+    table_name : str
+        Name of the table
+    df : pd.DataFrame
+        The table
+    
+    Returns
+    ---------------
+    dict
+        Column names, row count and nullable column types of the table
+    """
+    
+    nullable = {}
+    for i, col_name in enumerate(df.columns):
+        column = df[col_name]
+        if isinstance(column.dtype, pd.api.extensions.ExtensionDtype) and column.dtype.kind in "iu":
+            values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+            nullable[col_name] = column.dtype.name
+        elif column.dtype.kind in "biuf":
+            values = column.to_numpy()
+        else:
+            values = column.to_numpy(dtype=str)
+        
+        np.save(os.path.join(entry_dir, f"{table_name}.{i}.npy"), values, allow_pickle=False)
+    
+    return {"columns": list(df.columns), "rows": len(df), "nullable": nullable}
+
+def _load_table(entry_dir: str, table_name: str, table_meta: dict) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Reads a table written by '_store_table'. Numeric columns stay
+    memory-mapped, apart from nullable integer columns.
+    
+    Parameters
+    ---------------
+    entry_dir : str
+        Directory of the cache entry
+    table_name : str
+        Name of the table
+    table_meta : dict
+        Column names, row count and nullable column types of the table
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        The table
+    """
+    
+    if len(table_meta["columns"]) == 0:
+        return pd.DataFrame()
+    
+    nullable = table_meta.get("nullable", {})
+    
+    frames = []
+    for i, col_name in enumerate(table_meta["columns"]):
+        values = np.load(os.path.join(entry_dir, f"{table_name}.{i}.npy"), mmap_mode="r", allow_pickle=False)
+        if values.dtype.kind == "U":
+            values = values.astype(str)
+        elif col_name in nullable:
+            values = pd.array(values, dtype=nullable[col_name])
+        else:
+            # A plain array view keeps the data memory-mapped
+            values = np.asarray(values)
+        frames.append(pd.DataFrame({col_name: values}, copy=False))
+    
+    # Building the table from one dict would merge columns of the same dtype
+    # into one block, which copies them out of the memory maps. Concatenating
+    # single column frames keeps one block per column instead, and with
+    # Copy-on-Write the blocks are not copied. 'benchmarks/suite.py' checks
+    # that warm loads stay memory-mapped (see 'is_memory_mapped').
+    return pd.concat(frames, axis=1)
+
+def is_memory_mapped(column: pd.Series) -> bool:
+    """
+    About
+    ---------------
+    Checks if the data of a column is a memory map of a cache file.
+    
+    Parameters
+    ---------------
+    column : pd.Series
+        A column of a table read from the cache
+    
+    Returns
+    ---------------
+    bool
+        True if the column is backed by a 'np.memmap'
+    """
+    
+    values = column.to_numpy()
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = getattr(values, "base", None)
+    
+    return False
@@ -0,0 +1,388 @@
+import mmap
+import os
+
+import numpy as np
+
+from MySecondaryStructure.PDBparser.ReadPDB import (COMPRESSION_MAGIC, COORDINATE_RECORDS, MODEL_BOUNDARY_RECORDS,
+                                                    RECORD_TYPES, _field_to_number, parse_lines)
+from MySecondaryStructure.Structures.X3D import Protein
+
+# Version of the layout of an index, older sidecar files are rebuilt
+INDEX_VERSION = 1
+
+# Added to the path of a PDB file to name its sidecar index
+SIDECAR_SUFFIX = ".mssidx.npz"
+
+# Bytes of the file searched for line ends at a time while building an index
+SCAN_BLOCK_SIZE = 64 * 1024 * 1024
+
+# Column of the chain identifier of the non-coordinate records that belong to
+# one chain
+RECORD_CHAIN_COLUMNS = {"HELIX": 19, "SHEET": 21, "SEQRES": 11}
+
+# Indexes used in this process, by path (see 'load_index')
+_indexes = dict()
+
+class RecordIndex():
+    """
+    About
+    ---------------
+    Byte offsets into a PDB file. Coordinate lines of the first model are
+    grouped into residue blocks (runs of lines with the same chain, residue
+    sequence number and insertion code) and every other record line that has
+    a parser is kept on its own, so any chain or residue range can be read
+    without scanning the file.
+    """
+    def __init__(self, arrays: dict):
+        self.size = int(arrays["size"])
+        self.mtime_ns = int(arrays["mtime_ns"])
+        self.num_models = int(arrays["num_models"])
+        
+        self.residue_chains = arrays["residue_chains"]
+        self.residue_numbers = arrays["residue_numbers"]
+        self.residue_starts = arrays["residue_starts"]
+        self.residue_ends = arrays["residue_ends"]
+        
+        self.record_names = arrays["record_names"]
+        self.record_chains = arrays["record_chains"]
+        self.record_starts = arrays["record_starts"]
+        self.record_ends = arrays["record_ends"]
+    
+    def arrays(self) -> dict:
+        # Everything 'np.savez' needs to write the index
+        return {
+            "version": INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "num_models": self.num_models,
+            "residue_chains": self.residue_chains,
+            "residue_numbers": self.residue_numbers,
+            "residue_starts": self.residue_starts,
+            "residue_ends": self.residue_ends,
+            "record_names": self.record_names,
+            "record_chains": self.record_chains,
+            "record_starts": self.record_starts,
+            "record_ends": self.record_ends,
+        }
+    
+    def is_current(self, stat: os.stat_result) -> bool:
+        # True if the index was built from the file as it is now
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+    
+    def ranges(self, chains: list = None, residues: tuple = None, records=None) -> list:
+        """
+        About
+        ---------------
+        Finds the byte ranges holding a selection of the file. Ranges that
+        touch are merged, so a whole chain is usually a single range.
+        
+        Parameters
+        ---------------
+        chains : list
+            Chain identifiers to keep, all of them if None
+        residues : tuple
+            First and last residue sequence number of the atoms to keep, all
+            of them if None
+        records : Iterable[str]
+            Record types to keep (see 'ReadPDB.RECORD_TYPES'), all of them if None
+        
+        Returns
+        ---------------
+        list
+            (start, end) byte offsets in file order
+        """
+        
+        keep_residues = np.ones(len(self.residue_starts), dtype=bool)
+        keep_records = np.ones(len(self.record_starts), dtype=bool)
+        
+        if chains is not None:
+            chains = np.asarray(list(chains), dtype=self.residue_chains.dtype)
+            keep_residues &= np.isin(self.residue_chains, chains)
+            # Records without a chain are kept whatever the selection
+            keep_records &= (self.record_chains == "") | np.isin(self.record_chains, chains)
+        
+        if residues is not None:
+            first, last = residues
+            keep_residues &= (self.residue_numbers >= first) & (self.residue_numbers <= last)
+        
+        if records is not None:
+            wanted = frozenset(records) | {"HEADER"}
+            keep_records &= np.isin(self.record_names, list(wanted))
+            if len(wanted & COORDINATE_RECORDS) == 0:
+                keep_residues[:] = False
+        
+        starts = np.concatenate([self.record_starts[keep_records], self.residue_starts[keep_residues]])
+        ends = np.concatenate([self.record_ends[keep_records], self.residue_ends[keep_residues]])
+        
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        
+        # A range starts wherever it does not carry straight on from the last
+        new_range = np.ones(len(starts), dtype=bool)
+        new_range[1:] = starts[1:] != ends[:-1]
+        first = np.flatnonzero(new_range)
+        last = np.append(first[1:] - 1, len(starts) - 1)
+        
+        return list(zip(starts[first].tolist(), ends[last].tolist()))
+
+def build_index(file_path: str) -> RecordIndex:
+    """
+    About
+    ---------------
+    Scans a PDB file once and records the byte offsets of its residue blocks
+    and record lines. The file is memory-mapped and searched with numpy, so
+    it is never split into Python strings.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to an uncompressed PDB file
+    
+    Returns
+    ---------------
+    RecordIndex
+        The index of the file
+    """
+    
+    stat = os.stat(file_path)
+    
+    with open(file_path, "rb") as file:
+        magic = file.read(6)
+        for prefix, _ in COMPRESSION_MAGIC:
+            if magic.startswith(prefix):
+                raise ValueError("Compressed PDB files can not be indexed")
+        
+        if stat.st_size == 0:
+            data = np.empty(0, dtype=np.uint8)
+            line_starts, line_ends = _line_bounds(data)
+            return _index_lines(data, line_starts, line_ends, stat)
+        
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                line_starts, line_ends = _line_bounds(data)
+                return _index_lines(data, line_starts, line_ends, stat)
+            finally:
+                # The map can only close once nothing points into it
+                del data
+
+def load_index(file_path: str) -> RecordIndex:
+    """
+    About
+    ---------------
+    Gets the index of a PDB file. It comes from this process if it was loaded
+    before, then from the sidecar file next to the PDB file, and is built
+    (and written to the sidecar file, if the directory can be written to)
+    when neither matches the current size and modification time of the file.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to an uncompressed PDB file
+    
+    Returns
+    ---------------
+    RecordIndex
+        The index of the file
+    """
+    
+    stat = os.stat(file_path)
+    
+    index = _indexes.get(file_path)
+    if index is not None and index.is_current(stat):
+        return index
+    
+    sidecar_path = file_path + SIDECAR_SUFFIX
+    try:
+        with np.load(sidecar_path, allow_pickle=False) as arrays:
+            if int(arrays["version"]) == INDEX_VERSION:
+                index = RecordIndex({name: arrays[name] for name in arrays.files})
+    except (OSError, ValueError, KeyError):
+        index = None
+    
+    if index is None or not index.is_current(stat):
+        index = build_index(file_path)
+        try:
+            with open(sidecar_path, "wb") as file:
+                np.savez(file, **index.arrays())
+        except OSError:
+            pass
+    
+    _indexes[file_path] = index
+    
+    return index
+
+def read(file_path: str, chains: list = None, residues: tuple = None, records=None) -> Protein:
+    """
+    About
+    ---------------
+    Reads part of a PDB file through its index (see 'load_index'). Only the
+    byte ranges of the selection are read from a memory map of the file and
+    parsed, for example 'read(path, chains=["A"], residues=(100, 250))'.
+    
+    Atoms are selected by chain and residue sequence number (first model
+    only). HELIX, SHEET and SEQRES records are kept for the selected chains
+    whatever residue range is asked for, and records that do not belong to a
+    chain (such as CONECT) are always kept.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to an uncompressed PDB file
+    chains : list
+        Chain identifiers to read, all of them if None
+    residues : tuple
+        First and last residue sequence number to read (both included), all
+        of them if None
+    records : Iterable[str]
+        Record types to parse (see 'ReadPDB.RECORD_TYPES'), all of them if None
+    
+    Returns
+    ---------------
+    Protein
+        A Protein object holding the selection
+    """
+    
+    index = load_index(file_path)
+    ranges = index.ranges(chains, residues, records)
+    
+    text = b""
+    if len(ranges) > 0:
+        with open(file_path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                text = b"".join(mapped[start:end] for start, end in ranges)
+    
+    protein = parse_lines(text.decode().splitlines(), records)
+    protein.num_models = index.num_models
+    
+    return protein
+
+def _line_bounds(data: np.ndarray):
+    """
+    About
+    ---------------
+    Finds where every line of a file starts and ends. Line ends are searched
+    for a block at a time so the search never holds a mask of the whole file.
+    
+    Parameters
+    ---------------
+    data : np.ndarray
+        The bytes of the file
+    
+    Returns
+    ---------------
+    np.ndarray
+        Offset of the first byte of every line
+    np.ndarray
+        Offset just past the end of every line, including its line end
+    """
+    
+    newlines = [np.empty(0, dtype=np.int64)]
+    for block_start in range(0, len(data), SCAN_BLOCK_SIZE):
+        block = data[block_start:block_start + SCAN_BLOCK_SIZE]
+        newlines.append(np.flatnonzero(block == ord("\n")) + block_start)
+    newlines = np.concatenate(newlines)
+    
+    line_ends = newlines + 1
+    if len(data) > 0 and data[-1] != ord("\n"):
+        line_ends = np.append(line_ends, len(data))
+    line_starts = np.concatenate([[0], line_ends[:-1]]).astype(np.int64)
+    
+    return line_starts, line_ends.astype(np.int64)
+
+def _columns(data: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray, start: int, end: int) -> np.ndarray:
+    """
+    About
+    ---------------
+    Slices the same columns out of many lines. Columns past the end of a line
+    (and line end characters) read as spaces.
+    
+    Returns
+    ---------------
+    np.ndarray
+        A column of fixed-width byte strings
+    """
+    
+    if len(line_starts) == 0:
+        return np.empty(0, dtype=f"S{end - start}")
+    
+    positions = line_starts[:, None] + np.arange(start, end)
+    inside = positions < line_ends[:, None]
+    values = np.where(inside, data[np.minimum(positions, len(data) - 1)], ord(" ")).astype(np.uint8)
+    values[(values == ord("\n")) | (values == ord("\r"))] = ord(" ")
+    
+    return np.ascontiguousarray(values).view(f"S{end - start}").ravel()
+
+def _index_lines(data: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray, stat: os.stat_result) -> RecordIndex:
+    """
+    About
+    ---------------
+    Turns the line offsets of a file into its index. Model boundaries follow
+    'ReadPDB.parse_lines': only coordinate lines up to the first MODEL, ENDMDL
+    or END record after the first coordinate line belong to the first model.
+    
+    Returns
+    ---------------
+    RecordIndex
+        The index of the file
+    """
+    
+    names = np.char.strip(_columns(data, line_starts, line_ends, 0, 6)).astype(str)
+    
+    is_coordinate = np.isin(names, list(COORDINATE_RECORDS))
+    is_boundary = np.isin(names, list(MODEL_BOUNDARY_RECORDS))
+    
+    # Models are the runs of coordinate lines between model boundaries
+    model_of_line = np.cumsum(is_boundary)
+    model_numbers = np.unique(model_of_line[is_coordinate])
+    num_models = max(len(model_numbers), 1)
+    
+    in_first_model = is_coordinate
+    if len(model_numbers) > 0:
+        in_first_model = is_coordinate & (model_of_line == model_numbers[0])
+    
+    # Residue blocks of the first model
+    lines = np.flatnonzero(in_first_model)
+    starts, ends = line_starts[lines], line_ends[lines]
+    keys = _columns(data, starts, ends, 21, 27)
+    
+    new_block = np.ones(len(lines), dtype=bool)
+    new_block[1:] = keys[1:] != keys[:-1]
+    first = np.flatnonzero(new_block)
+    last = np.append(first[1:] - 1, len(lines) - 1)
+    
+    first_keys = keys[first]
+    residue_chains = np.char.strip(_slice_bytes(first_keys, 0, 1)).astype(str)
+    # Blank residue numbers are NaN, stored as the smallest int64 so no range holds them
+    residue_numbers = _field_to_number(_slice_bytes(first_keys, 1, 5), np.float64)
+    residue_numbers = np.nan_to_num(residue_numbers, nan=np.iinfo(np.int64).min)
+    
+    # Every other line that is parsed into a table
+    record_lines = np.flatnonzero(np.isin(names, list(RECORD_TYPES - COORDINATE_RECORDS)) | (names == "HEADER"))
+    record_names = names[record_lines]
+    record_chains = np.full(len(record_lines), "", dtype="U1")
+    for record, column in RECORD_CHAIN_COLUMNS.items():
+        rows = np.flatnonzero(record_names == record)
+        chain_field = _columns(data, line_starts[record_lines[rows]], line_ends[record_lines[rows]], column, column + 1)
+        record_chains[rows] = np.char.strip(chain_field).astype(str)
+    
+    return RecordIndex({
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "num_models": num_models,
+        "residue_chains": residue_chains.astype("U1"),
+        "residue_numbers": np.asarray(residue_numbers, dtype=np.int64),
+        "residue_starts": starts[first],
+        "residue_ends": ends[last],
+        "record_names": record_names.astype("U6"),
+        "record_chains": record_chains,
+        "record_starts": line_starts[record_lines],
+        "record_ends": line_ends[record_lines],
+    })
+
+def _slice_bytes(field: np.ndarray, start: int, end: int) -> np.ndarray:
+    # Part of a column of fixed-width byte strings
+    width = field.dtype.itemsize
+    block = field.view("S1").reshape(len(field), width)
+    
+    return np.ascontiguousarray(block[:, start:end]).view(f"S{end - start}").ravel()
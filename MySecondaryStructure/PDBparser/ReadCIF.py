@@ -0,0 +1,572 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.PDBparser.ReadPDB import (ATOM_CHUNK_SIZE, ATOM_COLUMNS, HELIX_COLUMNS, SEQRES_COLUMNS,
+                                                    SHEET_COLUMNS, open_pdb)
+from MySecondaryStructure.Structures.X3D import Protein, TABLE_NAMES
+
+# Version of the tables this reader makes, part of the key of cached parses
+# (see 'Cache.ParseCache'). Change it whenever the parsed output changes.
+PARSER_VERSION = "cif-1"
+
+# Categories that are read and the tags kept from each with their type, 
+# every tag as str if None
+WANTED_CATEGORIES = {
+    "_entry": None,
+    "_entity_poly": {"entity_id": str, "pdbx_strand_id": str},
+    "_entity_poly_seq": {"entity_id": str, "num": np.int64, "mon_id": str},
+    "_struct_conf": None,
+    "_struct_sheet_range": None,
+    "_atom_site": {
+        "group_PDB": str, "id": np.int32, "type_symbol": str, "label_atom_id": str, "auth_atom_id": str, 
+        "label_alt_id": str, "label_comp_id": str, "auth_comp_id": str, "label_asym_id": str, "auth_asym_id": str, 
+        "label_seq_id": np.int32, "auth_seq_id": np.int32, "pdbx_PDB_ins_code": str, "Cartn_x": np.float32, 
+        "Cartn_y": np.float32, "Cartn_z": np.float32, "occupancy": np.float32, "B_iso_or_equiv": np.float32, 
+        "pdbx_formal_charge": str, "pdbx_PDB_model_num": str,
+    },
+}
+
+# Values that mark a missing ('?') or inapplicable ('.') item
+NULL_VALUES = ("?", ".")
+
+# Atom dataframe columns and the _atom_site tags they come from, the first
+# tag present in the file is used
+ATOM_SITE_TAGS = {
+    "Record Type":                      ("group_PDB",),
+    "Atom Serial Number":               ("id",),
+    "Atom Name":                        ("auth_atom_id", "label_atom_id"),
+    "Alternate Location Indicator":     ("label_alt_id",),
+    "Residue Name":                     ("auth_comp_id", "label_comp_id"),
+    "Chain Identifier":                 ("auth_asym_id", "label_asym_id"),
+    "Residue Sequence Number":          ("auth_seq_id", "label_seq_id"),
+    "Code for Insertions of Residues":  ("pdbx_PDB_ins_code",),
+    "X orthogonal Coordinate":          ("Cartn_x",),
+    "Y orthogonal Coordinate":          ("Cartn_y",),
+    "Z orthogonal Coordinate":          ("Cartn_z",),
+    "Occupancy":                        ("occupancy",),
+    "Temperature Factor":               ("B_iso_or_equiv",),
+    "Segment Identifier":               (),
+    "Element Symbol":                   ("type_symbol",),
+    "Charge":                           ("pdbx_formal_charge",),
+}
+
+# Helix and sheet dataframe columns and the _struct_conf and
+# _struct_sheet_range tags they come from
+STRUCT_CONF_TAGS = {
+    "Helix Identifier":                     ("pdbx_PDB_helix_id", "id"),
+    "Initial Residue Name":                 ("beg_auth_comp_id", "beg_label_comp_id"),
+    "1st Chain Identifier":                 ("beg_auth_asym_id", "beg_label_asym_id"),
+    "1st Residue Sequence Number":          ("beg_auth_seq_id", "beg_label_seq_id"),
+    "1st Code for Insertions of Residues":  ("pdbx_beg_PDB_ins_code",),
+    "Terminal Residue Name":                ("end_auth_comp_id", "end_label_comp_id"),
+    "2nd Chain Identifier":                 ("end_auth_asym_id", "end_label_asym_id"),
+    "2nd Residue Sequence Number":          ("end_auth_seq_id", "end_label_seq_id"),
+    "2nd Code for Insertions of Residues":  ("pdbx_end_PDB_ins_code",),
+    "Type of Helix":                        ("pdbx_PDB_helix_class",),
+    "Comment":                              ("details",),
+    "Length of Helix":                      ("pdbx_PDB_helix_length",),
+}
+
+SHEET_RANGE_TAGS = {
+    "Strand Number (Current Sheet)":        ("id",),
+    "Sheet Identifier":                     ("sheet_id",),
+    "Initial Residue Name":                 ("beg_auth_comp_id", "beg_label_comp_id"),
+    "1st Chain Identifier":                 ("beg_auth_asym_id", "beg_label_asym_id"),
+    "1st Residue Sequence Number":          ("beg_auth_seq_id", "beg_label_seq_id"),
+    "1st Code for Insertions of Residues":  ("pdbx_beg_PDB_ins_code",),
+    "Terminal Residue Name":                ("end_auth_comp_id", "end_label_comp_id"),
+    "2nd Chain Identifier":                 ("end_auth_asym_id", "end_label_asym_id"),
+    "2nd Residue Sequence Number":          ("end_auth_seq_id", "end_label_seq_id"),
+    "2nd Code for Insertions of Residues":  ("pdbx_end_PDB_ins_code",),
+}
+
+# A quoted value ends at a matching quote followed by whitespace
+TOKEN_PATTERN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+def read(file_path: str, summary: bool = False, cache=None, compact: bool = False) -> Protein:
+    """
+    About
+    ---------------
+    Reads an mmCIF (PDBx) file and formats the data in the same 'Protein'
+    object 'ReadPDB.read' makes, so structures too large for the PDB format
+    can be analysed the same way. Atoms come from '_atom_site', helices from
+    '_struct_conf', strands from '_struct_sheet_range' and the chain
+    sequences from '_entity_poly_seq'. The other tables are left empty.
+    
+    Parameters
+    ---------------
+    file_path : str
+        The path to the mmCIF file, which may be compressed
+    summary : bool
+        Stop reading at '_atom_site' when the categories read so far hold
+        the secondary structure and the chain sequences 'cmd_about' needs
+    cache : Cache.ParseCache
+        A parse cache for full parses (no 'summary'), which are loaded from
+        it or stored in it. It is not used with 'summary', since hashing the
+        file for the key would read all of it.
+    compact : bool
+        Store the tables with categorical text and 32-bit numbers (see
+        'Protein.compact')
+    
+    Return
+    ---------------
+    Protein
+        A Protein object containing the data from the mmCIF file
+    """
+    
+    # Only full parses are stored, so only they are looked up
+    use_cache = cache is not None and not summary
+    
+    if use_cache:
+        key = cache.key(file_path, PARSER_VERSION)
+        my_protein = cache.load(key)
+        if my_protein is not None:
+            if compact:
+                my_protein.compact()
+            return my_protein
+    
+    stop = _has_summary_categories if summary else None
+    with open_pdb(file_path) as file:
+        categories = read_categories(file, WANTED_CATEGORIES, stop)
+    
+    my_protein = build_protein(categories)
+    
+    if use_cache:
+        cache.store(key, my_protein)
+    
+    if compact:
+        my_protein.compact()
+    
+    return my_protein
+
+def read_categories(lines, wanted: dict, stop=None) -> dict:
+    """
+    About
+    ---------------
+    Tokenizes the categories of an mmCIF file one at a time. Lines of 
+    categories that are not wanted are skipped without being tokenized. The 
+    data lines of a wanted loop are kept raw and split in bulk every 
+    'ATOM_CHUNK_SIZE' lines, and each kept tag of the chunk is converted to 
+    a numpy array of its type right away, so the tokens of a large 
+    '_atom_site' loop are never all held as Python strings at once. Both 
+    'loop_' tables and single-row tag/value categories are read, and values 
+    may be quoted or be ';' text fields.
+    
+    Parameters
+    ---------------
+    lines : Iterable[str]
+        Lines of an mmCIF file, such as an open file object
+    wanted : dict
+        Category names and the tags to keep from each as a dictionary of tag 
+        name to numpy type (every tag as str if None)
+    stop : callable
+        Called with the category about to be read and the categories read so 
+        far, reading ends if it returns True
+    
+    Returns
+    ---------------
+    dict
+        Category name to a dictionary of tag name to value array
+    """
+    
+    categories = dict()
+    
+    category = None
+    tags = []
+    values = []
+    # Data lines of the current category that have not been tokenized yet
+    raw_lines = []
+    keep = False
+    in_loop = False
+    in_header = False
+    text = None
+    
+    def flush(final: bool):
+        # Moves the complete rows of the current category into arrays
+        nonlocal values, raw_lines
+        
+        if len(raw_lines) > 0:
+            values.extend(_tokenize_lines(raw_lines))
+            raw_lines = []
+        
+        if not keep or len(tags) == 0:
+            values = []
+            return
+        
+        num_rows = len(values) // len(tags)
+        if num_rows > 0 or final:
+            table = categories.setdefault(category, dict())
+            tag_types = wanted[category]
+            for i, tag in enumerate(tags):
+                if tag_types is None or tag in tag_types:
+                    chunk = values[i:num_rows * len(tags):len(tags)]
+                    table.setdefault(tag, []).append(_to_array(chunk, str if tag_types is None else tag_types[tag]))
+            values = values[num_rows * len(tags):]
+        
+        if final:
+            for tag, chunks in categories[category].items():
+                if isinstance(chunks, list):
+                    categories[category][tag] = np.concatenate(chunks)
+            values = []
+    
+    def start(new_category: str) -> bool:
+        # Begins a category, False if reading should stop instead
+        nonlocal category, tags, keep
+        
+        if keep:
+            flush(True)
+        if stop is not None and stop(new_category, categories):
+            return False
+        
+        category = new_category
+        tags = []
+        keep = new_category in wanted
+        
+        return True
+    
+    for line in lines:
+        # Multi-line text fields run from a line starting with ';' to the 
+        # next line starting with ';'
+        if text is not None:
+            if not line.startswith(";"):
+                text.append(line.rstrip("\r\n"))
+                continue
+            
+            if keep:
+                if len(raw_lines) > 0:
+                    values.extend(_tokenize_lines(raw_lines))
+                    raw_lines = []
+                values.append("\n".join(text))
+            text = None
+            line = line[1:]
+        
+        first = line[:1]
+        if first == " " or first == "\t":
+            line = line.lstrip()
+            first = line[:1]
+        
+        if first == ";":
+            text = [line[1:].rstrip("\r\n")]
+            in_header = False
+        
+        elif first == "_":
+            parts = line.split(None, 1)
+            tag_category, _, tag = parts[0].partition(".")
+            
+            if in_loop and in_header:
+                # First tag of a loop names its category
+                if category is None and not start(tag_category):
+                    break
+                tags.append(tag)
+                continue
+            
+            if in_loop or tag_category != category:
+                in_loop = False
+                if not start(tag_category):
+                    break
+            
+            tags.append(tag)
+            if keep and len(parts) > 1:
+                raw_lines.append(parts[1])
+        
+        elif first == "#" or first == "\n" or first == "\r" or first == "":
+            continue
+        
+        elif line.startswith("loop_"):
+            if keep:
+                flush(True)
+            keep = False
+            category = None
+            tags = []
+            in_loop = True
+            in_header = True
+        
+        elif line.startswith(("data_", "save_", "global_", "stop_")):
+            continue
+        
+        else:
+            in_header = False
+            if keep:
+                raw_lines.append(line)
+                if in_loop and len(raw_lines) == ATOM_CHUNK_SIZE:
+                    flush(False)
+    
+    else:
+        if keep:
+            flush(True)
+    
+    return categories
+
+def build_protein(categories: dict) -> Protein:
+    """
+    About
+    ---------------
+    Turns the categories read by 'read_categories' into a 'Protein'. Only
+    the first model of an ensemble goes into the atom dataframe, as with
+    'ReadPDB.parse_lines'.
+    
+    Parameters
+    ---------------
+    categories : dict
+        Category name to a dictionary of tag name to value array
+    
+    Returns
+    ---------------
+    Protein
+        A protein object filled with data from the categories
+    """
+    
+    atom_df, num_models = _atom_table(categories.get("_atom_site", dict()))
+    
+    tables = {table_name: pd.DataFrame() for table_name in TABLE_NAMES}
+    tables["atom_df"] = atom_df
+    tables["helix_df"] = _helix_table(categories.get("_struct_conf", dict()))
+    tables["sheet_df"] = _sheet_table(categories.get("_struct_sheet_range", dict()))
+    tables["seqres_df"] = _seqres_table(categories.get("_entity_poly_seq", dict()), categories.get("_entity_poly", dict()))
+    
+    name = ""
+    entry = categories.get("_entry", dict())
+    if "id" in entry and len(entry["id"]) > 0:
+        name = str(entry["id"][0])
+    
+    return Protein(**tables, name=name, num_models=num_models)
+
+def _tokenize_lines(lines: list) -> list:
+    # Quoted values are rare, so most chunks are split in one call without 
+    # the regex
+    joined = " ".join(lines)
+    if "'" not in joined and '"' not in joined:
+        return joined.split()
+    
+    tokens = []
+    for line in lines:
+        if "'" not in line and '"' not in line:
+            tokens.extend(line.split())
+        else:
+            tokens.extend(match.group(match.lastindex) for match in TOKEN_PATTERN.finditer(line))
+    
+    return tokens
+
+def _to_array(values: list, dtype) -> np.ndarray:
+    # Converts value strings, missing numbers go through '_number'
+    if dtype is str:
+        return np.array(values, dtype=str)
+    
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        return _number(np.array(values, dtype=str), dtype)
+
+def _has_summary_categories(category: str, categories: dict) -> bool:
+    # Coordinates are only needed when the file gives no secondary structure
+    # or no chain sequences
+    return (category == "_atom_site" and "_entity_poly_seq" in categories
+            and ("_struct_conf" in categories or "_struct_sheet_range" in categories))
+
+def _column(table: dict, tags: tuple, num_rows: int) -> np.ndarray:
+    # Values of the first of 'tags' in the table, blanks if none is there
+    for tag in tags:
+        if tag in table:
+            return table[tag]
+    
+    return np.full(num_rows, "", dtype=str)
+
+def _text(column: np.ndarray) -> np.ndarray:
+    return np.where(np.isin(column, NULL_VALUES), "", column)
+
+def _number(column: np.ndarray, dtype, nullable: bool = False) -> np.ndarray:
+    """
+    About
+    ---------------
+    Converts a column of value strings to numbers. Missing values fall back
+    to pandas and become NaN, like blank fields of a PDB file. Integers with
+    missing values stay floats, or with 'nullable' become the nullable pandas
+    type of the same width ('Int32' for np.int32) like the atom columns of
+    'ReadPDB._field_to_number'.
+    
+    Parameters
+    ---------------
+    column : np.ndarray
+        A column of value strings, or of numbers already converted by 
+        '_to_array'
+    dtype
+        The numpy type to convert to
+    nullable : bool
+        Give integers with missing values the nullable pandas type
+    
+    Returns
+    ---------------
+    np.ndarray or pd.arrays.IntegerArray
+        The converted column
+    """
+    
+    if column.dtype.kind != "f":
+        try:
+            return column.astype(dtype)
+        except ValueError:
+            column = np.asarray(pd.to_numeric(_text(column)))
+    
+    if not np.issubdtype(dtype, np.integer) or column.dtype.kind != "f" or not np.isnan(column).any():
+        return column.astype(dtype)
+    if nullable:
+        return pd.array(column, dtype=np.dtype(dtype).name.capitalize())
+    
+    return column
+
+def _table(table: dict, tags: dict, columns: list, num_rows: int, fixed: dict) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Lays out a category in the columns of a PDB record table.
+    
+    Parameters
+    ---------------
+    table : dict
+        Tag name to value array
+    tags : dict
+        Column name to the tags it may come from
+    columns : list
+        The record layout, such as 'HELIX_COLUMNS'
+    num_rows : int
+        Number of rows of the table
+    fixed : dict
+        Columns that are given directly
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with the columns of the record layout
+    """
+    
+    df = dict()
+    for col_name, _, _, col_type in columns:
+        if col_name in fixed:
+            df[col_name] = fixed[col_name]
+            continue
+        
+        column = _column(table, tags.get(col_name, ()), num_rows)
+        if col_type == "Int" or col_type == "Float":
+            df[col_name] = _number(column, np.int64 if col_type == "Int" else np.float64)
+        else:
+            df[col_name] = _text(column)
+    
+    return pd.DataFrame(df)
+
+def _atom_table(site: dict):
+    # Atom dataframe of the first model and the number of models
+    if len(site) == 0:
+        return pd.DataFrame(), 1
+    
+    num_rows = len(next(iter(site.values())))
+    
+    num_models = 1
+    if "pdbx_PDB_model_num" in site:
+        models = site["pdbx_PDB_model_num"]
+        num_models = len(np.unique(models))
+        first_model = models == models[0]
+        if num_models > 1:
+            site = {tag: column[first_model] for tag, column in site.items()}
+            num_rows = int(first_model.sum())
+    
+    columns = dict()
+    for col_name, _, _, col_type in ATOM_COLUMNS:
+        column = _column(site, ATOM_SITE_TAGS[col_name], num_rows)
+        if col_type == "Int":
+            columns[col_name] = _number(column, np.int32, nullable=True)
+        elif col_type == "Float":
+            columns[col_name] = _number(column, np.float32)
+        else:
+            columns[col_name] = _text(column)
+    
+    return pd.DataFrame(columns), num_models
+
+def _helix_table(conf: dict) -> pd.DataFrame:
+    if len(conf) == 0:
+        return pd.DataFrame()
+    
+    # '_struct_conf' also lists turns and other conformations
+    helices = np.char.startswith(_column(conf, ("conf_type_id",), 0), "HELX")
+    conf = {tag: column[helices] for tag, column in conf.items()}
+    num_rows = int(helices.sum())
+    if num_rows == 0:
+        return pd.DataFrame()
+    
+    return _table(conf, STRUCT_CONF_TAGS, HELIX_COLUMNS, num_rows, {
+        "Record Type": np.full(num_rows, "HELIX"),
+        "Helix Serial Number": np.arange(1, num_rows + 1, dtype=np.int64),
+    })
+
+def _sheet_table(sheet_range: dict) -> pd.DataFrame:
+    if len(sheet_range) == 0:
+        return pd.DataFrame()
+    
+    num_rows = len(next(iter(sheet_range.values())))
+    _, sheet_index, strand_counts = np.unique(_column(sheet_range, ("sheet_id",), num_rows), return_inverse=True, return_counts=True)
+    
+    return _table(sheet_range, SHEET_RANGE_TAGS, SHEET_COLUMNS, num_rows, {
+        "Record Type": np.full(num_rows, "SHEET"),
+        "Number of Strands (Current Sheet)": strand_counts[sheet_index].astype(np.int64),
+    })
+
+def _seqres_table(poly_seq: dict, poly: dict) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Lays out the sequence of every polymer chain as SEQRES records, 13
+    residues to a row.
+    
+    Parameters
+    ---------------
+    poly_seq : dict
+        The '_entity_poly_seq' category
+    poly : dict
+        The '_entity_poly' category, which names the chains of each entity
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with the columns of 'SEQRES_COLUMNS'
+    """
+    
+    if len(poly_seq) == 0:
+        return pd.DataFrame()
+    
+    entity_ids = poly_seq["entity_id"]
+    numbers = _number(poly_seq["num"], np.int64)
+    residues = poly_seq["mon_id"]
+    
+    # Microheterogeneity lists more than one residue at a position, the
+    # first one is kept
+    order = np.lexsort((numbers, entity_ids))
+    entity_ids, numbers, residues = entity_ids[order], numbers[order], residues[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (entity_ids[1:] != entity_ids[:-1]) | (numbers[1:] != numbers[:-1])
+    entity_ids, residues = entity_ids[keep], residues[keep]
+    
+    strands = dict()
+    for entity_id, strand_ids in zip(poly.get("entity_id", []), poly.get("pdbx_strand_id", [])):
+        strands[entity_id] = [s.strip() for s in strand_ids.split(",") if s.strip() not in ("", "?", ".")]
+    
+    name_columns = [col_name for col_name, _, _, _ in SEQRES_COLUMNS[4:]]
+    rows = {col_name: [] for col_name, _, _, _ in SEQRES_COLUMNS}
+    
+    for entity_id in pd.unique(entity_ids):
+        sequence = residues[entity_ids == entity_id]
+        num_lines = -(-len(sequence) // len(name_columns))
+        padded = np.full(num_lines * len(name_columns), "", dtype=sequence.dtype)
+        padded[:len(sequence)] = sequence
+        padded = padded.reshape(num_lines, len(name_columns))
+        
+        for chain_id in strands.get(entity_id) or [entity_id]:
+            rows["Record Type"].append(np.full(num_lines, "SEQRES"))
+            rows["Serial Number"].append(np.arange(1, num_lines + 1, dtype=np.int64))
+            rows["Chain Identifier"].append(np.full(num_lines, chain_id))
+            rows["Number of Residuals"].append(np.full(num_lines, len(sequence), dtype=np.int64))
+            for i, col_name in enumerate(name_columns):
+                rows[col_name].append(padded[:, i])
+    
+    return pd.DataFrame({col_name: np.concatenate(columns) for col_name, columns in rows.items()})
@@ -1,8 +1,254 @@
-import pandas as pd
+from __future__ import annotations
 
-from MySecondaryStructure.Structures.X3D import Protein
+import bz2
+import gzip
+import lzma
+from functools import partial
+from typing import Iterable
 
-def read(file_path: str) -> Protein:
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures.X3D import COORDINATE_COLUMNS, Protein
+
+# Version of the tables this parser makes, part of the key of cached parses 
+# (see 'Cache.ParseCache'). Change it whenever the parsed output changes.
+PARSER_VERSION = "2"
+
+# Fixed-width layout of ATOM/HETATM records (column name, start, end, type)
+# Everything that is not 'Int' or 'Float' is str
+ATOM_COLUMNS = [
+    ("Record Type",                         0,  6,  "Str"),
+    ("Atom Serial Number",                  6,  11, "Int"),
+    ("Atom Name",                           12, 16, "Str"),
+    ("Alternate Location Indicator",        16, 17, "Str"),
+    ("Residue Name",                        17, 20, "Str"),
+    ("Chain Identifier",                    21, 22, "Str"),
+    ("Residue Sequence Number",             22, 26, "Int"),
+    ("Code for Insertions of Residues",     26, 27, "Str"),
+    ("X orthogonal Coordinate",             30, 38, "Float"),
+    ("Y orthogonal Coordinate",             38, 46, "Float"),
+    ("Z orthogonal Coordinate",             46, 54, "Float"),
+    ("Occupancy",                           54, 60, "Float"),
+    ("Temperature Factor",                  60, 66, "Float"),
+    ("Segment Identifier",                  72, 76, "Str"),
+    ("Element Symbol",                      76, 78, "Str"),
+    ("Charge",                              78, 80, "Str"),
+]
+
+# Fixed-width layout of the other records that are turned into tables
+HELIX_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Helix Serial Number",                     7,  10, "Int"),
+    ("Helix Identifier",                        11, 14, "Str"),
+    ("Initial Residue Name",                    15, 18, "Str"),
+    ("1st Chain Identifier",                    19, 20, "Str"),
+    ("1st Residue Sequence Number",             21, 25, "Int"),
+    ("1st Code for Insertions of Residues",     25, 26, "Str"),
+    ("Terminal Residue Name",                   27, 30, "Str"),
+    ("2nd Chain Identifier",                    31, 32, "Str"),
+    ("2nd Residue Sequence Number",             33, 37, "Int"),
+    ("2nd Code for Insertions of Residues",     37, 38, "Str"),
+    ("Type of Helix",                           38, 40, "Int"),
+    ("Comment",                                 40, 70, "Str"),
+    ("Length of Helix",                         71, 76, "Int"),
+]
+
+SHEET_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Strand Number (Current Sheet)",           7,  10, "Int"),
+    ("Sheet Identifier",                        11, 14, "Str"),
+    ("Number of Strands (Current Sheet)",       14, 16, "Int"),
+    ("Initial Residue Name",                    17, 20, "Str"),
+    ("1st Chain Identifier",                    21, 22, "Str"),
+    ("1st Residue Sequence Number",             22, 26, "Int"),
+    ("1st Code for Insertions of Residues",     26, 27, "Str"),
+    ("Terminal Residue Name",                   28, 31, "Str"),
+    ("2nd Chain Identifier",                    32, 33, "Str"),
+    ("2nd Residue Sequence Number",             33, 37, "Int"),
+    ("2nd Code for Insertions of Residues",     37, 38, "Str"),
+    ("Strand Sense with Respect to Previous",   38, 40, "Int"),
+    ("HB 1st Atom Name",                        41, 45, "Str"),
+    ("HB 1st Residue Name",                     45, 48, "Str"),
+    ("HB 1st Chain Identifier",                 49, 50, "Str"),
+    ("HB 1st Residue Sequence Number",          50, 54, "Int"),
+    ("HB 1st Code for Insertions of Residues",  54, 55, "Str"),
+    ("HB 2nd Atom Name",                        56, 60, "Str"),
+    ("HB 2nd Residue Name",                     60, 63, "Str"),
+    ("HB 2nd Chain Identifier",                 64, 65, "Str"),
+    ("HB 2nd Residue Sequence Number",          65, 69, "Int"),
+    ("HB 2nd Code for Insertions of Residues",  69, 70, "Str"),
+]
+
+SSBOND_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Serial Number",                           7,  10, "Int"),
+    ("1st Residue Name",                        11, 14, "Str"),
+    ("1st Chain Identifier",                    15, 16, "Str"),
+    ("1st Residue Sequence Number",             17, 21, "Int"),
+    ("1st Code for Insertions of Residues",     21, 22, "Str"),
+    ("2nd Residue Name",                        25, 28, "Str"),
+    ("2nd Chain Identifier",                    29, 30, "Str"),
+    ("2nd Residue Sequence Number",             31, 35, "Int"),
+    ("2nd Code for Insertions of Residues",     35, 36, "Str"),
+    ("Symmetry Operator for 1st Residue",       59, 65, "Int"),
+    ("Symmetry Operator for 2nd Residue",       66, 72, "Int"),
+    ("Length of Disulfide Bond",                73, 78, "Float"),
+]
+
+CONECT_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Atom Serial Number",                      6,  11, "Int"),
+    ("Bonded Atom 1 Serial Number",             11, 16, "Int"),
+    ("Bonded Atom 2 Serial Number",             16, 21, "Int"),
+    ("Bonded Atom 3 Serial Number",             21, 26, "Int"),
+    ("Bonded Atom 4 Serial Number",             26, 31, "Int"),
+    ("Hydrogen Bonded Atom 1 Serial Number",    31, 36, "Int"),
+    ("Hydrogen Bonded Atom 2 Serial Number",    36, 41, "Int"),
+    ("Salt Bridged Atom 1 Serial Number",       41, 46, "Int"),
+    ("Hydrogen Bonded Atom 3 Serial Number",    46, 51, "Int"),
+    ("Hydrogen Bonded Atom 4 Serial Number",    51, 56, "Int"),
+    ("Salt Bridged Atom 2 Serial Number",       56, 61, "Int"),
+]
+
+HET_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Het ID",                                  7,  10, "Str"),
+    ("Chain ID",                                12, 13, "Str"),
+    ("Sequence Number",                         13, 17, "Int"),
+    ("Insertion Code",                          17, 18, "Str"),
+    ("Number of HETATM Atoms",                  20, 25, "Int"),
+    ("Description",                             30, 70, "Str"),
+]
+
+HETNAM_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Continuation",                            8,  10, "Str"),
+    ("Het ID",                                  11, 14, "Str"),
+    ("Chemical Name",                           15, 70, "Str"),
+]
+
+HETSYN_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Continuation",                            8,  10, "Str"),
+    ("Het ID",                                  11, 14, "Str"),
+    ("Het Synonyms",                            15, 70, "Str"),
+]
+
+FORMUL_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Component Number",                        8,  10, "Int"),
+    ("Het ID",                                  12, 15, "Str"),
+    ("Continuation Number",                     16, 18, "Int"),
+    ("Asterisk (Water)",                        18, 19, "Str"),
+    ("Chemical Formula",                        19, 70, "Str"),
+]
+
+LINK_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("1st Atom Name",                           12, 16, "Str"),
+    ("1st Alternate location indicator",        16, 17, "Str"),
+    ("1st Residue Name",                        17, 20, "Str"),
+    ("1st Chain Identifier",                    21, 22, "Str"),
+    ("1st Residue Sequence Number",             22, 26, "Int"),
+    ("1st Insertion Code",                      26, 27, "Str"),
+    ("2nd Atom Name",                           42, 46, "Str"),
+    ("2nd Alternate location indicator",        46, 47, "Str"),
+    ("2nd Residue Name",                        47, 50, "Str"),
+    ("2nd Chain Identifier",                    51, 52, "Str"),
+    ("2nd Residue Sequence Number",             52, 56, "Int"),
+    ("2nd Insertion Code",                      56, 57, "Str"),
+    ("1st Atom Symmetry Operator",              59, 65, "Str"),
+    ("2nd Atom Symmetry Operator",              66, 72, "Str"),
+    ("Link Distance",                           73, 78, "Float"),
+]
+
+CISPEP_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Record Serial Number",                    7,  10, "Int"),
+    ("1st Residue Name",                        11, 14, "Str"),
+    ("1st Chain Identifier",                    15, 16, "Str"),
+    ("1st Residue Sequence Number",             17, 21, "Int"),
+    ("1st Insertion Code",                      21, 22, "Str"),
+    ("2nd Residue Name",                        25, 28, "Str"),
+    ("2nd Chain Identifier",                    29, 30, "Str"),
+    ("2nd Residue Sequence Number",             31, 35, "Int"),
+    ("2nd Insertion Code",                      35, 36, "Str"),
+    ("Specific Model",                          43, 46, "Str"),
+    ("Angle Measurment (Deg)",                  53, 59, "Float"),
+]
+
+SEQRES_COLUMNS = [
+    ("Record Type",                             0,  6,  "Str"),
+    ("Serial Number",                           7,  10, "Int"),
+    ("Chain Identifier",                        11, 12, "Str"),
+    ("Number of Residuals",                     13, 17, "Int"),
+    ("1st Residual Name",                       21, 22, "Str"),
+    ("2nd Residual Name",                       23, 26, "Str"),
+    ("3rd Residual Name",                       27, 30, "Str"),
+    ("4th Residual Name",                       31, 34, "Str"),
+    ("5th Residual Name",                       35, 38, "Str"),
+    ("6th Residual Name",                       39, 42, "Str"),
+    ("7th Residual Name",                       43, 46, "Str"),
+    ("8th Residual Name",                       47, 50, "Str"),
+    ("9th Residual Name",                       51, 54, "Str"),
+    ("10th Residual Name",                      55, 58, "Str"),
+    ("11th Residual Name",                      59, 62, "Str"),
+    ("12th Residual Name",                      63, 66, "Str"),
+    ("13th Residual Name",                      67, 70, "Str"),
+]
+
+# Layout of every record type that is kept as raw lines until its table is 
+# first asked for, with the 'Protein' table it goes into
+RECORD_COLUMNS = {
+    "HELIX":    ("helix_df", HELIX_COLUMNS),
+    "SHEET":    ("sheet_df", SHEET_COLUMNS),
+    "SSBOND":   ("ssbond_df", SSBOND_COLUMNS),
+    "CONECT":   ("conect_df", CONECT_COLUMNS),
+    "HET":      ("het_df", HET_COLUMNS),
+    "HETNAM":   ("hetnam_df", HETNAM_COLUMNS),
+    "HETSYN":   ("hetsyn_df", HETSYN_COLUMNS),
+    "FORMUL":   ("formul_df", FORMUL_COLUMNS),
+    "LINK":     ("link_df", LINK_COLUMNS),
+    "CISPEP":   ("cispep_df", CISPEP_COLUMNS),
+    "SEQRES":   ("seqres_df", SEQRES_COLUMNS),
+}
+
+# Width of a PDB record line
+RECORD_WIDTH = 80
+
+# Record types 'parse_lines' knows how to parse
+RECORD_TYPES = frozenset({
+    "ATOM", "HETATM", "HELIX", "SHEET", "SSBOND", "CONECT", "HET", 
+    "HETNAM", "HETSYN", "FORMUL", "LINK", "CISPEP", "SEQRES", "HEADER"
+})
+
+# Records used by 'Protein.cmd_about'
+SUMMARY_RECORDS = frozenset({"HEADER", "HELIX", "SHEET", "SEQRES"})
+
+# Records holding atom coordinates
+COORDINATE_RECORDS = frozenset({"ATOM", "HETATM"})
+
+# Records between two models of an ensemble or frames of a trajectory. A
+# MODEL record starts a new model even if the one before it has no ENDMDL.
+MODEL_BOUNDARY_RECORDS = frozenset({"MODEL", "ENDMDL", "END"})
+
+# Records that come after the coordinate section of a PDB file
+TRAILING_RECORDS = frozenset({"CONECT"})
+
+# Leading bytes of compressed files and the function that opens them as a 
+# decompressing stream
+COMPRESSION_MAGIC = (
+    (b"\x1f\x8b",          gzip.open),
+    (b"BZh",               bz2.open),
+    (b"\xfd7zXZ\x00",      lzma.open),
+)
+
+# Number of coordinate lines held as Python strings before they are packed 
+# into a fixed-width byte block
+ATOM_CHUNK_SIZE = 65536
+
+def read(file_path: str, records: Iterable[str] = None, summary: bool = False, cache=None, compact: bool = False) -> Protein:
     """
     About
     ---------------
@@ -12,6 +258,18 @@ def read(file_path: str) -> Protein:
     ---------------
     file_path : str
         The path to the PDB file
+    records : Iterable[str]
+        Record types to parse (see 'RECORD_TYPES'), all of them if None
+    summary : bool
+        Stop reading at the coordinate section when the records parsed so far 
+        are all 'cmd_about' needs (see 'parse_lines')
+    cache : Cache.ParseCache
+        A parse cache for full parses (no 'records'), which are loaded from 
+        it or stored in it. It is not used when 'records' is given, since 
+        hashing the file for the key would read all of it.
+    compact : bool
+        Store the tables with categorical text and 32-bit numbers (see 
+        'Protein.compact')
     
     Return
     ---------------
@@ -19,11 +277,58 @@ def read(file_path: str) -> Protein:
         A Protein object containing the data from the PDB file found at filepath
     """
     
-    raw_PDB = get_raw_PDB(file_path)
-    my_protein = process_raw(raw_PDB)
+    # Only full parses are stored, so only they are looked up
+    use_cache = cache is not None and records is None
+    
+    if use_cache:
+        key = cache.key(file_path, PARSER_VERSION)
+        my_protein = cache.load(key)
+        if my_protein is not None:
+            if compact:
+                my_protein.compact()
+            return my_protein
+    
+    # Lines are fed straight from the open file into the record dispatcher so 
+    # the whole file is never held in memory as a string
+    with open_pdb(file_path) as file:
+        my_protein = parse_lines(file, records, summary)
+    
+    if use_cache:
+        cache.store(key, my_protein)
+    
+    if compact:
+        my_protein.compact()
     
     return my_protein
 
+def open_pdb(file_path: str):
+    """
+    About
+    ---------------
+    Opens a PDB file for reading text. Files compressed with gzip, bzip2 or 
+    xz are recognised by their leading bytes and decompressed as they are 
+    read, without an uncompressed copy ever being written.
+    
+    Parameters
+    ---------------
+    file_path : str
+        The path to the PDB file
+    
+    Returns
+    ---------------
+    TextIO
+        A text stream over the (decompressed) file
+    """
+    
+    with open(file_path, "rb") as file:
+        magic = file.read(6)
+    
+    for prefix, open_compressed in COMPRESSION_MAGIC:
+        if magic.startswith(prefix):
+            return open_compressed(file_path, "rt")
+    
+    return open(file_path, "r")
+
 # Gets all data from a pdb file and puts it into a string       
 def get_raw_PDB(file_path: str) -> str:
     """
@@ -42,14 +347,12 @@ def get_raw_PDB(file_path: str) -> str:
         A string containing the contents of the PDB file
     """
     
-    raw_PDB = ""
-    with open(file_path, "r") as file:
-        for line in file.readlines():
-            raw_PDB += line
+    with open_pdb(file_path) as file:
+        raw_PDB = file.read()
     
     return raw_PDB
 
-def process_raw(raw_PDB: str) -> Protein:    
+def process_raw(raw_PDB: str, records: Iterable[str] = None) -> Protein:    
     """
     About
     ---------------
@@ -59,400 +362,247 @@ def process_raw(raw_PDB: str) -> Protein:
     ---------------
     raw_PDB : str
         Entire PDB file in a single variable
-        
+    records : Iterable[str]
+        Record types to parse (see 'RECORD_TYPES'), all of them if None
+    
     Returns
     ---------------
     Protein
         A protein object filled with data from the raw PDB file
     """
     
-    atom_list = []
-    helix_list = []
-    sheet_list = []
-    ssbond_list = []
-    conect_list = []
-    het_list = []
-    hetnam_list = []
-    hetsyn_list = []
-    formul_list = []
-    link_list = []
-    cispep_list = []
-    seqres_list = []
+    return parse_lines(raw_PDB.splitlines(), records)
+
+def parse_lines(lines: Iterable[str], records: Iterable[str] = None, summary: bool = False) -> Protein:
+    """
+    About
+    ---------------
+    Dispatches PDB lines to their record parsers one line at a time and 
+    turns the result into a 'Protein' object. Coordinate lines are packed 
+    into fixed-width byte blocks as they arrive, so memory follows the 
+    size of the parsed tables instead of the size of the file.
+    
+    Record types missing from 'records' are skipped without being sliced. If 
+    neither ATOM nor HETATM is wanted, coordinate lines only feed a set of 
+    chain IDs and a count of ATOM serial numbers. With 'summary' set, reading 
+    stops at the first coordinate line once the file has shown SEQRES 
+    records, since the chains then come from SEQRES and the chain IDs and 
+    atom count are unused by 'cmd_about' ('num_atoms' is left as None). If 
+    the file has neither HELIX nor SHEET records the coordinates are parsed 
+    instead, because the secondary structure has to be assigned from them.
+    
+    Only the atoms of the first model of an ensemble (coordinate lines up to 
+    the first MODEL, ENDMDL or END record after them) go into the atom 
+    dataframe. The other 
+    models are counted in 'Protein.num_models' and can be read one at a time 
+    with 'iter_models'.
+    
+    Parameters
+    ---------------
+    lines : Iterable[str]
+        Lines of a PDB file, such as an open file object
+    records : Iterable[str]
+        Record types to parse (see 'RECORD_TYPES'), all of them if None
+    summary : bool
+        Allow stopping at the coordinate section as described above
+    
+    Returns
+    ---------------
+    Protein
+        A protein object filled with data from the PDB lines
+    """
+    
+    atom_lines = []
+    atom_blocks = []
+    # Raw lines of every other record type, only sliced into a table when 
+    # the 'Protein' attribute is first read
+    record_lines = {record: [] for record in RECORD_COLUMNS}
     
     name = ""
     
+    wanted = RECORD_TYPES if records is None else RECORD_TYPES & frozenset(records)
+    parse_coordinates = len(wanted & COORDINATE_RECORDS) > 0
+    can_stop_early = summary and not parse_coordinates and not (wanted & TRAILING_RECORDS)
+    
+    # Cheap stand-ins for the atom dataframe when coordinates are skipped
+    chain_ids = None
+    atom_serials = None
+    if not parse_coordinates:
+        chain_ids = dict()
+        atom_serials = set()
+    
+    num_models = 0
+    in_model = False
+    
     # Line elements are split according to https://www.cgl.ucsf.edu/chimera/docs/UsersGuide/tutorials/pdbintro.html
     # Get atom positions and secondary structure information from the PDB file
-    for line in raw_PDB.split("\n"):
+    for line in lines:
+        line = line.rstrip("\r\n")
+        record = line[:6].rstrip()
+        
+        if record == "ATOM" or record == "HETATM":
+            if not in_model:
+                num_models += 1
+                in_model = True
+            if num_models > 1:
+                continue
+        elif record in MODEL_BOUNDARY_RECORDS:
+            in_model = False
+            continue
+        
+        if record not in wanted:
+            if (record != "ATOM" and record != "HETATM") or parse_coordinates:
+                continue
+            
+            if summary and len(record_lines["HELIX"]) == 0 and len(record_lines["SHEET"]) == 0:
+                # Without HELIX and SHEET records the secondary structure is 
+                # assigned from the coordinates, so they are parsed after all
+                wanted = wanted | COORDINATE_RECORDS
+                parse_coordinates = True
+                chain_ids = None
+                atom_serials = None
+            elif can_stop_early and len(record_lines["SEQRES"]) > 0:
+                chain_ids = None
+                atom_serials = None
+                num_models = None
+                break
+            else:
+                chain_ids[line[21:22].strip()] = None
+                if record == "ATOM":
+                    atom_serials.add(line[6:11])
+                continue
+        
         # Atom information and Hetatm information
         # Hetatm being atoms that are in non-standard residues
-        if line[:4] == "ATOM" or line[:6] == "HETATM":
-            atom_type = "ATOM"
-            if line[:6] == "HETATM":
-                atom_type = "HETATM"
-            
-            line_dict = {
-                "Record Type": atom_type,
-                "Atom Serial Number": line[6:11].strip(),
-                "Atom Name": line[12:16].strip(), 
-                "Alternate Location Indicator": line[16].strip(), 
-                "Residue Name": line[17:20].strip(), 
-                "Chain Identifier": line[21].strip(), 
-                "Residue Sequence Number": line[22:26].strip(), 
-                "Code for Insertions of Residues": line[26].strip(),
-                "X orthogonal Coordinate": line[30:38].strip(), 
-                "Y orthogonal Coordinate": line[38:46].strip(), 
-                "Z orthogonal Coordinate": line[46:54].strip(), 
-                "Occupancy": line[54:60].strip(), 
-                "Temperature Factor": line[60:66].strip(), 
-                "Segment Identifier": line[72:76].strip(), 
-                "Element Symbol": line[76:78].strip(), 
-                "Charge": line[78:80].strip()
-            }
-            
-            atom_list.append(line_dict)
-            
-        elif line[:5] == "HELIX":
-            line_dict = {
-                "Record Type": "HELIX",
-                "Helix Serial Number": line[7:10].strip(),
-                "Helix Identifier": line[11:14].strip(),
-                "Initial Residue Name": line[15:18].strip(),
-                "1st Chain Identifier": line[19].strip(),
-                "1st Residue Sequence Number": line[21:25].strip(),
-                "1st Code for Insertions of Residues": line[25].strip(),
-                "Terminal Residue Name": line[27:30].strip(),
-                "2nd Chain Identifier": line[31].strip(),
-                "2nd Residue Sequence Number": line[33:37].strip(),
-                "2nd Code for Insertions of Residues": line[37].strip(),
-                "Type of Helix": line[38:40].strip(),
-                "Comment": line[40:70].strip(),
-                "Length of Helix": line[71:76].strip()
-            }
-
-            helix_list.append(line_dict)
-            
-        elif line[:5] == "SHEET":
-            line_dict = {
-                "Record Type": "SHEET",
-                "Strand Number (Current Sheet)": line[7:10].strip(),
-                "Sheet Identifier": line[11:14].strip(),
-                "Number of Strands (Current Sheet)": line[14:16].strip(),
-                "Initial Residue Name": line[17:20],
-                "1st Chain Identifier": line[21].strip(),
-                "1st Residue Sequence Number": line[22:26].strip(),
-                "1st Code for Insertions of Residues": line[26].strip(),
-                "Terminal Residue Name": line[28:31].strip(),
-                "2nd Chain Identifier": line[32].strip(),
-                "2nd Residue Sequence Number": line[33:37].strip(),
-                "2nd Code for Insertions of Residues": line[37].strip(),
-                "Strand Sense with Respect to Previous": line [38:40].strip(),
-                # The following fields identify two atoms invovled in a 
-                # hydrogen bond
-                "HB 1st Atom Name": line[41:45].strip(),
-                "HB 1st Residue Name": line[45:48].strip(),
-                "HB 1st Chain Identifier": line[49].strip(),
-                "HB 1st Residue Sequence Number": line[50:54].strip(),
-                "HB 1st Code for Insertions of Residues": line[54].strip(),
-                "HB 2nd Atom Name": line[56:60].strip(),
-                "HB 2nd Residue Name": line[60:63].strip(),
-                "HB 2nd Chain Identifier": line[64].strip(),
-                "HB 2nd Residue Sequence Number": line[65:69].strip(),
-                "HB 2nd Code for Insertions of Residues": line[69].strip()
-            }
-            
-            sheet_list.append(line_dict)
-            
-        elif line[:6] == "SSBOND":
-            line_dict = {
-                "Record Type": "SSBOND",
-                "Serial Number": line[7:10].strip(),
-                "1st Residue Name": line[11:14].strip(),
-                "1st Chain Identifier": line[15].strip(),
-                "1st Residue Sequence Number": line[17:21].strip(),
-                "1st Code for Insertions of Residues": line[21].strip(),
-                "2nd Residue Name": line[25:28].strip(),
-                "2nd Chain Identifier": line[29].strip(),
-                "2nd Residue Sequence Number": line[31:35].strip(),
-                "2nd Code for Insertions of Residues": line[35].strip(),
-                "Symmetry Operator for 1st Residue": line[59:65].strip(),
-                "Symmetry Operator for 2nd Residue": line[66:72].strip(),
-                "Length of Disulfide Bond": line[73:78].strip()
-            }
-
-            ssbond_list.append(line_dict)
-            
-        elif line[:6] == "CONECT":
-            line_dict = {
-                "Record Type": "CONECT",
-                "Atom Serial Number": line[6:11].strip(),
-                "Bonded Atom 1 Serial Number": line[11:16].strip(),
-                "Bonded Atom 2 Serial Number": line[16:21].strip(),
-                "Bonded Atom 3 Serial Number": line[21:26].strip(),
-                "Bonded Atom 4 Serial Number": line[26:31].strip(),
-                "Hydrogen Bonded Atom 1 Serial Number": line[31:36].strip(),
-                "Hydrogen Bonded Atom 2 Serial Number": line[36:41].strip(),
-                "Salt Bridged Atom 1 Serial Number": line[41:46].strip(),
-                "Hydrogen Bonded Atom 3 Serial Number": line[46:51].strip(),
-                "Hydrogen Bonded Atom 4 Serial Number": line[51:56].strip(),
-                "Salt Bridged Atom 2 Serial Number": line[56:61].strip()
-            }
-            
-            conect_list.append(line_dict)
-    
-        elif line[:6] == "HET   ":
-            line_dict = {
-                "Record Type": "HET",
-                "Het ID": line[7:10].strip(),
-                "Chain ID": line[12].strip(),
-                "Sequence Number": line[13:17].strip(),
-                "Insertion Code": line[17].strip(),
-                "Number of HETATM Atoms": line[20:25].strip(),
-                "Description": line[30:70].strip()
-            }
-            
-            het_list.append(line_dict)
-       
-        elif line[:6] == "HETNAM":
-            line_dict = {
-                "Record Type": "HETNAM",
-                "Continuation": line[8:10].strip(),
-                "Het ID": line[11:14].strip(),
-                "Chemical Name": line[15:70].strip()
-            } 
-            
-            hetnam_list.append(line_dict)
+        if record == "ATOM" or record == "HETATM":
+            # Coordinate lines are kept raw and sliced all at once later
+            atom_lines.append(line)
+            if len(atom_lines) == ATOM_CHUNK_SIZE:
+                atom_blocks.append(pack_lines(atom_lines))
+                atom_lines = []
         
-        elif line[:6] == "HETSYN":
-            line_dict = {
-                "Record Type": "HETSYN",
-                "Continuation": line[8:10].strip(),
-                "Het ID": line[11:14].strip(),
-                "Het Synonyms": line[15:70].strip()
-            }
-            
-            hetsyn_list.append(line_dict)
-            
-        elif line[:6] == "FORMUL":
-            line_dict = {
-                "Record Type": "FORMUL",
-                "Component Number": line[8:10].strip(),
-                "Het ID": line[12:15].strip(),
-                "Continuation Number": line[16:18].strip(),
-                "Asterisk (Water)": line[18].strip(),
-                "Chemical Formula": line[19:70].strip()
-            }
-            
-            formul_list.append(line_dict)
-                
-        elif line[:4] == "LINK":
-            line_dict = {
-                "Record Type": "LINK",
-                "1st Atom Name": line[12:16].strip(),
-                "1st Alternate location indicator": line[16].strip(),
-                "1st Residue Name": line[17:20].strip(),
-                "1st Chain Identifier": line[21].strip(),
-                "1st Residue Sequence Number": line[22:26].strip(),
-                "1st Insertion Code": line[26].strip(),
-                "2nd Atom Name": line[42:46].strip(),
-                "2nd Alternate location indicator": line[46].strip(),
-                "2nd Residue Name": line[47:50].strip(),
-                "2nd Chain Identifier": line[51].strip(),
-                "2nd Residue Sequence Number": line[52:56].strip(),
-                "2nd Insertion Code": line[56].strip(),
-                "1st Atom Symmetry Operator": line[59:65].strip(),
-                "2nd Atom Symmetry Operator": line[66:72].strip(),
-                "Link Distance": line[73:78].strip()
-            }
-            
-            link_list.append(line_dict)
-            
-        elif line[:6] == "CISPEP":
-            line_dict = {
-                "Record Type": "CISPEP",
-                "Record Serial Number": line[7:10].strip(),
-                "1st Residue Name": line[11:14].strip(),
-                "1st Chain Identifier": line[15].strip(),
-                "1st Residue Sequence Number": line[17:21].strip(),
-                "1st Insertion Code": line[21].strip(),
-                "2nd Residue Name": line[25:28].strip(),
-                "2nd Chain Identifier": line[29].strip(),
-                "2nd Residue Sequence Number": line[31:35].strip(),
-                "2nd Insertion Code": line[35].strip(),
-                "Specific Model": line[43:46].strip(),
-                "Angle Measurment (Deg)": line[53:59].strip()
-            }
-            
-            cispep_list.append(line_dict)
-            
-        elif line[:6] == "SEQRES":
-            line_dict = {
-                "Record Type": "SEQRES",
-                "Serial Number": line[7:10].strip(),
-                "Chain Identifier": line[11].strip(),
-                "Number of Residuals": line[13:17].strip(),
-                "1st Residual Name": line[21:22].strip(),
-                "2nd Residual Name": line[23:26].strip(),
-                "3rd Residual Name": line[27:30].strip(),
-                "4th Residual Name": line[31:34].strip(),
-                "5th Residual Name": line[35:38].strip(),
-                "6th Residual Name": line[39:42].strip(),
-                "7th Residual Name": line[43:46].strip(),
-                "8th Residual Name": line[47:50].strip(),
-                "9th Residual Name": line[51:54].strip(),
-                "10th Residual Name": line[55:58].strip(),
-                "11th Residual Name": line[59:62].strip(),
-                "12th Residual Name": line[63:66].strip(),
-                "13th Residual Name": line[67:70].strip(),
-            }
-            
-            seqres_list.append(line_dict)
-            
-        elif line[:6] == "HEADER":
+        elif record == "HEADER":
             name = line[62:66]
+        
+        else:
+            record_lines[record].append(line)
+    
+    atom_blocks.append(pack_lines(atom_lines))
+    del atom_lines
+    
+    tables = {"atom_df": partial(_build_atom_df, atom_blocks)}
+    for record, (table_name, columns) in RECORD_COLUMNS.items():
+        tables[table_name] = partial(parse_record_lines, record_lines[record], columns)
+    
+    return Protein(**tables, name=name, 
+                   chain_ids=None if chain_ids is None else list(chain_ids),
+                   num_atoms=None if atom_serials is None else len(atom_serials),
+                   num_models=None if num_models is None else max(num_models, 1)
+    )
+
+def iter_models(file_path: str):
+    """
+    About
+    ---------------
+    Reads the models of an NMR ensemble or the frames of a multi-frame 
+    trajectory one at a time. Only the coordinate lines of the current model 
+    are held in memory, so the number of models does not matter.
+    
+    Parameters
+    ---------------
+    file_path : str
+        The path to the PDB file
+    
+    Yields
+    ---------------
+    int
+        Serial number of the model (counted from 1 when there are no MODEL 
+        records)
+    pd.DataFrame
+        The atom dataframe of the model, with the columns of 'ATOM_COLUMNS'
+    """
+    
+    with open_pdb(file_path) as file:
+        for model_serial, block in _model_blocks(file):
+            yield model_serial, parse_atom_block(block)
+
+def model_coordinates(file_path: str) -> np.ndarray:
+    """
+    About
+    ---------------
+    Stacks the atom coordinates of every model of a file. Only the coordinate 
+    columns are sliced out of each model.
+    
+    Parameters
+    ---------------
+    file_path : str
+        The path to the PDB file
+    
+    Returns
+    ---------------
+    np.ndarray
+        A (number of models, number of atoms, 3) float32 array
+    """
+    
+    coordinate_fields = [(start, end) for col_name, start, end, _ in ATOM_COLUMNS if col_name in COORDINATE_COLUMNS]
+    
+    frames = []
+    with open_pdb(file_path) as file:
+        for model_serial, block in _model_blocks(file):
+            coords = np.stack([_field_to_number(_slice_field(block, start, end), np.float32) for start, end in coordinate_fields], axis=1)
             
-    atom_df_col_types = {
-        # Everything else is str
-        "Atom Serial Number":                       "Int",
-        "Residue Sequence Number":                  "Int", 
-        "X orthogonal Coordinate":                  "Float", 
-        "Y orthogonal Coordinate":                  "Float", 
-        "Z orthogonal Coordinate":                  "Float", 
-        "Occupancy":                                "Float", 
-        "Temperature Factor":                       "Float", 
-    }
-    
-    helix_df_col_types = {
-        # Everything else is str
-        "Helix Serial Number":                      "Int",
-        "1st Residue Sequence Number":              "Int",
-        "2nd Residue Sequence Number":              "Int",
-        "Type of Helix":                            "Int",
-        "Length of Helix":                          "Int",
-    }
-    
-    sheet_df_col_types = {
-        # Everything else is str
-        "Strand Number (Current Sheet)":            "Int",
-        "Number of Strands (Current Sheet)":        "Int",
-        "1st Residue Sequence Number":              "Int",
-        "2nd Residue Sequence Number":              "Int",
-        "Strand Sense with Respect to Previous":    "Int",
-        "HB 1st Residue Sequence Number":           "Int",
-        "HB 2nd Residue Sequence Number":           "Int",
-    }
-    
-    ssbond_df_col_types = {
-        # Everything else is str
-        "Serial Number":                            "Int",
-        "1st Residue Sequence Number":              "Int",
-        "2nd Residue Sequence Number":              "Int",
-        "Symmetry Operator for 1st Residue":        "Int",
-        "Symmetry Operator for 2nd Residue":        "Int",
-        "Length of Disulfide Bond":                 "Float"
-    }
-    
-    conect_df_col_types = {
-        # Everything else is str
-        "Atom Serial Number":                       "Int",
-        "Bonded Atom 1 Serial Number":              "Int",
-        "Bonded Atom 2 Serial Number":              "Int",
-        "Bonded Atom 3 Serial Number":              "Int",
-        "Bonded Atom 4 Serial Number":              "Int",
-        "Hydrogen Bonded Atom 1 Serial Number":     "Int",
-        "Hydrogen Bonded Atom 2 Serial Number":     "Int",
-        "Salt Bridged Atom 1 Serial Number":        "Int",
-        "Hydrogen Bonded Atom 3 Serial Number":     "Int",
-        "Hydrogen Bonded Atom 4 Serial Number":     "Int",
-        "Salt Bridged Atom 2 Serial Number":        "Int"
-    }
-    
-    het_df_col_types = {
-        # Everything else is str
-        "Sequence Number":                          "Int",
-        "Number of HETATM Atoms":                   "Int"
-    }
-    
-    hetnam_df_col_types = {
-        # Everything else is str
-    }
-    
-    hetsyn_df_col_types = {
-        # Everything else is str
-    }
-    
-    formul_df_col_types = {
-        # Everything else is str
-        "Component Number":                         "Int",
-        "Continuation Number":                      "Int"
-    }
-    
-    link_df_col_types = {
-        # Everything else is str
-        "1st Residue Sequence Number":              "Int",
-        "2nd Residue Sequence Number":              "Int",
-        #"1st Atom Symmetry Operator":               "Int",
-        #"2nd Atom Symmetry Operator":               "Int",
-        "Link Distance":                            "Float"
-    }
-    
-    cispep_df_col_types = {
-        # Everything else is str
-        "Record Serial Number":                     "Int",
-        "1st Residue Sequence Number":              "Int",
-        "2nd Residue Sequence Number":              "Int",
-        "Angle Measurment (Deg)":                   "Float"
-    }
-    
-    seqres_df_col_types = {
-        # Everything else is str
-        "Serial Number":                            "Int",
-        "Number of Residuals":                      "Int"
-    }
-    
-    atom_df = pd.DataFrame.from_dict(atom_list)
-    helix_df = pd.DataFrame.from_dict(helix_list)
-    sheet_df = pd.DataFrame.from_dict(sheet_list)
-    ssbond_df = pd.DataFrame.from_dict(ssbond_list)
-    conect_df = pd.DataFrame.from_dict(conect_list)
-    het_df = pd.DataFrame.from_dict(het_list)
-    hetnam_df = pd.DataFrame.from_dict(hetnam_list)
-    hetsyn_df = pd.DataFrame.from_dict(hetsyn_list)
-    formul_df = pd.DataFrame.from_dict(formul_list)
-    link_df = pd.DataFrame.from_dict(link_list)
-    cispep_df = pd.DataFrame.from_dict(cispep_list)
-    seqres_df = pd.DataFrame.from_dict(seqres_list)
-    
-    if len(atom_df) > 0:
-        atom_df = change_col_type(atom_df, atom_df_col_types)
-    if len(helix_df) > 0:
-        helix_df = change_col_type(helix_df, helix_df_col_types)
-    if len(sheet_df) > 0:
-        sheet_df = change_col_type(sheet_df, sheet_df_col_types)
-    if len(ssbond_df) > 0:
-        ssbond_df = change_col_type(ssbond_df, ssbond_df_col_types)
-    if len(conect_df) > 0:
-        conect_df = change_col_type(conect_df, conect_df_col_types)
-    if len(het_df) > 0:
-        het_df = change_col_type(het_df, het_df_col_types)
-    if len(hetnam_df) > 0:
-        hetnam_df = change_col_type(hetnam_df, hetnam_df_col_types)
-    if len(hetsyn_df) > 0:
-        hetsyn_df = change_col_type(hetsyn_df, hetsyn_df_col_types)
-    if len(formul_df) > 0:
-        formul_df = change_col_type(formul_df, formul_df_col_types)
-    if len(link_df) > 0:
-        link_df = change_col_type(link_df, link_df_col_types)
-    if len(cispep_df) > 0:
-        cispep_df = change_col_type(cispep_df, cispep_df_col_types)
-    if len(seqres_df) > 0:
-        seqres_df = change_col_type(seqres_df, seqres_df_col_types)
+            if len(frames) > 0 and len(coords) != len(frames[0]):
+                raise ValueError(f"Model {model_serial} has {len(coords)} atoms, the first model has {len(frames[0])}")
+            frames.append(coords)
+    
+    if len(frames) == 0:
+        return np.empty((0, 0, 3), dtype=np.float32)
+    
+    return np.stack(frames)
+
+def _model_blocks(lines: Iterable[str]):
+    """
+    About
+    ---------------
+    Groups the coordinate lines of a PDB file by model. A model ends at an 
+    ENDMDL or END record, or at the next MODEL record.
+    
+    Parameters
+    ---------------
+    lines : Iterable[str]
+        Lines of a PDB file, such as an open file object
+    
+    Yields
+    ---------------
+    int
+        Serial number of the model
+    np.ndarray
+        The coordinate lines of the model packed by 'pack_lines'
+    """
+    
+    atom_lines = []
+    model_serial = None
+    last_serial = 0
+    
+    for line in lines:
+        record = line[:6].rstrip()
+        
+        if record == "ATOM" or record == "HETATM":
+            atom_lines.append(line.rstrip("\r\n"))
+        
+        elif record in MODEL_BOUNDARY_RECORDS:
+            if len(atom_lines) > 0:
+                last_serial = last_serial + 1 if model_serial is None else model_serial
+                yield last_serial, pack_lines(atom_lines)
+                atom_lines = []
+                model_serial = None
             
-    return Protein(atom_df, helix_df, sheet_df, ssbond_df, 
-                   conect_df, het_df, hetnam_df, hetsyn_df, 
-                   formul_df, link_df, cispep_df, seqres_df,
-                   name
-    )
+            if record == "MODEL":
+                serial = line[10:14].strip()
+                model_serial = int(serial) if serial.isdigit() else None
+    
+    if len(atom_lines) > 0:
+        yield last_serial + 1 if model_serial is None else model_serial, pack_lines(atom_lines)
 
 def change_col_type(df: pd.DataFrame, col_dict: dict) -> pd.DataFrame:
     """
@@ -466,7 +616,7 @@ def change_col_type(df: pd.DataFrame, col_dict: dict) -> pd.DataFrame:
         A pandas dataframe
     col_dict
         A dictionary with df columns as the key and 'Int' or 'Float' as the value
-        
+    
     Returns
     ---------------
     pd.DataFrame
@@ -476,5 +626,155 @@ def change_col_type(df: pd.DataFrame, col_dict: dict) -> pd.DataFrame:
     for col_name, col_type in col_dict.items():
         if col_type == "Int" or col_type == "Float":
             df[col_name] = pd.to_numeric(df[col_name])
-            
-    return df
\ No newline at end of file
+    
+    return df
+
+def parse_atom_lines(atom_lines: list) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Turns raw ATOM/HETATM lines into the atom dataframe in a single columnar 
+    pass. The lines are packed into one fixed-width byte block and every 
+    column is sliced out of it at once, so numbers come out as int32/float32 
+    without going through per-line dictionaries.
+    
+    Parameters
+    ---------------
+    atom_lines : list
+        ATOM and HETATM lines from a PDB file
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with one row per atom and the columns of 'ATOM_COLUMNS'
+    """
+    
+    return parse_atom_block(pack_lines(atom_lines))
+
+def _build_atom_df(atom_blocks: list) -> pd.DataFrame:
+    return parse_atom_block(np.concatenate(atom_blocks))
+
+def parse_record_lines(record_lines: list, columns: list) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Turns raw lines of one record type into a dataframe of stripped strings 
+    and then converts the 'Int' and 'Float' columns with 'change_col_type'.
+    
+    Parameters
+    ---------------
+    record_lines : list
+        Lines of one record type from a PDB file
+    columns : list
+        The fixed-width layout of the record, such as 'HELIX_COLUMNS'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with one row per line, empty if there are no lines
+    """
+    
+    if len(record_lines) == 0:
+        return pd.DataFrame()
+    
+    block = pack_lines(record_lines)
+    
+    df = pd.DataFrame({
+        col_name: np.char.strip(_slice_field(block, start, end)).astype(str) for col_name, start, end, _ in columns
+    })
+    
+    return change_col_type(df, {col_name: col_type for col_name, _, _, col_type in columns})
+
+def pack_lines(lines: list) -> np.ndarray:
+    """
+    About
+    ---------------
+    Packs PDB lines into a fixed-width byte block. Lines shorter than a full 
+    record are padded with null bytes, which numpy treats as the end of a 
+    field.
+    
+    Parameters
+    ---------------
+    lines : list
+        Lines from a PDB file
+    
+    Returns
+    ---------------
+    np.ndarray
+        A (number of lines, RECORD_WIDTH) array of single bytes
+    """
+    
+    block = np.array(lines, dtype=f"S{RECORD_WIDTH}")
+    
+    return block.view("S1").reshape(len(lines), RECORD_WIDTH)
+
+def parse_atom_block(block: np.ndarray) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Slices every ATOM/HETATM column out of a fixed-width byte block.
+    
+    Parameters
+    ---------------
+    block : np.ndarray
+        A block made by 'pack_lines'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with one row per atom and the columns of 'ATOM_COLUMNS'
+    """
+    
+    if len(block) == 0:
+        return pd.DataFrame()
+    
+    columns = {}
+    for col_name, start, end, col_type in ATOM_COLUMNS:
+        field = _slice_field(block, start, end)
+        
+        if col_type == "Int":
+            columns[col_name] = _field_to_number(field, np.int32)
+        elif col_type == "Float":
+            columns[col_name] = _field_to_number(field, np.float32)
+        else:
+            columns[col_name] = np.char.strip(field).astype(str)
+    
+    return pd.DataFrame(columns)
+
+def _slice_field(block: np.ndarray, start: int, end: int) -> np.ndarray:
+    return np.ascontiguousarray(block[:, start:end]).view(f"S{end - start}").ravel()
+
+def _field_to_number(field: np.ndarray, dtype) -> np.ndarray:
+    """
+    About
+    ---------------
+    Converts a fixed-width byte column to numbers. Blank or malformed fields 
+    fall back to pandas so they behave like 'change_col_type' (blanks become 
+    missing values, anything else raises), but the column keeps its declared
+    type: blank floats are NaN in 'dtype', and integers with blanks are the
+    nullable pandas type of the same width ('Int32' for np.int32).
+    
+    Parameters
+    ---------------
+    field : np.ndarray
+        A column of fixed-width byte strings
+    dtype
+        The numpy type to convert to
+    
+    Returns
+    ---------------
+    np.ndarray or pd.arrays.IntegerArray
+        The converted column
+    """
+    
+    try:
+        return field.astype(dtype)
+    except ValueError:
+        values = pd.to_numeric(pd.Series(np.char.strip(field).astype(str)))
+    
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f" or not values.isna().any():
+        return values.to_numpy(dtype=dtype)
+    
+    return pd.array(values, dtype=dtype.name.capitalize())
+
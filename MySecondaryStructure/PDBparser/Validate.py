@@ -1,20 +1,30 @@
 from os.path import exists
 
+# File extensions of PDB formatted files ('.ent' is used by the wwPDB archive)
+PDB_EXTENSIONS = (".pdb", ".ent")
+
+# File extensions of mmCIF (PDBx) formatted files
+CIF_EXTENSIONS = (".cif", ".mmcif")
+
+# File extensions of compressed files that can be read as a stream
+COMPRESSION_EXTENSIONS = (".gz", ".bz2", ".xz")
+
 def check_file(file_path: str):
     """
     About
     ---------------
-    Checks to see if the file is an existing PDB file
+    Checks to see if the file is an existing PDB or mmCIF file. Files may be 
+    compressed with gzip, bzip2 or xz (such as 'pdb1abc.ent.gz').
     
     Parameters
     ---------------
     file_path : str
         Path to a file
-        
+    
     Returns
     ---------------
     bool
-        True if the 'file_path' parameter leads to a real PDB file, false if otherwise
+        True if the 'file_path' parameter leads to a real PDB or mmCIF file, false if otherwise
     str
         Message containing information on what was wrong with 'file_path'
     """
@@ -24,10 +34,71 @@ def check_file(file_path: str):
     if valid_file == False:
         return valid_file, "File does not exist!"
     
-    valid_file = file_path.lower().endswith(".pdb")
+    valid_file = has_structure_extension(file_path)
     
     if valid_file == False:
-        return valid_file, "File is not in PDB format!"
+        return valid_file, "File is not in PDB or mmCIF format!"
     
     return valid_file, "File is all good!"
-    
\ No newline at end of file
+
+def has_structure_extension(file_path: str) -> bool:
+    """
+    About
+    ---------------
+    Checks whether a file is named as a PDB or mmCIF file, without looking 
+    at the file itself.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to a file
+    
+    Returns
+    ---------------
+    bool
+        True if 'file_path' (without a compression extension) ends in a PDB or mmCIF extension
+    """
+    
+    return strip_compression(file_path).lower().endswith(PDB_EXTENSIONS + CIF_EXTENSIONS)
+
+def strip_compression(file_path: str) -> str:
+    """
+    About
+    ---------------
+    Removes a compression extension from the end of a file path.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to a file
+    
+    Returns
+    ---------------
+    str
+        'file_path' without '.gz', '.bz2' or '.xz' at the end
+    """
+    
+    for extension in COMPRESSION_EXTENSIONS:
+        if file_path.lower().endswith(extension):
+            return file_path[:-len(extension)]
+    
+    return file_path
+
+def is_cif(file_path: str) -> bool:
+    """
+    About
+    ---------------
+    Checks whether a file is named as an mmCIF file.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to a file
+    
+    Returns
+    ---------------
+    bool
+        True if 'file_path' (without a compression extension) ends in '.cif' or '.mmcif'
+    """
+    
+    return strip_compression(file_path).lower().endswith(CIF_EXTENSIONS)
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import Spatial
+
+# Where a bond came from. A bond found in more than one place has every flag
+# it was found with set.
+CONECT_BOND = 1
+LINK_BOND = 2
+SSBOND_BOND = 4
+INFERRED_BOND = 8
+
+# Single bond covalent radii in angstroms (Cordero et al. 2008) of the
+# elements bonds are inferred for. Metals and ions are left out on purpose,
+# their contacts are coordination and not covalent bonds.
+COVALENT_RADII = {
+    "H": 0.31, "B": 0.84, "C": 0.76, "N": 0.71, "O": 0.66, "F": 0.57,
+    "SI": 1.11, "P": 1.07, "S": 1.05, "CL": 1.02, "SE": 1.20, "BR": 1.20, "I": 1.39,
+}
+
+# Slack added to the sum of two covalent radii when inferring a bond, and the
+# distance under which two atoms are taken to be the same atom
+BOND_TOLERANCE = 0.45
+MIN_BOND_LENGTH = 0.4
+
+# Columns of 'CONECT' records holding covalently bonded atoms, the rest are
+# hydrogen bonds and salt bridges
+CONECT_BONDED_COLUMNS = [f"Bonded Atom {i} Serial Number" for i in range(1, 5)]
+
+# Residue names of water, left out of ligands
+WATER_NAMES = ("HOH", "WAT", "DOD", "H2O")
+
+class BondGraph():
+    """
+    About
+    ---------------
+    Bonds between the atoms of a protein as a compressed sparse row (CSR)
+    adjacency structure. Atoms are the rows of the atom dataframe. The
+    neighbours of atom i are 'indices[indptr[i]:indptr[i + 1]]' (sorted), and
+    'kinds' holds the flags (see 'CONECT_BOND' and the others) of every one of
+    those bonds, so a lookup costs the degree of the atom.
+    """
+    def __init__(self, num_atoms: int, first: np.ndarray, second: np.ndarray, kinds: np.ndarray):
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        kinds = np.asarray(kinds, dtype=np.uint8)
+        
+        # Both directions of every bond, without bonds of an atom to itself
+        keep = first != second
+        rows = np.concatenate([first[keep], second[keep]])
+        cols = np.concatenate([second[keep], first[keep]])
+        kinds = np.concatenate([kinds[keep], kinds[keep]])
+        
+        order = np.lexsort((cols, rows))
+        rows, cols, kinds = rows[order], cols[order], kinds[order]
+        
+        # A bond listed more than once is kept once with all of its flags
+        if len(rows) > 0:
+            starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+            kinds = np.bitwise_or.reduceat(kinds, starts)
+            rows, cols = rows[starts], cols[starts]
+        
+        self.num_atoms = int(num_atoms)
+        self.indptr = np.zeros(self.num_atoms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.num_atoms), out=self.indptr[1:])
+        self.indices = cols
+        self.kinds = kinds
+    
+    def __len__(self) -> int:
+        return self.num_atoms
+    
+    @property
+    def num_bonds(self) -> int:
+        return len(self.indices) // 2
+    
+    def degrees(self) -> np.ndarray:
+        # Number of bonds of every atom
+        return np.diff(self.indptr)
+    
+    def neighbors(self, atom: int) -> np.ndarray:
+        """
+        About
+        ---------------
+        Finds the atoms bonded to an atom.
+        
+        Parameters
+        ---------------
+        atom : int
+            Row of the atom in the atom dataframe
+        
+        Returns
+        ---------------
+        np.ndarray
+            Rows of the bonded atoms, sorted
+        """
+        
+        return self.indices[self.indptr[atom]:self.indptr[atom + 1]]
+    
+    def neighbor_kinds(self, atom: int) -> np.ndarray:
+        # Flags of the bonds of an atom, in the order of 'neighbors'
+        return self.kinds[self.indptr[atom]:self.indptr[atom + 1]]
+    
+    def bonds(self, kind: int = None):
+        """
+        About
+        ---------------
+        Lists every bond once.
+        
+        Parameters
+        ---------------
+        kind : int
+            Only list bonds with one of these flags set, all bonds if None
+        
+        Returns
+        ---------------
+        np.ndarray
+            Row of the first atom of each bond
+        np.ndarray
+            Row of the second atom of each bond (always larger than the first)
+        np.ndarray
+            Flags of each bond
+        """
+        
+        rows = np.repeat(np.arange(self.num_atoms, dtype=np.int64), self.degrees())
+        keep = rows < self.indices
+        if kind is not None:
+            keep &= (self.kinds & kind) != 0
+        
+        return rows[keep], self.indices[keep], self.kinds[keep]
+    
+    def components(self, atoms: np.ndarray = None) -> np.ndarray:
+        """
+        About
+        ---------------
+        Splits the atoms into groups that are connected by bonds.
+        
+        Parameters
+        ---------------
+        atoms : np.ndarray
+            Boolean mask of the atoms to use, bonds to other atoms are
+            ignored. Every atom if None.
+        
+        Returns
+        ---------------
+        np.ndarray
+            The component of every atom, numbered from 0 in order of the
+            first atom of each component, or -1 for atoms left out by 'atoms'
+        """
+        
+        first, second, _ = self.bonds()
+        if atoms is not None:
+            atoms = np.asarray(atoms, dtype=bool)
+            keep = atoms[first] & atoms[second]
+            first, second = first[keep], second[keep]
+        
+        labels = connected_components(self.num_atoms, first, second)
+        if atoms is not None:
+            _, labels = np.unique(np.where(atoms, labels, -1), return_inverse=True)
+            labels = labels - (0 if atoms.all() else 1)
+        
+        return labels
+
+def connected_components(num_atoms: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Labels connected components with array operations only. Every atom
+    points at a parent with a smaller index. In each round the larger root of
+    every bond that joins two trees is hooked under the smaller one and the
+    pointers are then followed until they all point at a root, so long
+    chains of atoms are joined in a few rounds instead of one atom per round.
+    
+    Parameters
+    ---------------
+    num_atoms : int
+        Number of atoms
+    first : np.ndarray
+        Index of the first atom of each bond
+    second : np.ndarray
+        Index of the second atom of each bond
+    
+    Returns
+    ---------------
+    np.ndarray
+        The component of every atom, numbered from 0 in order of the first
+        atom of each component
+    """
+    
+    parents = np.arange(num_atoms, dtype=np.int64)
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    
+    while True:
+        roots_first = parents[first]
+        roots_second = parents[second]
+        joining = roots_first != roots_second
+        if not joining.any():
+            break
+        
+        low = np.minimum(roots_first[joining], roots_second[joining])
+        high = np.maximum(roots_first[joining], roots_second[joining])
+        np.minimum.at(parents, high, low)
+        
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents = grandparents
+    
+    return np.unique(parents, return_inverse=True)[1].astype(np.int64)
+
+def build_graph(atom_df: pd.DataFrame, conect_df: pd.DataFrame, link_df: pd.DataFrame,
+                ssbond_df: pd.DataFrame, infer: bool = False, tolerance: float = BOND_TOLERANCE) -> BondGraph:
+    """
+    About
+    ---------------
+    Builds the bond graph of a protein from its CONECT, LINK and SSBOND
+    records, optionally filled in with bonds inferred from distances (see
+    'infer_bonds'). Bonds to atoms that are not in the atom dataframe (such
+    as atoms of other models) are dropped.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    conect_df, link_df, ssbond_df : pd.DataFrame
+        The CONECT, LINK and SSBOND tables of the same Protein
+    infer : bool
+        Also add bonds inferred from distances
+    tolerance : float
+        Slack in angstroms of inferred bonds
+    
+    Returns
+    ---------------
+    BondGraph
+        The bonds between the rows of 'atom_df'
+    """
+    
+    firsts = []
+    seconds = []
+    kinds = []
+    
+    def add(first, second, kind):
+        found = (first >= 0) & (second >= 0)
+        firsts.append(first[found])
+        seconds.append(second[found])
+        kinds.append(np.full(found.sum(), kind, dtype=np.uint8))
+    
+    if len(atom_df) > 0:
+        if len(conect_df) > 0:
+            add(*_conect_bonds(atom_df, conect_df), CONECT_BOND)
+        
+        if len(link_df) > 0:
+            add(_find_atoms(atom_df, link_df, "1st", "1st Insertion Code",
+                            link_df["1st Atom Name"], link_df["1st Alternate location indicator"]),
+                _find_atoms(atom_df, link_df, "2nd", "2nd Insertion Code",
+                            link_df["2nd Atom Name"], link_df["2nd Alternate location indicator"]),
+                LINK_BOND)
+        
+        if len(ssbond_df) > 0:
+            sulfur = pd.Series("SG", index=ssbond_df.index)
+            add(_find_atoms(atom_df, ssbond_df, "1st", "1st Code for Insertions of Residues", sulfur),
+                _find_atoms(atom_df, ssbond_df, "2nd", "2nd Code for Insertions of Residues", sulfur),
+                SSBOND_BOND)
+        
+        if infer:
+            add(*infer_bonds(atom_df, tolerance), INFERRED_BOND)
+    
+    if len(firsts) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return BondGraph(len(atom_df), empty, empty, np.empty(0, dtype=np.uint8))
+    
+    return BondGraph(len(atom_df), np.concatenate(firsts), np.concatenate(seconds), np.concatenate(kinds))
+
+def infer_bonds(atom_df: pd.DataFrame, tolerance: float = BOND_TOLERANCE):
+    """
+    About
+    ---------------
+    Infers covalent bonds from distances. Two atoms are bonded when they are
+    closer than the sum of their covalent radii plus 'tolerance' (and
+    further apart than 'MIN_BOND_LENGTH'). Candidate pairs come from a cell
+    list (see 'Spatial.pairs_within'), so the cost follows the number of
+    atoms. Atoms of two different alternate locations are never bonded, and
+    elements missing from 'COVALENT_RADII' get no inferred bonds.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    tolerance : float
+        Slack in angstroms added to the sum of the radii
+    
+    Returns
+    ---------------
+    np.ndarray
+        Row of the first atom of each bond
+    np.ndarray
+        Row of the second atom of each bond (always larger than the first)
+    """
+    
+    empty = np.empty(0, dtype=np.int64)
+    if len(atom_df) < 2:
+        return empty, empty
+    
+    radii = element_symbols(atom_df).map(COVALENT_RADII).to_numpy(dtype=np.float64)
+    known = np.flatnonzero(~np.isnan(radii))
+    if len(known) < 2:
+        return empty, empty
+    
+    coords = atom_df[["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]].to_numpy(dtype=np.float32)
+    cutoff = 2 * radii[known].max() + tolerance
+    first, second = Spatial.pairs_within(coords[known], cutoff)
+    first, second = known[first], known[second]
+    
+    difference = coords[first] - coords[second]
+    distances = np.sqrt(np.einsum("ij,ij->i", difference, difference))
+    bonded = (distances < radii[first] + radii[second] + tolerance) & (distances > MIN_BOND_LENGTH)
+    
+    altlocs = atom_df["Alternate Location Indicator"].to_numpy(dtype=str)
+    bonded &= (altlocs[first] == altlocs[second]) | (altlocs[first] == "") | (altlocs[second] == "")
+    
+    return first[bonded], second[bonded]
+
+def element_symbols(atom_df: pd.DataFrame) -> pd.Series:
+    # Upper case element of every atom, from the atom name when the element
+    # column is blank
+    elements = atom_df["Element Symbol"].astype(str).str.strip().str.upper()
+    from_names = atom_df["Atom Name"].astype(str).str.strip().str.lstrip("0123456789").str[:1].str.upper()
+    
+    return elements.where(elements != "", from_names)
+
+def _conect_bonds(atom_df: pd.DataFrame, conect_df: pd.DataFrame):
+    # Rows of the atoms of every bond listed in CONECT records
+    # Atoms with a blank serial number cannot be named by a CONECT record
+    serials = atom_df["Atom Serial Number"].to_numpy(dtype=np.int64, na_value=-1)
+    
+    atoms = conect_df["Atom Serial Number"].to_numpy(dtype=np.float64)
+    columns = [c for c in CONECT_BONDED_COLUMNS if c in conect_df.columns]
+    bonded = conect_df[columns].to_numpy(dtype=np.float64)
+    
+    first = np.repeat(atoms, len(columns))
+    second = bonded.ravel()
+    listed = ~(np.isnan(first) | np.isnan(second))
+    
+    return _rows_of_serials(serials, first[listed]), _rows_of_serials(serials, second[listed])
+
+def _rows_of_serials(serials: np.ndarray, wanted: np.ndarray) -> np.ndarray:
+    # Row of the first atom with each wanted serial number, -1 if there is none
+    wanted = wanted.astype(np.int64)
+    if len(serials) == 0:
+        return np.full(len(wanted), -1, dtype=np.int64)
+    
+    order = np.argsort(serials, kind="stable")
+    sorted_serials = serials[order]
+    slots = np.minimum(np.searchsorted(sorted_serials, wanted), len(serials) - 1)
+    
+    return np.where(sorted_serials[slots] == wanted, order[slots], -1)
+
+def _find_atoms(atom_df: pd.DataFrame, record_df: pd.DataFrame, side: str, icode_column: str,
+                atom_names: pd.Series, altlocs: pd.Series = None) -> np.ndarray:
+    """
+    About
+    ---------------
+    Finds the atoms named by one side of LINK or SSBOND records. An atom is
+    matched on chain, residue sequence number, insertion code and atom name,
+    and on the alternate location when the record gives one. Otherwise the
+    first alternate location is used.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    record_df : pd.DataFrame
+        The LINK or SSBOND table
+    side : str
+        '1st' or '2nd'
+    icode_column : str
+        Name of the insertion code column of that side
+    atom_names : pd.Series
+        Atom name of every record
+    altlocs : pd.Series
+        Alternate location of every record, if the records have them
+    
+    Returns
+    ---------------
+    np.ndarray
+        Row of the atom of every record, -1 if it is not in 'atom_df'
+    """
+    
+    atom_keys = pd.DataFrame({
+        "chain": atom_df["Chain Identifier"].astype(str).to_numpy(),
+        "number": atom_df["Residue Sequence Number"].to_numpy(dtype=np.int64, na_value=-1),
+        "icode": atom_df["Code for Insertions of Residues"].astype(str).to_numpy(),
+        "name": atom_df["Atom Name"].astype(str).to_numpy(),
+        "altloc": atom_df["Alternate Location Indicator"].astype(str).to_numpy(),
+        "row": np.arange(len(atom_df), dtype=np.int64),
+    })
+    
+    numbers = pd.to_numeric(record_df[f"{side} Residue Sequence Number"], errors="coerce").fillna(-1)
+    record_keys = pd.DataFrame({
+        "chain": record_df[f"{side} Chain Identifier"].astype(str).to_numpy(),
+        "number": numbers.to_numpy(dtype=np.int64, na_value=-1),
+        "icode": record_df[icode_column].astype(str).to_numpy(),
+        "name": atom_names.astype(str).to_numpy(),
+        "altloc": (altlocs if altlocs is not None else pd.Series("", index=record_df.index)).astype(str).to_numpy(),
+    })
+    
+    by_name = ["chain", "number", "icode", "name"]
+    first_altloc = atom_keys.drop_duplicates(by_name).set_index(by_name)["row"]
+    rows = first_altloc.reindex(pd.MultiIndex.from_frame(record_keys[by_name])).to_numpy()
+    
+    given = record_keys["altloc"].to_numpy() != ""
+    if given.any():
+        by_altloc = by_name + ["altloc"]
+        exact = atom_keys.drop_duplicates(by_altloc).set_index(by_altloc)["row"]
+        exact_rows = exact.reindex(pd.MultiIndex.from_frame(record_keys[by_altloc])).to_numpy()
+        rows = np.where(given & ~np.isnan(exact_rows), exact_rows, rows)
+    
+    return np.nan_to_num(rows.astype(np.float64), nan=-1).astype(np.int64)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import Spatial
+
+# Atom selections a contact map can be built from
+#   CA:    the alpha carbon of every residue
+#   CB:    the beta carbon of every residue (the alpha carbon of glycine)
+#   heavy: every atom other than hydrogen
+SELECTIONS = ("CA", "CB", "heavy")
+
+# Default distance cutoff in angstroms of each selection
+DEFAULT_CUTOFFS = {"CA": 8.0, "CB": 8.0, "heavy": 4.5}
+
+# Number of atoms compared with their neighbours at once. The float32
+# differences of one chunk take a few tens of MB, whatever the size of the
+# structure.
+CHUNK_SIZE = 32768
+
+# Columns naming a residue
+RESIDUE_COLUMNS = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues", "Residue Name"]
+
+def select_atoms(atom_df: pd.DataFrame, selection: str = "CA"):
+    """
+    About
+    ---------------
+    Picks the atoms of the protein residues (ATOM records) that a contact
+    map is built from. Only the first alternate location of an atom is used.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    selection : str
+        One of 'SELECTIONS'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue with the columns of 'RESIDUE_COLUMNS', in file order
+    np.ndarray
+        (number of atoms, 3) float32 coordinates of the picked atoms
+    np.ndarray
+        Row in the residue dataframe of every picked atom
+    """
+    
+    if selection not in SELECTIONS:
+        raise ValueError(f"Unknown atom selection '{selection}', expected one of {', '.join(SELECTIONS)}")
+    
+    coordinate_columns = ["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]
+    if len(atom_df) == 0:
+        return pd.DataFrame(columns=RESIDUE_COLUMNS), np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=np.int64)
+    
+    atoms = atom_df.loc[atom_df["Record Type"] == "ATOM"]
+    names = atoms["Atom Name"].astype(str)
+    
+    if selection == "CA":
+        atoms = atoms.loc[names == "CA"]
+    elif selection == "CB":
+        glycine = atoms["Residue Name"].astype(str) == "GLY"
+        atoms = atoms.loc[(names == "CB") | ((names == "CA") & glycine)]
+    else:
+        elements = atoms["Element Symbol"].astype(str).str.strip().str.upper()
+        elements = elements.where(elements != "", names.str.strip().str.lstrip("0123456789").str[:1])
+        atoms = atoms.loc[~elements.isin(["H", "D"])]
+    
+    atoms = atoms.drop_duplicates(RESIDUE_COLUMNS[:3] + ["Atom Name"])
+    
+    residue_ids = atoms.groupby(RESIDUE_COLUMNS[:3], sort=False, observed=True).ngroup().to_numpy()
+    first_atoms = np.unique(residue_ids, return_index=True)[1]
+    residue_df = atoms.iloc[first_atoms][RESIDUE_COLUMNS].reset_index(drop=True)
+    coords = atoms[coordinate_columns].to_numpy(dtype=np.float32)
+    
+    return residue_df, coords, residue_ids.astype(np.int64)
+
+def residue_contacts(atom_df: pd.DataFrame, selection: str = "CA", cutoff: float = None,
+                     chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Finds every pair of residues with picked atoms closer than 'cutoff'.
+    
+    Atom pairs come from a cell list with cells as wide as the cutoff (see 
+    'Spatial.iter_pairs_within'), so no distance matrix is ever built. The 
+    atoms are handled 'chunk_size' at a time and the atom pairs of every 
+    chunk are folded into residue pairs, which keeps the memory taken bounded 
+    by the chunk size and the number of contacts, never the square of the 
+    number of atoms.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    selection : str
+        Atoms to measure between, one of 'SELECTIONS'
+    cutoff : float
+        Distance cutoff in angstroms, 'DEFAULT_CUTOFFS' of the selection if None
+    chunk_size : int
+        Number of atoms compared with their neighbours at once
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per contact with the chain identifier, residue sequence
+        number, insertion code and residue name of both residues (the first
+        comes first in the file) and the shortest distance between them
+        ('Distance'), sorted by the first and then the second residue
+    """
+    
+    residue_df, coords, residue_ids = select_atoms(atom_df, selection)
+    
+    if cutoff is None:
+        cutoff = DEFAULT_CUTOFFS[selection]
+    
+    first, second, distances = _contact_pairs(coords, residue_ids, float(cutoff), int(chunk_size))
+    
+    contacts_df = pd.DataFrame({f"1st {c}": residue_df[c].to_numpy()[first] for c in RESIDUE_COLUMNS})
+    for c in RESIDUE_COLUMNS:
+        contacts_df[f"2nd {c}"] = residue_df[c].to_numpy()[second]
+    contacts_df["Distance"] = distances
+    
+    return contacts_df
+
+def interface_residues(contacts_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Lists the residues of every chain that touch another chain.
+    
+    Parameters
+    ---------------
+    contacts_df : pd.DataFrame
+        Contacts made by 'residue_contacts'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue and partner chain with the chain identifier,
+        residue sequence number, insertion code and residue name of the
+        residue, the 'Partner Chain Identifier', the number of partner
+        residues it touches ('Contacts') and the shortest distance to them,
+        sorted by chain, partner chain and residue
+    """
+    
+    between_chains = contacts_df.loc[contacts_df["1st Chain Identifier"] != contacts_df["2nd Chain Identifier"]]
+    
+    # Both directions of every contact, so each side is listed under its own chain
+    sides = []
+    for side, partner in (("1st", "2nd"), ("2nd", "1st")):
+        side_df = between_chains[[f"{side} {c}" for c in RESIDUE_COLUMNS] + ["Distance"]]
+        side_df.columns = RESIDUE_COLUMNS + ["Distance"]
+        side_df.insert(len(RESIDUE_COLUMNS), "Partner Chain Identifier", between_chains[f"{partner} Chain Identifier"].to_numpy())
+        sides.append(side_df)
+    
+    interface_df = pd.concat(sides, ignore_index=True)
+    group_columns = ["Chain Identifier", "Partner Chain Identifier"] + RESIDUE_COLUMNS[1:]
+    interface_df = interface_df.groupby(group_columns, sort=False, observed=True).agg(
+        Contacts=("Distance", "size"), Distance=("Distance", "min")
+    ).reset_index()
+    
+    interface_df = interface_df.sort_values(["Chain Identifier", "Partner Chain Identifier",
+                                             "Residue Sequence Number", "Code for Insertions of Residues"], ignore_index=True)
+    
+    return interface_df[RESIDUE_COLUMNS + ["Partner Chain Identifier", "Contacts", "Distance"]]
+
+def _contact_pairs(coords: np.ndarray, residue_ids: np.ndarray, cutoff: float, chunk_size: int):
+    """
+    About
+    ---------------
+    Finds the residue pairs of 'residue_contacts' one chunk of atoms at a
+    time, folding the atom pairs of every chunk into residue pairs.
+    
+    Returns
+    ---------------
+    np.ndarray
+        First residue of every residue pair (the smaller residue index)
+    np.ndarray
+        Second residue of every residue pair
+    np.ndarray
+        Shortest float32 distance between the atoms of each pair
+    """
+    
+    num_residues = int(residue_ids.max()) + 1 if len(residue_ids) > 0 else 0
+    firsts = []
+    seconds = []
+    distances = []
+    pending = 0
+    fold_at = chunk_size
+    
+    for first, second in Spatial.iter_pairs_within(coords, cutoff, chunk_size):
+        p = residue_ids[first]
+        q = residue_ids[second]
+        keep = p != q
+        first, second, p, q = first[keep], second[keep], p[keep], q[keep]
+        
+        difference = coords[first] - coords[second]
+        firsts.append(np.minimum(p, q))
+        seconds.append(np.maximum(p, q))
+        distances.append(np.sqrt(np.einsum("ij,ij->i", difference, difference)))
+        pending += len(p)
+        
+        # Fold the pairs found so far into residue pairs once they pile up
+        if pending > fold_at:
+            first, second, distance = _closest_pairs(firsts, seconds, distances, num_residues)
+            firsts, seconds, distances = [first], [second], [distance]
+            pending = len(first)
+            fold_at = max(fold_at, 2 * pending)
+    
+    return _closest_pairs(firsts, seconds, distances, num_residues)
+
+def _closest_pairs(firsts: list, seconds: list, distances: list, num_residues: int):
+    # Keeps the shortest distance of every residue pair, sorted by pair
+    keys = np.concatenate(firsts) * num_residues + np.concatenate(seconds) if len(firsts) > 0 else np.empty(0, dtype=np.int64)
+    if len(keys) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    
+    distances = np.concatenate(distances)
+    
+    order = np.argsort(keys)
+    keys, distances = keys[order], distances[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    keys, distances = keys[starts], np.minimum.reduceat(distances, starts)
+    
+    return keys // num_residues, keys % num_residues, distances
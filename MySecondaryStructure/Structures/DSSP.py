@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import Spatial
+
+# Electrostatic constant of the DSSP hydrogen bond energy (0.42e * 0.20e * 332) in kcal/mol
+HBOND_CONSTANT = 0.084 * 332
+
+# Hydrogen bonds have an energy below this value (kcal/mol)
+HBOND_ENERGY_CUTOFF = -0.5
+
+# Residues are only tested for hydrogen bonds if their CA atoms are closer than this (angstrom)
+CA_CUTOFF = 9.0
+
+# Longest C(i-1) to N(i) distance that still counts as a peptide bond (angstrom)
+PEPTIDE_BOND_CUTOFF = 2.5
+
+# Distance of the amide hydrogen from N (angstrom)
+NH_LENGTH = 1.0
+
+# Codes of the assigned states
+HELIX = "H"
+STRAND = "E"
+LOOP = "-"
+
+def assign(atom_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Assigns alpha helix, beta strand or loop to every residue from its
+    backbone coordinates, following the hydrogen bond model of DSSP
+    (Kabsch and Sander, 1983).
+    
+    Backbone hydrogen bond energies are worked out between residues whose CA
+    atoms are closer than 'CA_CUTOFF', found with a cell list. A residue is
+    helix when it lies in two consecutive i -> i+4 turns, and strand when it
+    forms a parallel or antiparallel bridge next to another bridged residue.
+    Everything else is loop. Only the first alternate location of an atom
+    is used, and residues missing N, CA, C or O are left out.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue with its chain identifier, residue sequence
+        number, insertion code, residue name and 'Secondary Structure'
+        ('H' for helix, 'E' for strand and '-' for loop)
+    """
+    
+    residue_df, backbone = backbone_atoms(atom_df)
+    num_residues = len(residue_df)
+    
+    states = np.full(num_residues, LOOP)
+    
+    if num_residues > 0:
+        n, ca, c, o = backbone
+        
+        # Residues that are peptide bonded to the residue before them
+        bonded = np.zeros(num_residues, dtype=bool)
+        same_chain = residue_df["Chain Identifier"].to_numpy()[1:] == residue_df["Chain Identifier"].to_numpy()[:-1]
+        bonded[1:] = same_chain & (np.linalg.norm(n[1:] - c[:-1], axis=1) < PEPTIDE_BOND_CUTOFF)
+        # Runs of bonded residues, i + k is only the k-th next residue if it is in the same run
+        run = np.cumsum(~bonded)
+        
+        hbonds = _hbonds(n, ca, c, o, bonded, residue_df["Residue Name"].to_numpy() == "PRO")
+        
+        strand = _bridged(hbonds, ca, run)
+        # A lone bridge is not a strand
+        ladder = np.zeros(num_residues, dtype=bool)
+        ladder[1:] |= strand[:-1] & (run[1:] == run[:-1])
+        ladder[:-1] |= strand[1:] & (run[:-1] == run[1:])
+        states[strand & ladder] = STRAND
+        
+        states[_helix(hbonds, run)] = HELIX
+    
+    residue_df["Secondary Structure"] = states
+    
+    return residue_df
+
+def segments(ss_df: pd.DataFrame, state: str) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Finds the runs of consecutive residues of one chain that share a state.
+    
+    Parameters
+    ---------------
+    ss_df : pd.DataFrame
+        A dataframe made by 'assign'
+    state : str
+        One of 'HELIX', 'STRAND' or 'LOOP'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per run with its chain identifier and first and last residue
+        sequence number
+    """
+    
+    chains = ss_df["Chain Identifier"].to_numpy()
+    numbers = ss_df["Residue Sequence Number"].to_numpy()
+    inside = ss_df["Secondary Structure"].to_numpy() == state
+    
+    boundary = np.ones(len(ss_df) + 1, dtype=bool)
+    boundary[1:-1] = (chains[1:] != chains[:-1]) | (inside[1:] != inside[:-1])
+    
+    starts = np.flatnonzero(boundary[:-1])
+    ends = np.flatnonzero(boundary[1:])
+    keep = inside[starts]
+    starts, ends = starts[keep], ends[keep]
+    
+    return pd.DataFrame({
+        "1st Chain Identifier": chains[starts],
+        "1st Residue Sequence Number": numbers[starts],
+        "2nd Residue Sequence Number": numbers[ends],
+    })
+
+def backbone_atoms(atom_df: pd.DataFrame, atom_names: tuple = ("N", "CA", "C", "O")):
+    """
+    About
+    ---------------
+    Gathers the backbone coordinates of every residue, for 'assign' and
+    'Geometry.backbone_dihedrals'. Only the first alternate location (or
+    model) of an atom is used.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    atom_names : tuple
+        Names of the backbone atoms a residue must have
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue with a complete backbone, in file order
+    tuple
+        (number of residues, 3) float32 arrays of the coordinates of every 
+        atom in 'atom_names'
+    """
+    
+    key_columns = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues"]
+    empty = (np.empty((0, 3), dtype=np.float32),) * len(atom_names)
+    
+    if len(atom_df) == 0:
+        return pd.DataFrame(columns=key_columns + ["Residue Name"]), empty
+    
+    atoms = atom_df.loc[atom_df["Atom Name"].isin(list(atom_names))]
+    # The first alternate location (or model) of every atom
+    atoms = atoms.drop_duplicates(key_columns + ["Atom Name"])
+    
+    residue_ids, residue_keys = pd.MultiIndex.from_frame(atoms[key_columns]).factorize()
+    num_residues = len(residue_keys)
+    # Residue ids follow the order residues first appear in
+    first_atoms = np.unique(residue_ids, return_index=True)[1]
+    
+    xyz = atoms[["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]].to_numpy(dtype=np.float32)
+    names = atoms["Atom Name"].to_numpy()
+    
+    backbone = []
+    complete = np.ones(num_residues, dtype=bool)
+    for atom_name in atom_names:
+        mask = names == atom_name
+        coords = np.full((num_residues, 3), np.nan, dtype=np.float32)
+        coords[residue_ids[mask]] = xyz[mask]
+        complete &= ~np.isnan(coords[:, 0])
+        backbone.append(coords)
+    
+    residue_df = atoms.iloc[first_atoms[complete]][key_columns + ["Residue Name"]].reset_index(drop=True)
+    backbone = tuple(coords[complete] for coords in backbone)
+    
+    return residue_df, backbone
+
+def _hbonds(n, ca, c, o, bonded, proline) -> np.ndarray:
+    """
+    About
+    ---------------
+    Finds backbone hydrogen bonds C=O(i) -> H-N(j) with the DSSP energy
+        
+        E = 0.084 * 332 * (1/r(ON) + 1/r(CH) - 1/r(OH) - 1/r(CN))
+    
+    Parameters
+    ---------------
+    n, ca, c, o : np.ndarray
+        Backbone coordinates of every residue
+    bonded : np.ndarray
+        Whether each residue is peptide bonded to the one before it
+    proline : np.ndarray
+        Whether each residue is a proline (which has no amide hydrogen)
+    
+    Returns
+    ---------------
+    np.ndarray
+        Sorted keys 'i * number of residues + j' of every bond from acceptor i to donor j
+    """
+    
+    num_residues = len(n)
+    
+    # The amide hydrogen sits on the N opposite the C=O of the previous residue
+    h = n.copy()
+    previous_co = c[:-1] - o[:-1]
+    previous_co /= np.linalg.norm(previous_co, axis=1)[:, None]
+    h[1:] = n[1:] + NH_LENGTH * previous_co
+    has_h = bonded & ~proline
+    
+    first, second = Spatial.pairs_within(ca, CA_CUTOFF)
+    acceptor = np.concatenate([first, second])
+    donor = np.concatenate([second, first])
+    
+    keep = has_h[donor] & (np.abs(acceptor - donor) > 1)
+    acceptor, donor = acceptor[keep], donor[keep]
+    
+    def inverse_distance(a, b):
+        return 1 / np.linalg.norm(a - b, axis=1)
+    
+    energy = HBOND_CONSTANT * (inverse_distance(o[acceptor], n[donor]) + inverse_distance(c[acceptor], h[donor])
+                               - inverse_distance(o[acceptor], h[donor]) - inverse_distance(c[acceptor], n[donor]))
+    
+    bond = energy < HBOND_ENERGY_CUTOFF
+    
+    return np.sort(acceptor[bond].astype(np.int64) * num_residues + donor[bond])
+
+def _has_hbond(hbonds: np.ndarray, acceptor: np.ndarray, donor: np.ndarray, num_residues: int) -> np.ndarray:
+    keys = acceptor.astype(np.int64) * num_residues + donor
+    
+    if len(hbonds) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    
+    slots = np.minimum(np.searchsorted(hbonds, keys), len(hbonds) - 1)
+    
+    return hbonds[slots] == keys
+
+def _helix(hbonds: np.ndarray, run: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Marks residues i to i+3 as helix wherever residues i-1 and i both start
+    an i -> i+4 turn.
+    
+    Parameters
+    ---------------
+    hbonds : np.ndarray
+        Hydrogen bond keys made by '_hbonds'
+    run : np.ndarray
+        Run of peptide bonded residues each residue belongs to
+    
+    Returns
+    ---------------
+    np.ndarray
+        Whether each residue is helix
+    """
+    
+    num_residues = len(run)
+    helix = np.zeros(num_residues, dtype=bool)
+    
+    if num_residues < 5:
+        return helix
+    
+    i = np.arange(num_residues - 4)
+    turn = np.zeros(num_residues, dtype=bool)
+    turn[i] = (run[i] == run[i + 4]) & _has_hbond(hbonds, i, i + 4, num_residues)
+    
+    starts = np.flatnonzero(turn[1:] & turn[:-1]) + 1
+    for k in range(4):
+        helix[starts + k] = True
+    
+    return helix
+
+def _bridged(hbonds: np.ndarray, ca: np.ndarray, run: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Marks residues that form a beta bridge. With Hbond(a, b) a bond from the
+    C=O of a to the N-H of b, residues i and j form a
+        
+        parallel bridge if      Hbond(i-1, j) and Hbond(j, i+1)
+                             or Hbond(j-1, i) and Hbond(i, j+1)
+        antiparallel bridge if  Hbond(i, j) and Hbond(j, i)
+                             or Hbond(i-1, j+1) and Hbond(j-1, i+1)
+    
+    Parameters
+    ---------------
+    hbonds : np.ndarray
+        Hydrogen bond keys made by '_hbonds'
+    ca : np.ndarray
+        CA coordinates of every residue
+    run : np.ndarray
+        Run of peptide bonded residues each residue belongs to
+    
+    Returns
+    ---------------
+    np.ndarray
+        Whether each residue is part of a bridge
+    """
+    
+    num_residues = len(run)
+    bridged = np.zeros(num_residues, dtype=bool)
+    
+    i, j = Spatial.pairs_within(ca, CA_CUTOFF)
+    far = (run[i] != run[j]) | (j - i > 2)
+    i, j = i[far], j[far]
+    
+    # Neighbours outside the residue's run are replaced by the residue itself,
+    # which never has a hydrogen bond with its partner's neighbour
+    last = num_residues - 1
+    i_before = np.where((i > 0) & (run[np.maximum(i - 1, 0)] == run[i]), i - 1, i)
+    i_after = np.where((i < last) & (run[np.minimum(i + 1, last)] == run[i]), i + 1, i)
+    j_before = np.where((j > 0) & (run[np.maximum(j - 1, 0)] == run[j]), j - 1, j)
+    j_after = np.where((j < last) & (run[np.minimum(j + 1, last)] == run[j]), j + 1, j)
+    
+    def hbond(a, b, valid):
+        return valid & _has_hbond(hbonds, a, b, num_residues)
+    
+    parallel = (hbond(i_before, j, i_before != i) & hbond(j, i_after, i_after != i)) \
+             | (hbond(j_before, i, j_before != j) & hbond(i, j_after, j_after != j))
+    antiparallel = (hbond(i, j, True) & hbond(j, i, True)) \
+                 | (hbond(i_before, j_after, (i_before != i) & (j_after != j)) & hbond(j_before, i_after, (j_before != j) & (i_after != i)))
+    
+    bridge = parallel | antiparallel
+    bridged[i[bridge]] = True
+    bridged[j[bridge]] = True
+    
+    return bridged
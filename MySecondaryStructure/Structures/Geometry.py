@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import DSSP
+
+# Ramachandran regions as (name, lowest phi, highest phi, lowest psi, highest
+# psi) in degrees. The first region a residue falls in is its region, and a
+# psi range whose low end is above its high end wraps around 180.
+RAMACHANDRAN_REGIONS = (
+    ("alpha",   -160.0, -20.0,  -120.0, 50.0),
+    ("beta",    -180.0, -45.0,  90.0,   -150.0),
+    ("left",    20.0,   110.0,  -60.0,  90.0),
+)
+
+# Region of residues outside every region, or without both phi and psi
+OTHER_REGION = "other"
+
+# Secondary structure suggested by each region (see 'estimate_structure')
+REGION_STRUCTURE = {"alpha": DSSP.HELIX, "beta": DSSP.STRAND}
+
+# Shortest run of residues that counts as a helix or a strand in 'estimate_structure'
+MIN_HELIX_RUN = 4
+MIN_STRAND_RUN = 3
+
+def dihedral_angles(p0: np.ndarray, p1: np.ndarray, p2: np.ndarray, p3: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Works out the dihedral angle of every set of four points at once. The
+    angle is the rotation about p1 -> p2 that takes p0 onto p3, positive when
+    it is clockwise looking down p1 -> p2 (the IUPAC convention).
+    
+    Parameters
+    ---------------
+    p0, p1, p2, p3 : np.ndarray
+        (number of angles, 3) arrays of coordinates
+    
+    Returns
+    ---------------
+    np.ndarray
+        The angles in degrees, from -180 to 180
+    """
+    
+    p0, p1, p2, p3 = (np.asarray(p, dtype=np.float64) for p in (p0, p1, p2, p3))
+    
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b1 /= np.linalg.norm(b1, axis=1)[:, None]
+        
+        # The parts of b0 and b2 at right angles to the axis
+        v = b0 - np.einsum("ij,ij->i", b0, b1)[:, None] * b1
+        w = b2 - np.einsum("ij,ij->i", b2, b1)[:, None] * b1
+        
+        x = np.einsum("ij,ij->i", v, w)
+        y = np.einsum("ij,ij->i", np.cross(b1, v), w)
+    
+    return np.degrees(np.arctan2(y, x))
+
+def backbone_dihedrals(atom_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Works out the phi, psi and omega angles of every residue in one pass over
+    the N, CA and C atoms of all chains.
+        
+        phi(i)   = C(i-1) - N(i) - CA(i) - C(i)
+        psi(i)   = N(i) - CA(i) - C(i) - N(i+1)
+        omega(i) = CA(i-1) - C(i-1) - N(i) - CA(i)
+    
+    Residues are told apart by chain, residue sequence number and insertion
+    code, only the first alternate location of an atom is used, and residues
+    missing N, CA or C are left out. An angle that reaches into a neighbour
+    is NaN when the two residues are not peptide bonded (a chain break, a
+    missing residue or the end of a chain).
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue with its chain identifier, residue sequence
+        number, insertion code, residue name, 'Phi', 'Psi' and 'Omega' in
+        degrees, and 'Ramachandran Region' (see 'ramachandran_regions')
+    """
+    
+    residue_df, (n, ca, c) = DSSP.backbone_atoms(atom_df, ("N", "CA", "C"))
+    num_residues = len(residue_df)
+    
+    # Residues that are peptide bonded to the residue before them
+    bonded = np.zeros(num_residues, dtype=bool)
+    if num_residues > 1:
+        chains = residue_df["Chain Identifier"].to_numpy()
+        bonded[1:] = (chains[1:] == chains[:-1]) & (np.linalg.norm(n[1:] - c[:-1], axis=1) < DSSP.PEPTIDE_BOND_CUTOFF)
+    
+    phi = np.full(num_residues, np.nan)
+    psi = np.full(num_residues, np.nan)
+    omega = np.full(num_residues, np.nan)
+    
+    after = np.flatnonzero(bonded)
+    before = after - 1
+    phi[after] = dihedral_angles(c[before], n[after], ca[after], c[after])
+    omega[after] = dihedral_angles(ca[before], c[before], n[after], ca[after])
+    psi[before] = dihedral_angles(n[before], ca[before], c[before], n[after])
+    
+    residue_df["Phi"] = phi
+    residue_df["Psi"] = psi
+    residue_df["Omega"] = omega
+    residue_df["Ramachandran Region"] = ramachandran_regions(phi, psi)
+    
+    return residue_df
+
+def ramachandran_regions(phi: np.ndarray, psi: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Sorts residues into the regions of the Ramachandran plot listed in
+    'RAMACHANDRAN_REGIONS' ('alpha' for right-handed helices, 'beta' for
+    strands and 'left' for left-handed helices), or 'other'.
+    
+    Parameters
+    ---------------
+    phi : np.ndarray
+        Phi angle of every residue in degrees
+    psi : np.ndarray
+        Psi angle of every residue in degrees
+    
+    Returns
+    ---------------
+    np.ndarray
+        The region of every residue
+    """
+    
+    phi = np.asarray(phi, dtype=np.float64)
+    psi = np.asarray(psi, dtype=np.float64)
+    
+    regions = np.full(len(phi), OTHER_REGION, dtype=object)
+    unassigned = ~(np.isnan(phi) | np.isnan(psi))
+    
+    for name, phi_low, phi_high, psi_low, psi_high in RAMACHANDRAN_REGIONS:
+        inside = (phi >= phi_low) & (phi <= phi_high)
+        if psi_low <= psi_high:
+            inside &= (psi >= psi_low) & (psi <= psi_high)
+        else:
+            inside &= (psi >= psi_low) | (psi <= psi_high)
+        
+        inside &= unassigned
+        regions[inside] = name
+        unassigned &= ~inside
+    
+    return regions
+
+def estimate_structure(dihedral_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Estimates the secondary structure of every residue from its
+    Ramachandran region alone, much faster than the hydrogen bonds of
+    'DSSP.assign' but rougher. Runs of at least 'MIN_HELIX_RUN' alpha
+    residues of one chain are helix, runs of at least 'MIN_STRAND_RUN' beta
+    residues are strand and everything else is loop.
+    
+    Parameters
+    ---------------
+    dihedral_df : pd.DataFrame
+        A dataframe made by 'backbone_dihedrals'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        The residue columns of 'dihedral_df' and 'Secondary Structure' with
+        the codes of 'DSSP.assign', so 'DSSP.segments' can be used on it
+    """
+    
+    key_columns = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues", "Residue Name"]
+    ss_df = dihedral_df[key_columns].copy()
+    
+    num_residues = len(dihedral_df)
+    structure = np.full(num_residues, DSSP.LOOP, dtype=object)
+    
+    regions = dihedral_df["Ramachandran Region"].to_numpy()
+    chains = dihedral_df["Chain Identifier"].to_numpy()
+    
+    for region, state in REGION_STRUCTURE.items():
+        min_run = MIN_HELIX_RUN if state == DSSP.HELIX else MIN_STRAND_RUN
+        inside = regions == region
+        
+        # Runs of residues of one chain that are all in the region
+        boundary = np.ones(num_residues + 1, dtype=bool)
+        boundary[1:-1] = (inside[1:] != inside[:-1]) | (chains[1:] != chains[:-1])
+        starts = np.flatnonzero(boundary[:-1])
+        lengths = np.diff(np.flatnonzero(boundary))
+        
+        long_runs = inside[starts] & (lengths >= min_run)
+        structure[np.repeat(long_runs, lengths)] = state
+    
+    ss_df["Secondary Structure"] = structure.astype(str)
+    
+    return ss_df
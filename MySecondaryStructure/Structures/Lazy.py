@@ -0,0 +1,25 @@
+import importlib
+
+class LazyModule():
+    """
+    About
+    ---------------
+    Stands in for a module that is slow to import. The module is imported the
+    first time one of its attributes is used, so code that never builds a
+    table never pays for importing pandas.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        
+        return getattr(self._module, attribute)
+    
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+# Imported when a table is first built or read
+pandas = LazyModule("pandas")
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import Bonds
+from MySecondaryStructure.Structures import Spatial
+
+# Van der Waals radii in angstroms by element (Bondi 1964, Mantina et al.
+# 2009 for the elements Bondi left out)
+VDW_RADII = {
+    "H": 1.10, "C": 1.70, "N": 1.55, "O": 1.52, "F": 1.47, "P": 1.80, "S": 1.80,
+    "CL": 1.75, "BR": 1.85, "I": 1.98, "SE": 1.90, "NA": 2.27, "MG": 1.73,
+    "K": 2.75, "CA": 2.31, "MN": 1.97, "FE": 1.94, "CO": 1.92, "NI": 1.63,
+    "CU": 1.40, "ZN": 1.39,
+}
+
+# Radius of elements missing from 'VDW_RADII'
+DEFAULT_RADIUS = 1.80
+
+# Radius of the solvent probe (water) in angstroms
+PROBE_RADIUS = 1.4
+
+# Number of test points on the sphere around every atom
+NUM_POINTS = 100
+
+# Number of atoms whose test points are checked at once, which bounds the
+# memory taken by the (pairs, points) arrays
+CHUNK_SIZE = 1024
+
+def sphere_points(num_points: int = NUM_POINTS) -> np.ndarray:
+    """
+    About
+    ---------------
+    Spreads points evenly over the unit sphere along a golden section spiral.
+    
+    Parameters
+    ---------------
+    num_points : int
+        Number of points
+    
+    Returns
+    ---------------
+    np.ndarray
+        (num_points, 3) float32 array of points
+    """
+    
+    i = np.arange(num_points, dtype=np.float64) + 0.5
+    z = 1 - 2 * i / num_points
+    r = np.sqrt(1 - z * z)
+    theta = np.pi * (3 - np.sqrt(5)) * i
+    
+    return np.stack([r * np.cos(theta), r * np.sin(theta), z], axis=1).astype(np.float32)
+
+def atom_radii(elements: pd.Series) -> np.ndarray:
+    # Van der Waals radius of every element symbol (see 'Bonds.element_symbols')
+    return elements.map(VDW_RADII).fillna(DEFAULT_RADIUS).to_numpy(dtype=np.float32)
+
+def shrake_rupley(coords: np.ndarray, radii: np.ndarray, atoms: np.ndarray = None, probe_radius: float = PROBE_RADIUS,
+                  num_points: int = NUM_POINTS, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    About
+    ---------------
+    Works out the solvent accessible surface area of atoms with the
+    Shrake-Rupley method. Test points are put on a sphere of radius (atom
+    radius + probe radius) around every atom, and the accessible area is the
+    share of points not inside the sphere of a neighbouring atom.
+    
+    Neighbours come from a cell list (see 'Spatial.pairs_within'), and the
+    points of all neighbour pairs of a chunk of atoms are tested at once as
+    one (pairs, points) array, so there is no loop over atoms or points.
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        (number of atoms, 3) coordinates of every atom that can cover a surface
+    radii : np.ndarray
+        Van der Waals radius of every atom
+    atoms : np.ndarray
+        Indices of the atoms to work out the area of, all of them if None
+    probe_radius : float
+        Radius of the solvent probe
+    num_points : int
+        Number of test points per atom
+    chunk_size : int
+        Number of atoms tested at once
+    
+    Returns
+    ---------------
+    np.ndarray
+        Accessible area in square angstroms of every atom in 'atoms'
+    """
+    
+    coords = np.asarray(coords, dtype=np.float32)
+    expanded = np.asarray(radii, dtype=np.float32) + np.float32(probe_radius)
+    atoms = np.arange(len(coords)) if atoms is None else np.asarray(atoms, dtype=np.int64)
+    areas = np.zeros(len(atoms), dtype=np.float64)
+    
+    if len(atoms) == 0:
+        return areas
+    
+    # Only atoms within reach of the box around 'atoms' can cover them
+    reach = 2 * float(expanded.max())
+    low = coords[atoms].min(axis=0) - reach
+    high = coords[atoms].max(axis=0) + reach
+    nearby = np.flatnonzero(np.all((coords >= low) & (coords <= high), axis=1))
+    
+    # Neighbours of every atom as CSR arrays, the pairs listed both ways
+    first, second = Spatial.pairs_within(coords[nearby], reach)
+    first, second = nearby[first], nearby[second]
+    difference = coords[first] - coords[second]
+    overlapping = np.einsum("ij,ij->i", difference, difference) < (expanded[first] + expanded[second]) ** 2
+    first, second = first[overlapping], second[overlapping]
+    
+    rows = np.concatenate([first, second])
+    neighbors = np.concatenate([second, first])
+    order = np.argsort(rows, kind="stable")
+    rows, neighbors = rows[order], neighbors[order]
+    indptr = np.searchsorted(rows, np.arange(len(coords) + 1))
+    
+    unit_points = sphere_points(num_points)
+    full_area = 4 * np.pi * expanded[atoms].astype(np.float64) ** 2
+    
+    for start in range(0, len(atoms), chunk_size):
+        chunk = atoms[start:start + chunk_size]
+        counts = indptr[chunk + 1] - indptr[chunk]
+        
+        # Every (atom, neighbour) pair of the chunk
+        pair_atoms = np.repeat(chunk, counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_neighbors = neighbors[np.repeat(indptr[chunk], counts) + within]
+        
+        # Squared distance from every test point to the neighbour,
+        # |o + r u|^2 = |o|^2 + r^2 + 2 r (o . u) with o the offset between
+        # the centres, so the points are tested with one matrix product
+        offset = coords[pair_atoms] - coords[pair_neighbors]
+        pair_radii = expanded[pair_atoms]
+        base = np.einsum("ij,ij->i", offset, offset) + pair_radii * pair_radii - expanded[pair_neighbors] ** 2
+        buried = (offset @ unit_points.T) * (2 * pair_radii)[:, None] < -base[:, None]
+        
+        # A point is covered if any neighbour covers it
+        covered = np.zeros((len(chunk), num_points), dtype=bool)
+        if len(pair_atoms) > 0:
+            pair_starts = np.cumsum(counts) - counts
+            has_pairs = counts > 0
+            covered[has_pairs] = np.logical_or.reduceat(buried, pair_starts[has_pairs], axis=0)
+        
+        exposed = num_points - covered.sum(axis=1)
+        areas[start:start + len(chunk)] = full_area[start:start + len(chunk)] * exposed / num_points
+    
+    return areas
+
+def atom_sasa(atom_df: pd.DataFrame, probe_radius: float = PROBE_RADIUS, num_points: int = NUM_POINTS,
+              jobs: int = 1) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Works out the solvent accessible surface area of every atom (see
+    'shrake_rupley'). Hydrogens and water are left out, and only the first
+    alternate location of an atom is used. With more than one job the chains
+    are spread over a pool of worker processes, every chain still covered by
+    the atoms of the other chains. Starting the pool costs more than a
+    small protein takes, so it only pays off for large structures.
+    
+    Parameters
+    ---------------
+    atom_df : pd.DataFrame
+        The atom dataframe of a Protein
+    probe_radius : float
+        Radius of the solvent probe in angstroms
+    num_points : int
+        Number of test points per atom
+    jobs : int
+        Number of worker processes
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per atom with its serial number, name, residue and chain,
+        'Radius' and 'SASA' in square angstroms
+    """
+    
+    columns = ["Atom Serial Number", "Atom Name", "Residue Name", "Chain Identifier",
+               "Residue Sequence Number", "Code for Insertions of Residues"]
+    if len(atom_df) == 0:
+        return pd.DataFrame(columns=columns + ["Radius", "SASA"])
+    
+    atoms = atom_df.loc[~atom_df["Residue Name"].astype(str).isin(Bonds.WATER_NAMES)]
+    atoms = atoms.drop_duplicates(columns[2:] + ["Atom Name"])
+    elements = Bonds.element_symbols(atoms)
+    heavy = ~elements.isin(["H", "D"]).to_numpy()
+    atoms = atoms.loc[heavy]
+    radii = atom_radii(elements.loc[heavy])
+    
+    coords = atoms[["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]].to_numpy(dtype=np.float32)
+    chains = atoms["Chain Identifier"].astype(str).to_numpy()
+    
+    if jobs > 1 and len(np.unique(chains)) > 1:
+        groups = [np.flatnonzero(chains == c) for c in pd.unique(chains)]
+        areas = np.zeros(len(atoms), dtype=np.float64)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(shrake_rupley, [coords] * len(groups), [radii] * len(groups), groups,
+                                   [probe_radius] * len(groups), [num_points] * len(groups))
+            for group, group_areas in zip(groups, results):
+                areas[group] = group_areas
+    else:
+        areas = shrake_rupley(coords, radii, None, probe_radius, num_points)
+    
+    sasa_df = atoms[columns].reset_index(drop=True)
+    sasa_df["Radius"] = radii
+    sasa_df["SASA"] = areas
+    
+    return sasa_df
+
+def residue_sasa(sasa_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Adds up the accessible area of the atoms of every residue.
+    
+    Parameters
+    ---------------
+    sasa_df : pd.DataFrame
+        A dataframe made by 'atom_sasa'
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        One row per residue with its chain identifier, residue sequence
+        number, insertion code, residue name and 'SASA', in file order
+    """
+    
+    key_columns = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues", "Residue Name"]
+    
+    return sasa_df.groupby(key_columns, sort=False, observed=True)["SASA"].sum().reset_index()
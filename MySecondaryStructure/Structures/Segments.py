@@ -0,0 +1,138 @@
+import numpy as np
+
+def merge_intervals(chains, starts, ends):
+    """
+    About
+    ---------------
+    Merges residue intervals that overlap or touch, separately for every
+    chain, in one sorted pass.
+    
+    Parameters
+    ---------------
+    chains : array-like
+        Chain identifier of each interval
+    starts : array-like
+        First residue sequence number of each interval
+    ends : array-like
+        Last residue sequence number of each interval
+    
+    Returns
+    ---------------
+    np.ndarray
+        Chain identifier of each merged interval, sorted by chain
+    np.ndarray
+        First residue of each merged interval
+    np.ndarray
+        Last residue of each merged interval
+    """
+    
+    chains = np.asarray(chains, dtype=str)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    
+    if len(chains) == 0:
+        return chains, starts, ends
+    
+    # Records that list a structure from its last residue to its first
+    low = np.minimum(starts, ends)
+    high = np.maximum(starts, ends)
+    
+    order = np.lexsort((low, chains))
+    chains, low, high = chains[order], low[order], high[order]
+    
+    new_chain = np.empty(len(chains), dtype=bool)
+    new_chain[0] = True
+    new_chain[1:] = chains[1:] != chains[:-1]
+    
+    # Running maximum of the interval ends that restarts with every chain.
+    # Each chain is lifted above the ones before it so a single cumulative
+    # maximum never carries over from one chain to the next.
+    base = low.min()
+    lift = (np.cumsum(new_chain) - 1) * (high.max() - base + 2)
+    running_end = np.maximum.accumulate(high - base + lift) - lift + base
+    
+    # An interval opens a new segment when it starts a chain or leaves at
+    # least one residue uncovered after everything before it
+    new_segment = new_chain.copy()
+    new_segment[1:] |= low[1:] > running_end[:-1] + 1
+    
+    first = np.flatnonzero(new_segment)
+    last = np.append(first[1:] - 1, len(chains) - 1)
+    
+    return chains[first], low[first], running_end[last]
+
+def find_loops(seg_chains, seg_starts, seg_ends, chain_lengths: dict):
+    """
+    About
+    ---------------
+    Finds the residue ranges of every chain that are not covered by a
+    secondary structure segment. Chains are numbered from residue 1 up to
+    their length. Chains missing from 'chain_lengths' have no loop after
+    their last segment, and chains without segments are one loop from
+    residue 1 to their length.
+    
+    Parameters
+    ---------------
+    seg_chains : np.ndarray
+        Chain identifier of each segment, as returned by 'merge_intervals'
+    seg_starts : np.ndarray
+        First residue of each segment
+    seg_ends : np.ndarray
+        Last residue of each segment
+    chain_lengths : dict
+        Number of residues in each chain
+    
+    Returns
+    ---------------
+    np.ndarray
+        Chain identifier of each loop, sorted by chain and start
+    np.ndarray
+        First residue of each loop
+    np.ndarray
+        Last residue of each loop
+    """
+    
+    seg_chains = np.asarray(seg_chains, dtype=str)
+    
+    loop_chains = []
+    loop_starts = []
+    loop_ends = []
+    
+    if len(seg_chains) > 0:
+        same_chain = seg_chains[1:] == seg_chains[:-1]
+        first = np.append(True, ~same_chain)
+        last = np.append(~same_chain, True)
+        
+        # Between two segments of the same chain
+        loop_chains.append(seg_chains[1:][same_chain])
+        loop_starts.append(seg_ends[:-1][same_chain] + 1)
+        loop_ends.append(seg_starts[1:][same_chain] - 1)
+        
+        # Before the first segment of a chain
+        leading = first & (seg_starts > 1)
+        loop_chains.append(seg_chains[leading])
+        loop_starts.append(np.ones(leading.sum(), dtype=np.int64))
+        loop_ends.append(seg_starts[leading] - 1)
+        
+        # After the last segment of a chain
+        known = np.array([c in chain_lengths for c in seg_chains], dtype=bool)
+        lengths = np.array([chain_lengths.get(c, 0) for c in seg_chains], dtype=np.int64)
+        trailing = last & known & (seg_ends < lengths)
+        loop_chains.append(seg_chains[trailing])
+        loop_starts.append(seg_ends[trailing] + 1)
+        loop_ends.append(lengths[trailing])
+    
+    # Chains without any secondary structure
+    seg_chain_set = set(seg_chains)
+    bare_chains = [c for c in chain_lengths if c not in seg_chain_set]
+    loop_chains.append(np.array(bare_chains, dtype=str))
+    loop_starts.append(np.ones(len(bare_chains), dtype=np.int64))
+    loop_ends.append(np.array([chain_lengths[c] for c in bare_chains], dtype=np.int64))
+    
+    loop_chains = np.concatenate(loop_chains)
+    loop_starts = np.concatenate(loop_starts)
+    loop_ends = np.concatenate(loop_ends)
+    
+    order = np.lexsort((loop_starts, loop_chains))
+    
+    return loop_chains[order], loop_starts[order], loop_ends[order]
@@ -0,0 +1,342 @@
+import numpy as np
+
+# Offsets to the neighbouring cells that are compared with a cell. Only half
+# of the 26 neighbours are listed so every pair of cells is visited once.
+HALF_NEIGHBOR_OFFSETS = [
+    (dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)
+]
+
+# Default edge length of the cells of a 'CellIndex' in angstroms
+DEFAULT_CELL_SIZE = 5.0
+
+# Default number of points compared at once by 'iter_pairs_within'
+DEFAULT_CHUNK_SIZE = 32768
+
+class CellIndex():
+    """
+    About
+    ---------------
+    A uniform cell list over a set of 3D points. Points are binned into cubic
+    cells and sorted by cell, so the points of any cell are one contiguous
+    slice and a query only looks at the cells that can hold an answer.
+    Coordinates are kept as float32 and every query returns point indices.
+    """
+    def __init__(self, coords: np.ndarray, cell_size: float = DEFAULT_CELL_SIZE):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        
+        (self.origin, self.shape, self.order, self.sorted_keys,
+         self.cell_keys, self.cell_starts, self.cell_counts) = _bin(self.coords, self.cell_size)
+        
+        # Corners of the bounding box, used to stop growing a nearest search
+        self.bounds = np.zeros((2, 3), dtype=np.float32)
+        if len(self.coords) > 0:
+            self.bounds = np.stack([self.coords.min(axis=0), self.coords.max(axis=0)])
+    
+    def __len__(self) -> int:
+        return len(self.coords)
+    
+    def within(self, point, radius: float) -> np.ndarray:
+        """
+        About
+        ---------------
+        Finds the points closer than 'radius' to a point.
+        
+        Parameters
+        ---------------
+        point : array-like
+            The x, y and z coordinate of the query point
+        radius : float
+            The distance cutoff
+        
+        Returns
+        ---------------
+        np.ndarray
+            Indices of the points within 'radius', sorted by distance
+        """
+        
+        point = np.asarray(point, dtype=np.float32).reshape(3)
+        candidates = self._candidates(point, radius)
+        
+        difference = self.coords[candidates] - point
+        distances = np.einsum("ij,ij->i", difference, difference)
+        close = distances < radius * radius
+        candidates, distances = candidates[close], distances[close]
+        
+        return candidates[np.argsort(distances, kind="stable")]
+    
+    def nearest(self, point, k: int) -> np.ndarray:
+        """
+        About
+        ---------------
+        Finds the 'k' points closest to a point. The search radius starts at
+        one cell and doubles until it holds at least 'k' points.
+        
+        Parameters
+        ---------------
+        point : array-like
+            The x, y and z coordinate of the query point
+        k : int
+            Number of points to find
+        
+        Returns
+        ---------------
+        np.ndarray
+            Indices of the nearest points, closest first
+        """
+        
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        point = np.asarray(point, dtype=np.float32).reshape(3)
+        
+        # Once the radius reaches past the far side of the bounding box every
+        # point is inside it
+        extent = np.abs(self.bounds - point).max()
+        radius = self.cell_size
+        while True:
+            found = self.within(point, radius)
+            if len(found) >= k or radius > 2 * extent:
+                return found[:k]
+            radius *= 2
+    
+    def pairs(self, cutoff: float):
+        """
+        About
+        ---------------
+        Finds every pair of points closer than 'cutoff'. The cells of the index
+        are reused when they are at least as wide as the cutoff.
+        
+        Parameters
+        ---------------
+        cutoff : float
+            The distance cutoff
+        
+        Returns
+        ---------------
+        np.ndarray
+            Index of the first point of each pair
+        np.ndarray
+            Index of the second point of each pair (always larger than the first)
+        """
+        
+        if cutoff > self.cell_size:
+            return pairs_within(self.coords, cutoff)
+        
+        return _pairs_in_cells(self.coords, cutoff, self.shape, self.order, self.sorted_keys,
+                               self.cell_keys, self.cell_starts, self.cell_counts)
+    
+    def _candidates(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """
+        About
+        ---------------
+        Collects the points of every cell that overlaps the bounding box of a
+        sphere.
+        
+        Parameters
+        ---------------
+        point : np.ndarray
+            Centre of the sphere
+        radius : float
+            Radius of the sphere
+        
+        Returns
+        ---------------
+        np.ndarray
+            Indices of the points in those cells
+        """
+        
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        # Cells are numbered from 1 so the box is clipped to the occupied grid
+        low = np.floor((point - radius - self.origin) / self.cell_size).astype(np.int64) + 1
+        high = np.floor((point + radius - self.origin) / self.cell_size).astype(np.int64) + 1
+        low = np.maximum(low, 1)
+        high = np.minimum(high, self.shape - 2)
+        
+        if np.any(high < low):
+            return np.empty(0, dtype=np.int64)
+        
+        # A box covering more cells than are occupied is cheaper to scan whole
+        if np.prod(high - low + 1) > len(self.cell_keys):
+            return np.arange(len(self), dtype=np.int64)
+        
+        x, y, z = np.meshgrid(*(np.arange(l, h + 1) for l, h in zip(low, high)), indexing="ij")
+        box_keys = ((x * self.shape[1] + y) * self.shape[2] + z).ravel()
+        
+        slots = np.minimum(np.searchsorted(self.cell_keys, box_keys), len(self.cell_keys) - 1)
+        slots = slots[self.cell_keys[slots] == box_keys]
+        
+        counts = self.cell_counts[slots]
+        starts = self.cell_starts[slots]
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        
+        return self.order[np.repeat(starts, counts) + within]
+
+def pairs_within(coords: np.ndarray, cutoff: float):
+    """
+    About
+    ---------------
+    Finds every pair of points closer than 'cutoff' with a uniform cell list.
+    Points are binned into cubic cells as wide as the cutoff, so only points
+    in the same or neighbouring cells are ever compared.
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        A (number of points, 3) array of coordinates
+    cutoff : float
+        The distance cutoff
+    
+    Returns
+    ---------------
+    np.ndarray
+        Index of the first point of each pair
+    np.ndarray
+        Index of the second point of each pair (always larger than the first)
+    """
+    
+    coords = np.asarray(coords, dtype=np.float32)
+    
+    if len(coords) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    _, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts = _bin(coords, cutoff)
+    
+    return _pairs_in_cells(coords, cutoff, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts)
+
+def iter_pairs_within(coords: np.ndarray, cutoff: float, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    About
+    ---------------
+    Finds every pair of points closer than 'cutoff' like 'pairs_within', a
+    chunk at a time. Each chunk compares 'chunk_size' points (in cell order)
+    with their neighbours, so the memory taken follows the chunk size and
+    not the number of points.
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        A (number of points, 3) array of coordinates
+    cutoff : float
+        The distance cutoff
+    chunk_size : int
+        Number of points compared in one chunk
+    
+    Yields
+    ---------------
+    np.ndarray
+        Index of the first point of each pair found in the chunk
+    np.ndarray
+        Index of the second point of each pair (always larger than the first)
+    """
+    
+    coords = np.asarray(coords, dtype=np.float32)
+    if len(coords) < 2:
+        return
+    
+    _, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts = _bin(coords, cutoff)
+    
+    for start in range(0, len(coords), chunk_size):
+        yield _pairs_in_cells(coords, cutoff, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts, 
+                              start, start + chunk_size)
+
+def _bin(coords: np.ndarray, cell_size: float):
+    """
+    About
+    ---------------
+    Sorts points into cubic cells. Cells are numbered from 1 and the grid has
+    one spare cell on every side, so neighbour offsets never wrap around.
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        A (number of points, 3) float32 array of coordinates
+    cell_size : float
+        Edge length of a cell
+    
+    Returns
+    ---------------
+    tuple
+        Grid origin, grid shape, the point order sorted by cell, the sorted
+        cell key of every point, and the key, first sorted position and point
+        count of every occupied cell
+    """
+    
+    if len(coords) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return np.zeros(3, dtype=np.float32), np.full(3, 2, dtype=np.int64), empty, empty, empty, empty, empty
+    
+    origin = coords.min(axis=0)
+    cells = np.floor((coords - origin) / cell_size).astype(np.int64) + 1
+    shape = cells.max(axis=0) + 2
+    keys = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+    
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    cell_keys, cell_starts, cell_counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+    
+    return origin, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts
+
+def _pairs_in_cells(coords, cutoff, shape, order, sorted_keys, cell_keys, cell_starts, cell_counts, start=0, stop=None):
+    """
+    About
+    ---------------
+    Compares the points of every cell with the points of the same cell and
+    its half of the neighbouring cells. The cells must be at least as wide as
+    the cutoff. With 'start' and 'stop' only the points at those positions of
+    the cell order are compared with their neighbours.
+    
+    Returns
+    ---------------
+    np.ndarray
+        Index of the first point of each pair
+    np.ndarray
+        Index of the second point of each pair (always larger than the first)
+    """
+    
+    if len(coords) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    first = []
+    second = []
+    cutoff_squared = cutoff * cutoff
+    # Coordinates in cell order, so the points of a cell sit next to each other
+    sorted_coords = coords[order]
+    
+    for offset in [(0, 0, 0)] + HALF_NEIGHBOR_OFFSETS:
+        key_offset = (offset[0] * shape[1] + offset[1]) * shape[2] + offset[2]
+        
+        # Cell of every (sorted) point and where its neighbour cell is stored
+        neighbor_keys = sorted_keys[start:stop] + key_offset
+        slots = np.searchsorted(cell_keys, neighbor_keys)
+        slots = np.minimum(slots, len(cell_keys) - 1)
+        found = cell_keys[slots] == neighbor_keys
+        
+        points = np.flatnonzero(found)
+        slots = slots[points]
+        points += start
+        counts = cell_counts[slots]
+        starts = cell_starts[slots]
+        
+        # Every point is paired with every point of its neighbour cell
+        p = np.repeat(points, counts)
+        within = np.arange(len(p)) - np.repeat(np.cumsum(counts) - counts, counts)
+        q = np.repeat(starts, counts) + within
+        
+        if offset == (0, 0, 0):
+            keep = p < q
+            p, q = p[keep], q[keep]
+        
+        difference = sorted_coords[p] - sorted_coords[q]
+        close = np.einsum("ij,ij->i", difference, difference) < cutoff_squared
+        
+        first.append(order[p[close]])
+        second.append(order[q[close]])
+    
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+    
+    return np.minimum(first, second), np.maximum(first, second)
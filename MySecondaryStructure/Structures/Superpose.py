@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+
+# Columns an atom is matched on between structures
+KEY_COLUMNS = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues", "Atom Name"]
+
+# Number of models compared with every other model at once by 'pairwise_rmsd'
+BLOCK_SIZE = 128
+
+def match_atoms(atom_dfs: Iterable[pd.DataFrame], atom_names: Iterable[str] = ("CA",)):
+    """
+    About
+    ---------------
+    Finds the atoms every structure has, matched on chain identifier, residue
+    sequence number, insertion code and atom name, and stacks their
+    coordinates. Only the first alternate location of an atom is used. The
+    structures can be the models of one file (see 'ReadPDB.iter_models') or
+    the first models of many files.
+    
+    Parameters
+    ---------------
+    atom_dfs : Iterable[pd.DataFrame]
+        Atom dataframes of the structures
+    atom_names : Iterable[str]
+        Names of the atoms to use, every atom if None
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        The columns of 'KEY_COLUMNS' of every matched atom, in the order of the
+        first structure
+    np.ndarray
+        (number of structures, number of atoms, 3) float32 coordinates
+    """
+    
+    if atom_names is not None:
+        atom_names = list(atom_names)
+    
+    tables = []
+    common = None
+    for atom_df in atom_dfs:
+        atoms = atom_df
+        if atom_names is not None and len(atom_df) > 0:
+            atoms = atom_df.loc[atom_df["Atom Name"].astype(str).isin(atom_names)]
+        if len(atoms) == 0:
+            tables.append(None)
+            common = pd.MultiIndex.from_arrays([[]] * len(KEY_COLUMNS), names=KEY_COLUMNS)
+            continue
+        
+        atoms = atoms.drop_duplicates(KEY_COLUMNS)
+        keys = pd.MultiIndex.from_arrays([
+            atoms["Chain Identifier"].astype(str).to_numpy(),
+            atoms["Residue Sequence Number"].to_numpy(dtype=np.int64),
+            atoms["Code for Insertions of Residues"].astype(str).to_numpy(),
+            atoms["Atom Name"].astype(str).to_numpy(),
+        ], names=KEY_COLUMNS)
+        coords = atoms[["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]].to_numpy(dtype=np.float32)
+        
+        tables.append((keys, coords))
+        common = keys if common is None else common.intersection(keys, sort=False)
+    
+    if common is None or len(common) == 0:
+        return pd.DataFrame(columns=KEY_COLUMNS), np.empty((len(tables), 0, 3), dtype=np.float32)
+    
+    stacked = np.empty((len(tables), len(common), 3), dtype=np.float32)
+    for i, (keys, coords) in enumerate(tables):
+        stacked[i] = coords[keys.get_indexer(common)]
+    
+    return common.to_frame(index=False), stacked
+
+def kabsch(mobile: np.ndarray, reference: np.ndarray):
+    """
+    About
+    ---------------
+    Finds the rotations that best superpose structures on references
+    (Kabsch 1976), all at once. The covariance matrices of every pair are
+    built with one 'einsum' and decomposed with one batched SVD, with the
+    sign of the last axis flipped where needed so no rotation is a
+    reflection.
+    
+    Parameters
+    ---------------
+    mobile : np.ndarray
+        (number of atoms, 3) or (batch, number of atoms, 3) coordinates to move
+    reference : np.ndarray
+        (number of atoms, 3) or (batch, number of atoms, 3) coordinates to move
+        them onto, a single reference is used for the whole batch
+    
+    Returns
+    ---------------
+    np.ndarray
+        (batch, 3, 3) rotations. Centred 'mobile' coordinates (as rows)
+        times the rotation lie on the centred reference.
+    np.ndarray
+        (batch, 3) translations, added after the rotation
+    np.ndarray
+        RMSD after superposition of every structure
+    """
+    
+    mobile = np.asarray(mobile, dtype=np.float32)
+    reference = np.asarray(reference, dtype=np.float32)
+    mobile = mobile.reshape((-1,) + mobile.shape[-2:])
+    reference = reference.reshape((-1,) + reference.shape[-2:])
+    
+    mobile_centres = mobile.mean(axis=1, keepdims=True, dtype=np.float64)
+    reference_centres = reference.mean(axis=1, keepdims=True, dtype=np.float64)
+    mobile_centred = mobile - mobile_centres
+    reference_centred = reference - reference_centres
+    
+    covariance = np.einsum("...ni,...nj->...ij", mobile_centred, reference_centred)
+    u, s, vt = np.linalg.svd(covariance)
+    
+    # Flip the last axis where the best orthogonal matrix is a reflection
+    signs = np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    signs[signs == 0] = 1
+    u[:, :, 2] *= signs[:, None]
+    rotations = u @ vt
+    
+    translations = reference_centres[:, 0] - np.einsum("...i,...ij->...j", mobile_centres[:, 0], rotations)
+    
+    squares = (np.einsum("bni,bni->b", mobile_centred, mobile_centred) +
+               np.einsum("bni,bni->b", reference_centred, reference_centred))
+    squared_deviation = squares - 2 * (s[:, 0] + s[:, 1] + signs * s[:, 2])
+    rmsds = np.sqrt(np.maximum(squared_deviation, 0) / max(mobile.shape[1], 1))
+    
+    return rotations, translations, rmsds
+
+def superpose(mobile: np.ndarray, reference: np.ndarray):
+    """
+    About
+    ---------------
+    Moves structures onto a reference (or one reference each) with the
+    rotations and translations of 'kabsch'.
+    
+    Parameters
+    ---------------
+    mobile : np.ndarray
+        (batch, number of atoms, 3) coordinates to move
+    reference : np.ndarray
+        (number of atoms, 3) or (batch, number of atoms, 3) coordinates to
+        move them onto
+    
+    Returns
+    ---------------
+    np.ndarray
+        (batch, number of atoms, 3) float32 superposed coordinates
+    np.ndarray
+        RMSD of every structure to its reference
+    """
+    
+    rotations, translations, rmsds = kabsch(mobile, reference)
+    mobile = np.asarray(mobile, dtype=np.float32).reshape((-1,) + np.shape(mobile)[-2:])
+    
+    moved = np.einsum("bni,bij->bnj", mobile, rotations) + translations[:, None, :]
+    
+    return moved.astype(np.float32), rmsds
+
+def rmsd_to_reference(coords: np.ndarray, reference) -> np.ndarray:
+    """
+    About
+    ---------------
+    Works out the RMSD of every structure to one reference after
+    superposition (one against many).
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        (batch, number of atoms, 3) coordinates, as made by 'match_atoms'
+    reference : int or np.ndarray
+        Index of the reference in 'coords', or its (number of atoms, 3)
+        coordinates
+    
+    Returns
+    ---------------
+    np.ndarray
+        RMSD of every structure
+    """
+    
+    coords = np.asarray(coords, dtype=np.float32)
+    if np.ndim(reference) == 0:
+        reference = coords[int(reference)]
+    
+    return kabsch(coords, reference)[2]
+
+def pairwise_rmsd(coords: np.ndarray, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """
+    About
+    ---------------
+    Works out the RMSD after superposition between every pair of structures.
+    
+    The rotations themselves are never built. The RMSD only needs the
+    singular values of the covariance matrix of a pair (and the sign of its
+    determinant), which come in closed form (see '_signed_singular_sum')
+    instead of from an SVD, and the covariance matrices of a block of structures
+    against all structures are one matrix product of the centred coordinates
+    laid out as (3 * number of structures, number of atoms). Blocks are
+    'block_size' structures high, so memory follows the block size times the
+    number of structures.
+    
+    Parameters
+    ---------------
+    coords : np.ndarray
+        (batch, number of atoms, 3) coordinates, as made by 'match_atoms'
+    block_size : int
+        Number of structures compared with all the others at once
+    
+    Returns
+    ---------------
+    np.ndarray
+        (batch, batch) symmetric float32 matrix of RMSDs
+    """
+    
+    coords = np.asarray(coords, dtype=np.float32)
+    num_structures, num_atoms = coords.shape[:2]
+    rmsds = np.zeros((num_structures, num_structures), dtype=np.float32)
+    if num_structures == 0 or num_atoms == 0:
+        return rmsds
+    
+    centred = (coords - coords.mean(axis=1, keepdims=True, dtype=np.float64)).astype(np.float64)
+    squares = np.einsum("bni,bni->b", centred, centred)
+    # Row 3 * b + i holds the i coordinate of every atom of structure b
+    flat = np.ascontiguousarray(centred.transpose(0, 2, 1).reshape(3 * num_structures, num_atoms))
+    
+    for start in range(0, num_structures, block_size):
+        stop = min(start + block_size, num_structures)
+        
+        # covariance[a, b, i, j] = sum over atoms of a_i * b_j
+        covariance = (flat[3 * start:3 * stop] @ flat.T).reshape(stop - start, 3, num_structures, 3).transpose(0, 2, 1, 3)
+        squared_deviation = squares[start:stop, None] + squares[None, :] - 2 * _signed_singular_sum(covariance)
+        rmsds[start:stop] = np.sqrt(np.maximum(squared_deviation, 0) / num_atoms)
+    
+    np.fill_diagonal(rmsds, 0)
+    
+    return rmsds
+
+def _signed_singular_sum(covariance: np.ndarray) -> np.ndarray:
+    """
+    About
+    ---------------
+    Works out s1 + s2 + sign(det) * s3 of many 3x3 matrices, where s1 >= s2 >=
+    s3 are the singular values. They are the square roots of the eigenvalues
+    of the symmetric matrix A = H^T H, found with the trigonometric solution
+    of its characteristic cubic, which is several times faster than a
+    batched SVD of 3x3 matrices.
+    
+    Parameters
+    ---------------
+    covariance : np.ndarray
+        (..., 3, 3) matrices
+    
+    Returns
+    ---------------
+    np.ndarray
+        The signed sum of the singular values of every matrix
+    """
+    
+    h = [[covariance[..., i, j] for j in range(3)] for i in range(3)]
+    
+    # The upper triangle of A = H^T H
+    a = {(i, j): h[0][i] * h[0][j] + h[1][i] * h[1][j] + h[2][i] * h[2][j] for i in range(3) for j in range(i, 3)}
+    
+    q = (a[0, 0] + a[1, 1] + a[2, 2]) / 3
+    off_diagonal = a[0, 1] ** 2 + a[0, 2] ** 2 + a[1, 2] ** 2
+    p = np.sqrt(((a[0, 0] - q) ** 2 + (a[1, 1] - q) ** 2 + (a[2, 2] - q) ** 2 + 2 * off_diagonal) / 6)
+    
+    # Determinant of (A - q I) / p, whose eigenvalues are 2 cos(phi + 2 pi k / 3)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b00, b11, b22 = (a[0, 0] - q) / p, (a[1, 1] - q) / p, (a[2, 2] - q) / p
+        b01, b02, b12 = a[0, 1] / p, a[0, 2] / p, a[1, 2] / p
+    half_det = (b00 * (b11 * b22 - b12 * b12) - b01 * (b01 * b22 - b12 * b02) + b02 * (b01 * b12 - b11 * b02)) / 2
+    phi = np.arccos(np.clip(np.nan_to_num(half_det), -1, 1)) / 3
+    
+    largest = q + 2 * p * np.cos(phi)
+    smallest = q + 2 * p * np.cos(phi + 2 * np.pi / 3)
+    middle = 3 * q - largest - smallest
+    
+    determinant = (h[0][0] * (h[1][1] * h[2][2] - h[1][2] * h[2][1]) -
+                   h[0][1] * (h[1][0] * h[2][2] - h[1][2] * h[2][0]) +
+                   h[0][2] * (h[1][0] * h[2][1] - h[1][1] * h[2][0]))
+    signs = np.where(determinant < 0, -1.0, 1.0)
+    
+    return (np.sqrt(np.maximum(largest, 0)) + np.sqrt(np.maximum(middle, 0)) + 
+            signs * np.sqrt(np.maximum(smallest, 0)))
@@ -1,157 +1,818 @@
-import pandas as pd
+from __future__ import annotations
+
+import numpy as np
+
+from MySecondaryStructure.Structures.Lazy import pandas as pd
+from MySecondaryStructure.Structures import Bonds
+from MySecondaryStructure.Structures import Contacts
+from MySecondaryStructure.Structures import DSSP
+from MySecondaryStructure.Structures import Geometry
+from MySecondaryStructure.Structures import SASA
+from MySecondaryStructure.Structures import Segments
+from MySecondaryStructure.Structures import Spatial
+from MySecondaryStructure.Structures import Superpose
+
+# Names of the tables a Protein is made of, in constructor order
+TABLE_NAMES = ("atom_df", "helix_df", "sheet_df", "ssbond_df", "conect_df", "het_df", 
+               "hetnam_df", "hetsyn_df", "formul_df", "link_df", "cispep_df", "seqres_df")
+
+# Columns of 'atom_df' holding the atom coordinates
+COORDINATE_COLUMNS = ["X orthogonal Coordinate", "Y orthogonal Coordinate", "Z orthogonal Coordinate"]
+
+def _table_property(table_name: str) -> property:
+    """
+    About
+    ---------------
+    Makes a property that builds a Protein table the first time it is read 
+    and keeps the result.
+    
+    Parameters
+    ---------------
+    table_name : str
+        One of 'TABLE_NAMES'
+    
+    Returns
+    ---------------
+    property
+        Property for the table
+    """
+    
+    def get_table(self) -> pd.DataFrame:
+        table = self._tables[table_name]
+        if callable(table):
+            table = table()
+            if self._compact:
+                table = compact_table(table)
+            self._tables[table_name] = table
+        
+        return table
+    
+    def set_table(self, table: pd.DataFrame):
+        if self._compact:
+            table = compact_table(table)
+        self._tables[table_name] = table
+        self._cache.clear()
+    
+    return property(get_table, set_table)
+
+def compact_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    Shrinks a table. Text columns become categoricals, so every distinct 
+    value is stored once and the rows hold small integer codes, and 64-bit 
+    integers and floats are narrowed to 32 bits when the values fit.
+    
+    Parameters
+    ---------------
+    df : pd.DataFrame
+        A Protein table
+    
+    Returns
+    ---------------
+    pd.DataFrame
+        The same table with compact column types
+    """
+    
+    columns = dict()
+    for col_name in df.columns:
+        column = df[col_name]
+        kind = column.dtype.kind
+        
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            pass
+        elif kind in "OU" or pd.api.types.is_string_dtype(column.dtype):
+            column = column.astype("category")
+        elif kind == "i" and column.dtype.itemsize > 4:
+            info = np.iinfo(np.int32)
+            if len(column) == 0 or (column.min() >= info.min and column.max() <= info.max):
+                column = column.astype(np.int32 if isinstance(column.dtype, np.dtype) else "Int32")
+        elif kind == "f" and column.dtype.itemsize > 4:
+            column = column.astype(np.float32)
+        
+        columns[col_name] = column
+    
+    return pd.DataFrame(columns, index=df.index, copy=False)
 
 class Protein():
     """
     About
     ---------------
     This class contains all relevant data gathered from a PDB file.
+    
+    Every table can be given either as a dataframe or as a function without 
+    arguments that builds it. Builders are only called the first time the 
+    table is read, and the counts derived from the tables are worked out the 
+    same way, so the cost of a Protein follows what is actually used.
+    
+    With 'compact' set every table is passed through 'compact_table' as it 
+    is built, which stores text as categoricals and numbers in 32 bits.
     """
+    __slots__ = ("_tables", "_cache", "_compact", "name", "num_models", "_chain_ids", "_num_atoms")
+    
     def __init__(self, atom_df: pd.DataFrame, helix_df: pd.DataFrame, sheet_df: pd.DataFrame, ssbond_df: pd.DataFrame, 
                    conect_df: pd.DataFrame, het_df: pd.DataFrame, hetnam_df: pd.DataFrame, hetsyn_df: pd.DataFrame, 
                    formul_df: pd.DataFrame, link_df: pd.DataFrame, cispep_df: pd.DataFrame, seqres_df: pd.DataFrame,
-                   name: str):
-        self.atom_df = atom_df
-        self.helix_df = helix_df
-        self.sheet_df = sheet_df
-        self.ssbond_df = ssbond_df
-        self.conect_df = conect_df
-        self.het_df = het_df
-        self.hetnam_df = hetnam_df
-        self.hetsyn_df = hetsyn_df
-        self.formul_df = formul_df
-        self.link_df = link_df
-        self.cispep_df = cispep_df
-        self.seqres_df = seqres_df
+                   name: str, chain_ids: list = None, num_atoms: int = None, num_models: int = 1, 
+                   compact: bool = False):
+        self._tables = dict(zip(TABLE_NAMES, (atom_df, helix_df, sheet_df, ssbond_df, 
+                                              conect_df, het_df, hetnam_df, hetsyn_df, 
+                                              formul_df, link_df, cispep_df, seqres_df)))
+        # Values derived from the tables, filled in as they are asked for
+        self._cache = dict()
+        self._compact = False
         self.name = name
+        # Number of models in the file, 'atom_df' only holds the first one. 
+        # None when reading stopped before the coordinates.
+        self.num_models = num_models
+        
+        # Chain IDs and the atom count can be handed over by the parser when 
+        # the coordinate records were counted instead of parsed
+        self._chain_ids = chain_ids
+        self._num_atoms = num_atoms
+        
+        if compact:
+            self.compact()
+    
+    atom_df = _table_property("atom_df")
+    helix_df = _table_property("helix_df")
+    sheet_df = _table_property("sheet_df")
+    ssbond_df = _table_property("ssbond_df")
+    conect_df = _table_property("conect_df")
+    het_df = _table_property("het_df")
+    hetnam_df = _table_property("hetnam_df")
+    hetsyn_df = _table_property("hetsyn_df")
+    formul_df = _table_property("formul_df")
+    link_df = _table_property("link_df")
+    cispep_df = _table_property("cispep_df")
+    seqres_df = _table_property("seqres_df")
+    
+    def materialized_tables(self) -> list:
+        """
+        About
+        ---------------
+        Lists the tables that have been built so far.
+        
+        Returns
+        ---------------
+        list
+            Names of the tables that are held as dataframes
+        """
+        
+        return [table_name for table_name, table in self._tables.items() if not callable(table)]
+    
+    def compact(self):
+        """
+        About
+        ---------------
+        Switches the protein to compact storage. Tables that are already 
+        built are converted now, and the rest as they are built.
+        """
+        
+        self._compact = True
+        for table_name in self.materialized_tables():
+            self._tables[table_name] = compact_table(self._tables[table_name])
+        self._cache.clear()
+    
+    def memory_report(self) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Measures how much memory every table takes. Tables that have not been 
+        built yet are built first.
         
+        Returns
+        ---------------
+        pd.DataFrame
+            Rows, columns and bytes (including the text held by object and 
+            string columns) of each table, with a 'total' row at the end
+        """
+        
+        rows = list()
+        for table_name in TABLE_NAMES:
+            table = getattr(self, table_name)
+            rows.append({
+                "Table": table_name,
+                "Rows": len(table),
+                "Columns": len(table.columns),
+                "Bytes": int(table.memory_usage(index=True, deep=True).sum()),
+            })
+        
+        report = pd.DataFrame(rows)
+        total = {"Table": "total", "Rows": report["Rows"].sum(), "Columns": report["Columns"].sum(), "Bytes": report["Bytes"].sum()}
+        
+        return pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    
+    @property
+    def chain_ids(self) -> list:
+        if self._chain_ids is None:
+            self._chain_ids = list()
+            if len(self.atom_df) > 0:
+                self._chain_ids = list(self.atom_df["Chain Identifier"].unique())
+        
+        return self._chain_ids
+    
+    @property
+    def num_atoms(self) -> int:
         # Number of atoms in protein residues
-        self.num_atoms = len(self.atom_df.loc[self.atom_df["Record Type"] == "ATOM"]["Atom Serial Number"].unique())
+        if self._num_atoms is None and len(self.atom_df) > 0:
+            self._num_atoms = len(self.atom_df.loc[self.atom_df["Record Type"] == "ATOM"]["Atom Serial Number"].unique())
+        
+        return self._num_atoms
+    
+    @property
+    def uses_assigned_structure(self) -> bool:
+        # Files without HELIX and SHEET records get their secondary structure 
+        # assigned from the backbone coordinates
+        return len(self.helix_df) == 0 and len(self.sheet_df) == 0 and len(self.atom_df) > 0
+    
+    @property
+    def ss_df(self) -> pd.DataFrame:
+        # Secondary structure of every residue assigned from the coordinates
+        if "ss_df" not in self._cache:
+            self._cache["ss_df"] = DSSP.assign(self.atom_df)
+        
+        return self._cache["ss_df"]
+    
+    @property
+    def dihedral_df(self) -> pd.DataFrame:
+        # Phi, psi and omega angles and Ramachandran region of every residue
+        if "dihedral_df" not in self._cache:
+            self._cache["dihedral_df"] = Geometry.backbone_dihedrals(self.atom_df)
+        
+        return self._cache["dihedral_df"]
+    
+    @property
+    def estimated_ss_df(self) -> pd.DataFrame:
+        # Secondary structure of every residue estimated from its dihedrals
+        if "estimated_ss_df" not in self._cache:
+            self._cache["estimated_ss_df"] = Geometry.estimate_structure(self.dihedral_df)
+        
+        return self._cache["estimated_ss_df"]
+    
+    @property
+    def sasa_df(self) -> pd.DataFrame:
+        # Solvent accessible surface area of every atom
+        if "sasa_df" not in self._cache:
+            self._cache["sasa_df"] = SASA.atom_sasa(self.atom_df)
+        
+        return self._cache["sasa_df"]
+    
+    @property
+    def residue_sasa_df(self) -> pd.DataFrame:
+        # Solvent accessible surface area of every residue
+        if "residue_sasa_df" not in self._cache:
+            self._cache["residue_sasa_df"] = SASA.residue_sasa(self.sasa_df)
+        
+        return self._cache["residue_sasa_df"]
+    
+    @property
+    def spatial_index(self) -> Spatial.CellIndex:
+        # Cell list over the atom coordinates, rows in the order of 'atom_df'
+        if "spatial_index" not in self._cache:
+            coords = np.empty((0, 3), dtype=np.float32)
+            if len(self.atom_df) > 0:
+                coords = self.atom_df[COORDINATE_COLUMNS].to_numpy(dtype=np.float32)
+            self._cache["spatial_index"] = Spatial.CellIndex(coords)
+        
+        return self._cache["spatial_index"]
+    
+    def atoms_within(self, point, radius: float) -> np.ndarray:
+        """
+        About
+        ---------------
+        Finds the atoms closer than 'radius' to a point.
+        
+        Parameters
+        ---------------
+        point : array-like
+            The x, y and z coordinate of the point
+        radius : float
+            The distance cutoff in angstroms
+        
+        Returns
+        ---------------
+        np.ndarray
+            Serial numbers of the atoms, closest first
+        """
+        
+        return self._atom_serials(self.spatial_index.within(point, radius))
+    
+    def nearest_atoms(self, point, k: int) -> np.ndarray:
+        """
+        About
+        ---------------
+        Finds the 'k' atoms closest to a point.
+        
+        Parameters
+        ---------------
+        point : array-like
+            The x, y and z coordinate of the point
+        k : int
+            Number of atoms to find
+        
+        Returns
+        ---------------
+        np.ndarray
+            Serial numbers of the atoms, closest first
+        """
+        
+        return self._atom_serials(self.spatial_index.nearest(point, k))
+    
+    def atom_pairs_within(self, cutoff: float):
+        """
+        About
+        ---------------
+        Finds every pair of atoms closer than 'cutoff'.
+        
+        Parameters
+        ---------------
+        cutoff : float
+            The distance cutoff in angstroms
+        
+        Returns
+        ---------------
+        np.ndarray
+            Serial number of the first atom of each pair
+        np.ndarray
+            Serial number of the second atom of each pair
+        """
+        
+        first, second = self.spatial_index.pairs(cutoff)
+        
+        return self._atom_serials(first), self._atom_serials(second)
+    
+    def _atom_serials(self, rows: np.ndarray) -> np.ndarray:
+        # Serial numbers of rows of 'atom_df'
+        if len(self.atom_df) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        return self.atom_df["Atom Serial Number"].to_numpy()[rows]
+    
+    @property
+    def bond_graph(self) -> Bonds.BondGraph:
+        # Bonds listed in the CONECT, LINK and SSBOND records
+        if "bond_graph" not in self._cache:
+            self._cache["bond_graph"] = Bonds.build_graph(self.atom_df, self.conect_df, self.link_df, self.ssbond_df)
+        
+        return self._cache["bond_graph"]
+    
+    @property
+    def inferred_bond_graph(self) -> Bonds.BondGraph:
+        # Bonds listed in the records and bonds inferred from distances
+        if "inferred_bond_graph" not in self._cache:
+            self._cache["inferred_bond_graph"] = Bonds.build_graph(self.atom_df, self.conect_df, self.link_df, 
+                                                                   self.ssbond_df, infer=True)
+        
+        return self._cache["inferred_bond_graph"]
+    
+    def get_ligands(self, infer: bool = False) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Finds the ligands, the groups of HETATM atoms (other than water) that 
+        are connected by bonds. The atoms of one residue are always kept 
+        together, so a ligand without CONECT records is still one group, and 
+        residues bonded to each other (such as the sugars of a glycan) are one 
+        ligand.
+        
+        Parameters
+        ---------------
+        infer : bool
+            Also use bonds inferred from distances (see 'Bonds.infer_bonds')
+        
+        Returns
+        ---------------
+        pd.DataFrame
+            One row per ligand with the chain identifier and residue sequence 
+            number of its first atom, its residue names joined by '-', its 
+            number of residues and atoms, and whether it is bonded to a 
+            protein residue ('Bonded to Polymer')
+        """
+        
+        columns = ["Chain Identifier", "Residue Sequence Number", "Residue Names", "Number of Residues", 
+                   "Number of Atoms", "Bonded to Polymer"]
+        
+        atom_df = self.atom_df
+        if len(atom_df) == 0:
+            return pd.DataFrame(columns=columns)
+        
+        graph = self.inferred_bond_graph if infer else self.bond_graph
+        residue_names = atom_df["Residue Name"].astype(str).to_numpy()
+        hetero = (atom_df["Record Type"].astype(str).to_numpy() == "HETATM") & ~np.isin(residue_names, Bonds.WATER_NAMES)
+        if not hetero.any():
+            return pd.DataFrame(columns=columns)
+        
+        first, second, _ = graph.bonds()
+        
+        # Every atom is also joined to the first atom of its residue
+        key_columns = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues"]
+        residue_ids = atom_df.groupby(key_columns, sort=False, observed=True).ngroup().to_numpy()
+        residue_first_atoms = np.unique(residue_ids, return_index=True)[1]
+        rows = np.arange(len(atom_df))
+        
+        keep = hetero[first] & hetero[second]
+        ligand_ids = Bonds.connected_components(len(atom_df), np.concatenate([first[keep], rows[hetero]]), 
+                                                np.concatenate([second[keep], residue_first_atoms[residue_ids[hetero]]]))
+        
+        # Ligands with a bond to a protein atom
+        to_polymer = np.zeros(len(atom_df), dtype=bool)
+        crossing = hetero[first] != hetero[second]
+        to_polymer[ligand_ids[np.where(hetero[first], first, second)[crossing]]] = True
+        
+        hetero_rows = np.flatnonzero(hetero)
+        ligand_atoms = pd.DataFrame({
+            "ligand": ligand_ids[hetero_rows],
+            "residue": residue_ids[hetero_rows],
+            "Chain Identifier": atom_df["Chain Identifier"].astype(str).to_numpy()[hetero_rows],
+            "Residue Sequence Number": atom_df["Residue Sequence Number"].to_numpy()[hetero_rows],
+            "Residue Name": residue_names[hetero_rows],
+        })
+        
+        residues = ligand_atoms.drop_duplicates("residue")
+        grouped = ligand_atoms.groupby("ligand", sort=True)
+        ligands_df = grouped[["Chain Identifier", "Residue Sequence Number"]].first()
+        ligands_df["Residue Names"] = residues.groupby("ligand", sort=True)["Residue Name"].agg("-".join)
+        ligands_df["Number of Residues"] = residues.groupby("ligand", sort=True).size()
+        ligands_df["Number of Atoms"] = grouped.size()
+        ligands_df["Bonded to Polymer"] = to_polymer[ligands_df.index.to_numpy()]
+        
+        return ligands_df.reset_index(drop=True)[columns]
+    
+    def get_disulfides(self, infer: bool = False) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Lists the disulfide bonds, the bonds between two SG atoms.
+        
+        Parameters
+        ---------------
+        infer : bool
+            Also use bonds inferred from distances, which finds disulfides 
+            that have no SSBOND record
+        
+        Returns
+        ---------------
+        pd.DataFrame
+            One row per disulfide with the chain identifier, residue sequence 
+            number, insertion code and atom serial number of both cysteines, 
+            the bond length and whether an SSBOND record lists it
+        """
+        
+        key_columns = ["Chain Identifier", "Residue Sequence Number", "Code for Insertions of Residues", "Atom Serial Number"]
+        graph = self.inferred_bond_graph if infer else self.bond_graph
+        first, second, kinds = graph.bonds()
+        
+        atom_df = self.atom_df
+        if len(first) > 0:
+            names = atom_df["Atom Name"].astype(str).to_numpy()
+            sulfur = (names[first] == "SG") & (names[second] == "SG")
+            first, second, kinds = first[sulfur], second[sulfur], kinds[sulfur]
+        
+        disulfide_df = pd.DataFrame({f"1st {c}": atom_df[c].to_numpy()[first] if len(atom_df) > 0 else [] for c in key_columns})
+        for c in key_columns:
+            disulfide_df[f"2nd {c}"] = atom_df[c].to_numpy()[second] if len(atom_df) > 0 else []
+        
+        coords = np.empty((0, 3), dtype=np.float32)
+        if len(atom_df) > 0:
+            coords = atom_df[COORDINATE_COLUMNS].to_numpy(dtype=np.float32)
+        disulfide_df["Length of Disulfide Bond"] = np.linalg.norm(coords[first] - coords[second], axis=1)
+        disulfide_df["SSBOND Record"] = (kinds & Bonds.SSBOND_BOND) != 0
+        
+        return disulfide_df
+    
+    def get_contacts(self, selection: str = "CA", cutoff: float = None) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Finds the residue contact map of the protein as a list of the residue 
+        pairs that are in contact (see 'Contacts.residue_contacts'). The 
+        contacts between two chains are the rows with those chains as the 
+        1st and 2nd chain identifier.
+        
+        Parameters
+        ---------------
+        selection : str
+            Atoms to measure between, 'CA', 'CB' or 'heavy'
+        cutoff : float
+            Distance cutoff in angstroms, 8 for 'CA' and 'CB' and 4.5 for 
+            'heavy' if None
+        
+        Returns
+        ---------------
+        pd.DataFrame
+            One row per pair of residues in contact
+        """
+        
+        return Contacts.residue_contacts(self.atom_df, selection, cutoff)
+    
+    def get_interfaces(self, selection: str = "heavy", cutoff: float = None) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Finds the residues at the interface between every pair of chains.
+        
+        Parameters
+        ---------------
+        selection : str
+            Atoms to measure between, 'CA', 'CB' or 'heavy'
+        cutoff : float
+            Distance cutoff in angstroms, as in 'get_contacts'
+        
+        Returns
+        ---------------
+        pd.DataFrame
+            One row per residue and partner chain (see 'Contacts.interface_residues')
+        """
+        
+        return Contacts.interface_residues(self.get_contacts(selection, cutoff))
+    
+    @property
+    def num_helices(self) -> int:
         # Number of alpha helices
-        self.num_helices = 0
-        if len(self.helix_df) > 0:
-            self.num_helices = len(self.helix_df["Helix Identifier"].unique())
+        if "num_helices" not in self._cache:
+            num_helices = 0
+            if self.uses_assigned_structure:
+                num_helices = len(DSSP.segments(self.ss_df, DSSP.HELIX))
+            elif len(self.helix_df) > 0:
+                num_helices = len(self.helix_df["Helix Identifier"].unique())
+            self._cache["num_helices"] = num_helices
+        
+        return self._cache["num_helices"]
+    
+    @property
+    def num_sheets(self) -> int:
         # Number of Beta sheets
-        self.num_sheets = 0
-        if len(self.sheet_df) > 0:
-            # Adds togehter the number of sheets found in each chain that have a unique starting residue number
-            for c in self.sheet_df["1st Chain Identifier"].unique():
-                self.num_sheets += len(self.sheet_df.loc[self.sheet_df["1st Chain Identifier"] == c]["1st Residue Sequence Number"].unique())
+        if "num_sheets" not in self._cache:
+            num_sheets = 0
+            if self.uses_assigned_structure:
+                num_sheets = len(DSSP.segments(self.ss_df, DSSP.STRAND))
+            elif len(self.sheet_df) > 0:
+                # Adds togehter the number of sheets found in each chain that have a unique starting residue number
+                for c in self.sheet_df["1st Chain Identifier"].unique():
+                    num_sheets += len(self.sheet_df.loc[self.sheet_df["1st Chain Identifier"] == c]["1st Residue Sequence Number"].unique())
+            self._cache["num_sheets"] = num_sheets
+        
+        return self._cache["num_sheets"]
+    
+    @property
+    def chain_lengths(self) -> dict:
+        # Number of residues in each chain according to the SEQRES records
+        if "chain_lengths" not in self._cache:
+            chain_lengths = dict()
+            if len(self.seqres_df) > 0:
+                first_rows = self.seqres_df.drop_duplicates("Chain Identifier")
+                chain_lengths = dict(zip(first_rows["Chain Identifier"], first_rows["Number of Residuals"].astype(int)))
+            self._cache["chain_lengths"] = chain_lengths
+        
+        return self._cache["chain_lengths"]
+    
+    @property
+    def loops_df(self) -> pd.DataFrame:
+        # Residue ranges of every loop
+        if "loops_df" not in self._cache:
+            self._cache["loops_df"] = self.get_loops()
+        
+        return self._cache["loops_df"]
+    
+    @property
+    def num_loops(self) -> int:
         # Number of loops
-        self.num_loops, self.chain_loops = self.get_loops()
-        
-        # ---------------------------------------------------------------------
-    
-    def get_loops(self):
-        num_loops = 0
-        chain_loops = list()
-        
-        # This list contains all of the chains in the protein that has the 
-        # largest number of protein secondary structures
-        highest_chain = list()
-        highest_chain_df = pd.DataFrame()
-        lowest_chain = list()
-        lowest_chain_df = pd.DataFrame()
-        
-        helix_chains = list()
-        sheet_chains = list()
-        
-        # If there are alpha helicies in the protein
-        if len(self.helix_df) > 0:
-            helix_chains = list(self.helix_df["1st Chain Identifier"].unique())
-            highest_chain = helix_chains
-            highest_chain_df = self.helix_df
-        # If there are beta sheets in the protein
-        if len(self.sheet_df) > 0:
-            sheet_chains = list(self.sheet_df["1st Chain Identifier"].unique())
-            lowest_chain = sheet_chains
-            lowest_chain_df = self.sheet_df
-        
-        # If there are more beta sheets than alpha helicies
-        # Switch around highest and lowest chain lists and data frames
-        if len(helix_chains) < len(sheet_chains):
-            highest_chain = sheet_chains
-            highest_chain_df = self.sheet_df
-            lowest_chain = helix_chains
-            lowest_chain_df = self.helix_df
-
-        # Loops through all the protein chains that contain secondary structures (that are not just loops)
-        for c in highest_chain:
-            num_chain_loops = 0
-            
-            # Start and end positions of secondary structures (alpha helicies and beta sheets)
-            highest_chain_secondary_structure_landmarks = list()
-            lowest_chain_secondary_structure_landmarks = list()
-            secondary_structure_landmarks = list()
-            
-            structure_start = highest_chain_df.loc[highest_chain_df["1st Chain Identifier"] == c]["1st Residue Sequence Number"].to_list()
-            structure_end = highest_chain_df.loc[highest_chain_df["1st Chain Identifier"] == c]["2nd Residue Sequence Number"].to_list()
-            
-            # A list of the start and end positions of a secondary structure with 
-            highest_chain_secondary_structure_landmarks = sorted(list(set(structure_start + structure_end)))
-
-            if c in lowest_chain:
-                structure_start = lowest_chain_df.loc[lowest_chain_df["1st Chain Identifier"] == c]["1st Residue Sequence Number"].to_list()
-                structure_end = lowest_chain_df.loc[lowest_chain_df["1st Chain Identifier"] == c]["2nd Residue Sequence Number"].to_list()
-                
-                lowest_chain_secondary_structure_landmarks = sorted(list(set(structure_start + structure_end)))
-            
-            secondary_structure_landmarks = sorted(list(set(highest_chain_secondary_structure_landmarks + lowest_chain_secondary_structure_landmarks)))
-            
-            total_chain_amino_acids = self.seqres_df.loc[self.seqres_df["Chain Identifier"] == c]["Number of Residuals"].unique()[0]
-            
-            if len(secondary_structure_landmarks) > 0:
-                if secondary_structure_landmarks[0] > 0:
-                    num_chain_loops += 1
-                if secondary_structure_landmarks[-1] < total_chain_amino_acids:
-                    num_chain_loops += 1
-                
-                """    
-                for i in range(0, len(secondary_structure_landmarks), 2):
-                    print(f"{c}\t{secondary_structure_landmarks[i]}\t-->\t{secondary_structure_landmarks[i + 1]}")
-                
-                """    
-                for i in range(1, len(secondary_structure_landmarks)-1, 2):
-                    if secondary_structure_landmarks[i] != secondary_structure_landmarks[i+1]-1:
-                        num_chain_loops += 1
+        return len(self.loops_df)
+    
+    @property
+    def chain_loops(self) -> dict:
+        # Number of loops in each chain
+        if "chain_loops" not in self._cache:
+            chains = list(self.chain_lengths)
+            for c in self.loops_df["Chain Identifier"].unique():
+                if c not in self.chain_lengths:
+                    chains.append(c)
             
-            chain_loops.append(num_chain_loops)
+            counts = self.loops_df.groupby("Chain Identifier").size()
+            self._cache["chain_loops"] = {c: int(counts.get(c, 0)) for c in chains}
+        
+        return self._cache["chain_loops"]
+    
+    @property
+    def chain_helices(self) -> dict:
+        # Number of alpha helices in each chain
+        if "chain_helices" not in self._cache:
+            if self.uses_assigned_structure:
+                helix_df = DSSP.segments(self.ss_df, DSSP.HELIX)
+                counts = helix_df.groupby("1st Chain Identifier").size()
+            elif len(self.helix_df) > 0:
+                counts = self.helix_df.groupby("1st Chain Identifier")["Helix Identifier"].nunique()
+            else:
+                counts = pd.Series(dtype=np.int64)
+            self._cache["chain_helices"] = self._per_chain(counts)
+        
+        return self._cache["chain_helices"]
+    
+    @property
+    def chain_sheets(self) -> dict:
+        # Number of beta sheets in each chain
+        if "chain_sheets" not in self._cache:
+            if self.uses_assigned_structure:
+                sheet_df = DSSP.segments(self.ss_df, DSSP.STRAND)
+                counts = sheet_df.groupby("1st Chain Identifier").size()
+            elif len(self.sheet_df) > 0:
+                counts = self.sheet_df.groupby("1st Chain Identifier")["1st Residue Sequence Number"].nunique()
+            else:
+                counts = pd.Series(dtype=np.int64)
+            self._cache["chain_sheets"] = self._per_chain(counts)
+        
+        return self._cache["chain_sheets"]
+    
+    def _per_chain(self, counts: pd.Series) -> dict:
+        # Counts keyed by chain, every SEQRES chain first (with 0 if missing)
+        chains = list(self.chain_lengths)
+        for c in counts.index:
+            if c not in self.chain_lengths:
+                chains.append(c)
+        
+        return {c: int(counts.get(c, 0)) for c in chains}
+    
+    def get_loops(self) -> pd.DataFrame:
+        """
+        About
+        ---------------
+        Finds the loops of every chain. Helix and strand intervals (from the 
+        HELIX and SHEET records, or assigned from the coordinates if there are 
+        none) are merged per chain in one sorted pass, and each residue range 
+        left uncovered between residue 1 and the chain length from SEQRES is a 
+        loop. A chain without secondary structure is a single loop. Without SEQRES records 
+        the chains come from the atoms and their lengths are unknown, so they 
+        have no loop after their last structure.
+        
+        Returns
+        ---------------
+        pd.DataFrame
+            One row per loop with its chain identifier, first and last residue 
+            sequence number and length, sorted by chain and first residue
+        """
+        
+        interval_chains = list()
+        interval_starts = list()
+        interval_ends = list()
+        
+        structure_dfs = (self.helix_df, self.sheet_df)
+        if self.uses_assigned_structure:
+            structure_dfs = (DSSP.segments(self.ss_df, DSSP.HELIX), DSSP.segments(self.ss_df, DSSP.STRAND))
+        
+        for df in structure_dfs:
+            if len(df) > 0:
+                interval_chains.append(df["1st Chain Identifier"].to_numpy(dtype=str))
+                interval_starts.append(df["1st Residue Sequence Number"].to_numpy(dtype=np.int64))
+                interval_ends.append(df["2nd Residue Sequence Number"].to_numpy(dtype=np.int64))
+        
+        if len(interval_chains) > 0:
+            segments = Segments.merge_intervals(np.concatenate(interval_chains), 
+                                                np.concatenate(interval_starts), 
+                                                np.concatenate(interval_ends))
+        else:
+            segments = Segments.merge_intervals([], [], [])
+        
+        chain_lengths = self.chain_lengths
+        if len(chain_lengths) == 0:
+            # Chains from the atoms only get a loop if they have no structure
+            segment_chains = set(segments[0])
+            chain_lengths = {c: None for c in self.chain_ids if c not in segment_chains}
+        
+        known_lengths = {c: n for c, n in chain_lengths.items() if n is not None}
+        loop_chains, loop_starts, loop_ends = Segments.find_loops(*segments, known_lengths)
+        
+        loops_df = pd.DataFrame({
+            "Chain Identifier": loop_chains,
+            "Loop Start": pd.array(loop_starts, dtype="Int64"),
+            "Loop End": pd.array(loop_ends, dtype="Int64"),
+        })
+        
+        unknown_chains = [c for c, n in chain_lengths.items() if n is None]
+        if len(unknown_chains) > 0:
+            unknown_df = pd.DataFrame({
+                "Chain Identifier": unknown_chains,
+                "Loop Start": pd.array([1] * len(unknown_chains), dtype="Int64"),
+                "Loop End": pd.array([None] * len(unknown_chains), dtype="Int64"),
+            })
+            loops_df = pd.concat([loops_df, unknown_df], ignore_index=True)
+            loops_df = loops_df.sort_values(["Chain Identifier", "Loop Start"], ignore_index=True)
+        
+        loops_df["Loop Length"] = loops_df["Loop End"] - loops_df["Loop Start"] + 1
+        
+        return loops_df
+    
+    def rmsd_to(self, other: Protein, atom_names: list = ("CA",)) -> float:
+        """
+        About
+        ---------------
+        Works out the RMSD to another protein after superposing the atoms both 
+        have (see 'Superpose.match_atoms').
+        
+        Parameters
+        ---------------
+        other : Protein
+            The protein to compare with
+        atom_names : list
+            Names of the atoms to use, every atom if None
+        
+        Returns
+        ---------------
+        float
+            The RMSD in angstroms, NaN if the proteins have no atoms in common
+        """
         
-        # If there are beta sheets of alpha helicies then each chain is comprised of one loop
-        if len(self.sheet_df) == 0 or len(self.helix_df) == 0:
-            for c in self.atom_df["Chain Identifier"].unique():
-                chain_loops.append(1)
+        _, coords = Superpose.match_atoms([self.atom_df, other.atom_df], atom_names)
+        if coords.shape[1] == 0:
+            return float("nan")
         
-        num_loops = sum(chain_loops)
-        return num_loops, chain_loops
+        return float(Superpose.rmsd_to_reference(coords, 1)[0])
     
-    def cmd_about(self):
-        total_num_secondary_structures = self.num_loops + self.num_helices + self.num_sheets
+    def summary(self, sasa: bool = False) -> dict:
+        """
+        About
+        ---------------
+        Collects the numbers 'cmd_about' prints into plain Python values, 
+        small enough to be sent between processes.
+        
+        Parameters
+        ---------------
+        sasa : bool
+            Also give the solvent accessible surface area, which needs the 
+            coordinates
+        
+        Returns
+        ---------------
+        dict
+            Protein name, amino acid and chain totals, and the number of 
+            loops, alpha helices and beta sheets in total and per chain. With 
+            'sasa' set, also the accessible area in square angstroms in total 
+            ('total_sasa') and per chain ('sasa_per_chain')
+        """
         
-        # Protein name
-        print(f"------------------- {self.name} -------------------")
         # Total number of amino acids
-        amino_acids_per_chain = {}
-        total_amino_acids = 0
-        
-        for c in self.seqres_df["Chain Identifier"].unique():
-            chain_amino_acids = self.seqres_df.loc[self.seqres_df["Chain Identifier"] == c]["Number of Residuals"].unique()[0]
-            amino_acids_per_chain[c] = chain_amino_acids
-            total_amino_acids += chain_amino_acids
-        
-        data = {
-            "Count": [self.num_loops, self.num_helices, self.num_sheets],
-            "% of Structures": [round((self.num_loops/total_num_secondary_structures) * 100, 2), 
-                                          round((self.num_helices/total_num_secondary_structures) * 100, 2),
-                                          round((self.num_sheets/total_num_secondary_structures) * 100, 2)
-                                        ]
-        }
+        amino_acids_per_chain = {c: int(n) for c, n in self.chain_lengths.items()}
+        total_amino_acids = sum(amino_acids_per_chain.values())
         
-        df = pd.DataFrame(data, index=["Loop", "Alpha Helix", "Beta Sheet"])
+        summary = {
+            "name": self.name,
+            "total_amino_acids": total_amino_acids,
+            "num_chains": len(amino_acids_per_chain),
+            "amino_acids_per_chain": amino_acids_per_chain,
+            "num_loops": int(self.num_loops),
+            "loops_per_chain": self.chain_loops,
+            "num_helices": int(self.num_helices),
+            "helices_per_chain": self.chain_helices,
+            "num_sheets": int(self.num_sheets),
+            "sheets_per_chain": self.chain_sheets,
+        }
         
-        print(f"Total amino aicds: {total_amino_acids}")
-        print(f"Number of Chains: {len(self.seqres_df['Chain Identifier'].unique())}\n")
-        print(df,"\n")
+        if sasa:
+            chain_sasa = self.sasa_df.groupby("Chain Identifier", sort=False, observed=True)["SASA"].sum()
+            summary["total_sasa"] = round(float(chain_sasa.sum()), 1)
+            summary["sasa_per_chain"] = {c: round(float(area), 1) for c, area in chain_sasa.items()}
         
-        # All of this info broken down per chain
-        #print(amino_acids_per_chain)
-        
\ No newline at end of file
+        return summary
+    
+    def cmd_about(self, sasa: bool = False):
+        print_about(self.summary(sasa))
+
+def print_about(summary: dict):
+    """
+    About
+    ---------------
+    Prints a protein summary made by 'Protein.summary' to the command line.
+    
+    Parameters
+    ---------------
+    summary : dict
+        A protein summary
+    """
+    
+    num_loops = summary["num_loops"]
+    num_helices = summary["num_helices"]
+    num_sheets = summary["num_sheets"]
+    total_num_secondary_structures = num_loops + num_helices + num_sheets
+    
+    # Protein name
+    print(f"------------------- {summary['name']} -------------------")
+    
+    data = {
+        "Count": [num_loops, num_helices, num_sheets],
+        "% of Structures": [round((num_loops/total_num_secondary_structures) * 100, 2), 
+                                      round((num_helices/total_num_secondary_structures) * 100, 2),
+                                      round((num_sheets/total_num_secondary_structures) * 100, 2)
+                                    ]
+    }
+    
+    df = pd.DataFrame(data, index=["Loop", "Alpha Helix", "Beta Sheet"])
+    
+    print(f"Total amino aicds: {summary['total_amino_acids']}")
+    print(f"Number of Chains: {summary['num_chains']}\n")
+    print(df,"\n")
+    
+    if "total_sasa" in summary:
+        print(f"Solvent accessible surface area: {summary['total_sasa']} A^2")
+        for c, area in summary["sasa_per_chain"].items():
+            print(f"  Chain {c}: {area} A^2")
+        print()
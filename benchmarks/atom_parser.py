@@ -0,0 +1,69 @@
+# Throughput comparison between the per-line dictionary ATOM/HETATM parser 
+# that 'ReadPDB.process_raw' used to run and the columnar 'parse_atom_lines'
+
+# To run: 
+#   python benchmarks/atom_parser.py [file path]
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MySecondaryStructure.PDBparser import ReadPDB
+
+def legacy_parse_atom_lines(atom_lines: list) -> pd.DataFrame:
+    """
+    About
+    ---------------
+    The original parser: one dictionary of stripped slices per line, then a 
+    numeric conversion of the finished dataframe.
+    
+    Parameters
+    ---------------
+    atom_lines : list
+        ATOM and HETATM lines from a PDB file
+        
+    Returns
+    ---------------
+    pd.DataFrame
+        A dataframe with one row per atom
+    """
+    
+    atom_list = []
+    for line in atom_lines:
+        atom_list.append({
+            col_name: line[start:end].strip() for col_name, start, end, _ in ReadPDB.ATOM_COLUMNS
+        })
+    
+    atom_df = pd.DataFrame.from_dict(atom_list)
+    col_types = {col_name: col_type for col_name, _, _, col_type in ReadPDB.ATOM_COLUMNS}
+    
+    return ReadPDB.change_col_type(atom_df, col_types)
+
+def best_time(func, atom_lines: list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(atom_lines)
+        best = min(best, time.perf_counter() - start)
+    
+    return best
+
+def main(pdb_file_path):
+    with open(pdb_file_path, "r") as file:
+        atom_lines = [line for line in file if line[:4] == "ATOM" or line[:6] == "HETATM"]
+    
+    legacy = best_time(legacy_parse_atom_lines, atom_lines)
+    columnar = best_time(ReadPDB.parse_atom_lines, atom_lines)
+    
+    print(f"------------------- {os.path.basename(pdb_file_path)} ({len(atom_lines)} atoms) -------------------")
+    print(f"Per-line dict: {legacy:.3f}s ({len(atom_lines) / legacy:,.0f} atoms/s)")
+    print(f"Columnar:      {columnar:.3f}s ({len(atom_lines) / columnar:,.0f} atoms/s)")
+    print(f"Speedup:       {legacy / columnar:.1f}x\n")
+
+if __name__ == "__main__":
+    for argument in sys.argv[1:]:
+        main(argument)
@@ -0,0 +1,35 @@
+# Memory taken by the Protein tables in the default and the compact storage 
+# mode, table by table
+
+# To run: 
+#   python benchmarks/memory.py [file path]
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MySecondaryStructure.PDBparser import ReadPDB
+
+def main(file_path: str):
+    default_report = ReadPDB.read(file_path).memory_report().set_index("Table")
+    compact_report = ReadPDB.read(file_path, compact=True).memory_report().set_index("Table")
+    
+    report = pd.DataFrame({
+        "Rows": default_report["Rows"],
+        "Default MB": (default_report["Bytes"] / 1e6).round(2),
+        "Compact MB": (compact_report["Bytes"] / 1e6).round(2),
+        "Reduction": (default_report["Bytes"] / compact_report["Bytes"]).round(1),
+    })
+    
+    print(f"File: {file_path}")
+    print(report)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/memory.py [file path]")
+        sys.exit(1)
+    
+    main(sys.argv[1])
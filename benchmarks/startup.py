@@ -0,0 +1,103 @@
+# Cold-start benchmark of the command line. Every run is a new Python
+# process, timed from start to exit. The 'eager' runs import pandas before
+# mss.py starts, the way every run did before pandas was deferred, and the
+# 'lazy' runs start mss.py as it is, so the difference is what deferring
+# pandas saves on each kind of run.
+
+# To run:
+#   python benchmarks/startup.py [--repeat N] [--output FILE] [file path]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+# Folder holding mss.py
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs mss.py after importing pandas, with the arguments that follow
+EAGER_PREFIX = [
+    "-c",
+    "import sys, runpy, pandas; sys.argv = sys.argv[1:]; runpy.run_path('mss.py', run_name='__main__')",
+    "mss.py",
+]
+
+def cases(file_path: str) -> dict:
+    # Command line arguments of every kind of run that is timed
+    return {
+        "invalid_file": ["--no-cache", "--format", "jsonl", file_path + ".missing"],
+        "summary_jsonl": ["--no-cache", "--summary", "--format", "jsonl", file_path],
+        "full_jsonl": ["--no-cache", "--format", "jsonl", file_path],
+        "full_text": ["--no-cache", file_path],
+    }
+
+def time_run(arguments: list, repeat: int) -> dict:
+    """
+    About
+    ---------------
+    Times new Python processes from start to exit.
+    
+    Parameters
+    ---------------
+    arguments : list
+        Arguments of the Python interpreter
+    repeat : int
+        Number of timed runs
+    
+    Returns
+    ---------------
+    dict
+        Best and median time in seconds
+    """
+    
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=REPO_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    
+    return {"seconds": min(times), "median_seconds": float(np.median(times))}
+
+def main(args: argparse.Namespace, file_path: str) -> dict:
+    report = {"python": sys.version.split()[0], "repeat": args.repeat, "file_bytes": os.path.getsize(file_path), "cases": {}}
+    
+    for case_name, case_arguments in cases(os.path.abspath(file_path)).items():
+        eager = time_run(EAGER_PREFIX + case_arguments, args.repeat)
+        lazy = time_run(["mss.py"] + case_arguments, args.repeat)
+        report["cases"][case_name] = {
+            "eager": eager,
+            "lazy": lazy,
+            "saved_seconds": eager["median_seconds"] - lazy["median_seconds"],
+        }
+    
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the cold start of mss.py with and without pandas imported up front")
+    parser.add_argument("file", nargs="?", help="PDB file to read (default: a small synthetic file)")
+    parser.add_argument("--repeat", type=int, default=10, help="number of timed runs of every case (default: 10)")
+    parser.add_argument("--output", help="file to write the JSON report to (default: print it)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = args.file
+        if file_path is None:
+            file_path = synthetic.write(os.path.join(temp_dir, "startup.pdb"), num_atoms=2000)
+        
+        report = json.dumps(main(args, file_path), indent=2)
+    
+    if args.output is None:
+        print(report)
+    else:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
@@ -0,0 +1,229 @@
+# Benchmark suite for the parser and the summary. Synthetic files are made
+# with 'synthetic.py' for every atom count, each stage is timed on them, and
+# the results are printed (or written) as JSON so runs can be compared
+# across commits.
+
+# To run:
+#   python benchmarks/suite.py [--atoms N [N ...]] [--repeat N] [--output FILE] [generator options]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+from MySecondaryStructure.PDBparser import ReadPDB
+from MySecondaryStructure.PDBparser.Cache import ParseCache, is_memory_mapped
+from MySecondaryStructure.Structures.X3D import TABLE_NAMES
+
+def materialize(protein):
+    # Builds every lazy table so a stage pays for the whole parse
+    for table_name in TABLE_NAMES:
+        getattr(protein, table_name)
+    
+    return protein
+
+def stage_read(file_path: str):
+    def setup():
+        return None
+    
+    def run(_):
+        materialize(ReadPDB.read(file_path))
+    
+    return setup, run
+
+def stage_process_raw(file_path: str):
+    with open(file_path, "r") as file:
+        raw = file.read()
+    
+    def setup():
+        return raw
+    
+    def run(raw_PDB):
+        materialize(ReadPDB.process_raw(raw_PDB))
+    
+    return setup, run
+
+def stage_change_col_type(file_path: str):
+    # The atom table as the stripped strings the record parsers start from
+    text_df = ReadPDB.read(file_path).atom_df.astype(str)
+    col_types = {col_name: col_type for col_name, _, _, col_type in ReadPDB.ATOM_COLUMNS}
+    
+    def setup():
+        return text_df.copy()
+    
+    def run(df):
+        ReadPDB.change_col_type(df, col_types)
+    
+    return setup, run
+
+def stage_cache_load(file_path: str):
+    # Warm loads from a parse cache next to the file
+    cache = ParseCache(os.path.join(os.path.dirname(file_path), f"cache_{os.path.basename(file_path)}"))
+    ReadPDB.read(file_path, cache=cache)
+    
+    # Numeric columns of a warm load should be read straight from the cache files
+    atom_df = ReadPDB.read(file_path, cache=cache).atom_df
+    copied = [col_name for col_name in atom_df.columns 
+              if isinstance(atom_df[col_name].dtype, np.dtype) and atom_df[col_name].dtype.kind in "biuf"
+              and not is_memory_mapped(atom_df[col_name])]
+    if len(copied) > 0:
+        raise RuntimeError(f"Columns copied out of the parse cache: {', '.join(copied)}")
+    
+    def setup():
+        return None
+    
+    def run(_):
+        materialize(ReadPDB.read(file_path, cache=cache))
+    
+    return setup, run
+
+def stage_get_loops(file_path: str):
+    protein = materialize(ReadPDB.read(file_path))
+    
+    def setup():
+        protein.chain_lengths
+        return protein
+    
+    def run(protein):
+        protein.get_loops()
+    
+    return setup, run
+
+def stage_cmd_about(file_path: str):
+    protein = materialize(ReadPDB.read(file_path))
+    
+    def setup():
+        # Counts are cached on the protein, so every run starts cold
+        protein._cache.clear()
+        return protein
+    
+    def run(protein):
+        with contextlib.redirect_stdout(io.StringIO()):
+            protein.cmd_about()
+    
+    return setup, run
+
+# Stages in the order they are run
+STAGES = {
+    "read": stage_read,
+    "process_raw": stage_process_raw,
+    "change_col_type": stage_change_col_type,
+    "cache_load": stage_cache_load,
+    "get_loops": stage_get_loops,
+    "cmd_about": stage_cmd_about,
+}
+
+def measure(setup, run, repeat: int) -> dict:
+    """
+    About
+    ---------------
+    Times a stage and measures its peak memory. The time is the best of
+    'repeat' runs, and the peak memory (allocations traced by 'tracemalloc',
+    which include numpy and pandas buffers) comes from one more run, so
+    tracing does not slow down the timed runs.
+    
+    Parameters
+    ---------------
+    setup : callable
+        Makes the input of a run, not timed
+    run : callable
+        The work that is measured
+    repeat : int
+        Number of timed runs
+    
+    Returns
+    ---------------
+    dict
+        Best and median time in seconds and peak memory in bytes
+    """
+    
+    times = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        times.append(time.perf_counter() - start)
+    
+    argument = setup()
+    tracemalloc.start()
+    run(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {"seconds": min(times), "median_seconds": float(np.median(times)), "peak_bytes": peak}
+
+def git_commit() -> str:
+    # Commit the suite is run from, None outside a git checkout
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(args: argparse.Namespace) -> dict:
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "runs": [],
+    }
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for num_atoms in args.atoms:
+            parameters = synthetic.parameters_from_args(args, num_atoms)
+            file_path = synthetic.write(os.path.join(temp_dir, f"synthetic_{num_atoms}.pdb"), **parameters)
+            
+            protein = ReadPDB.read(file_path)
+            run_report = {
+                "parameters": parameters,
+                "file_bytes": os.path.getsize(file_path),
+                "atoms": len(protein.atom_df),
+                "helices": len(protein.helix_df),
+                "strands": len(protein.sheet_df),
+                "conect_records": len(protein.conect_df),
+                "stages": {},
+            }
+            
+            for stage_name, stage in STAGES.items():
+                result = measure(*stage(file_path), args.repeat)
+                result["atoms_per_second"] = run_report["atoms"] / result["seconds"]
+                result["files_per_second"] = 1 / result["seconds"]
+                run_report["stages"][stage_name] = result
+            
+            report["runs"].append(run_report)
+    
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the parser and the summary on synthetic PDB files")
+    parser.add_argument("--atoms", type=int, nargs="+", default=[10000, 100000],
+                        help="atom counts of the synthetic files (default: 10000 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of every stage (default: 3)")
+    parser.add_argument("--output", help="file to write the JSON report to (default: print it)")
+    synthetic.add_parameter_args(parser)
+    args = parser.parse_args()
+    
+    report = json.dumps(main(args), indent=2)
+    
+    if args.output is None:
+        print(report)
+    else:
+        with open(args.output, "w") as file:
+            file.write(report + "\n")
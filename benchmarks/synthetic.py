@@ -0,0 +1,199 @@
+# Deterministic generator of synthetic PDB files for the benchmarks. The same
+# parameters and seed always give the same file.
+
+# To run:
+#   python benchmarks/synthetic.py [--atoms N] [--chains N] [--helix-density F] [--sheet-density F]
+#                                  [--hetatm-fraction F] [--conect-fraction F] [--seed N] [file path]
+
+import argparse
+
+import numpy as np
+
+# Chain identifiers in the order they are handed out
+CHAIN_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# Backbone and side chain start of every generated residue (name, element)
+RESIDUE_ATOMS = (("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C"))
+
+# Residue names drawn for the sequences
+RESIDUE_NAMES = ("ALA", "ARG", "ASN", "ASP", "CYS", "GLN", "GLU", "GLY", "HIS", "ILE",
+                 "LEU", "LYS", "MET", "PHE", "PRO", "SER", "THR", "TRP", "TYR", "VAL")
+
+# Lengths of the generated helices and strands (lowest, highest)
+HELIX_LENGTHS = (6, 16)
+STRAND_LENGTHS = (4, 10)
+
+def generate(num_atoms: int = 10000, num_chains: int = 4, helix_density: float = 0.3, sheet_density: float = 0.2,
+             hetatm_fraction: float = 0.05, conect_fraction: float = 0.5, seed: int = 0) -> str:
+    """
+    About
+    ---------------
+    Makes the text of a synthetic PDB file. Protein atoms are spread evenly
+    over the chains, five atoms to a residue, and helices and strands are
+    laid over each chain so that about 'helix_density' and 'sheet_density'
+    of the residues are covered. The rest of the atoms are HETATM ligand
+    atoms, and 'conect_fraction' of them get a CONECT record.
+    
+    Parameters
+    ---------------
+    num_atoms : int
+        Total number of ATOM and HETATM records
+    num_chains : int
+        Number of protein chains (at most 62)
+    helix_density : float
+        Fraction of residues to cover with HELIX records
+    sheet_density : float
+        Fraction of residues to cover with SHEET records
+    hetatm_fraction : float
+        Fraction of the atoms that are HETATM records
+    conect_fraction : float
+        Fraction of the HETATM atoms that get a CONECT record
+    seed : int
+        Seed of the random number generator
+    
+    Returns
+    ---------------
+    str
+        The PDB file
+    """
+    
+    rng = np.random.default_rng(seed)
+    num_chains = max(1, min(num_chains, len(CHAIN_IDS)))
+    
+    num_hetatms = int(round(num_atoms * hetatm_fraction))
+    residues_per_chain = max(1, (num_atoms - num_hetatms) // len(RESIDUE_ATOMS) // num_chains)
+    chains = CHAIN_IDS[:num_chains]
+    
+    lines = ["HEADER    SYNTHETIC                               01-JAN-00   SYNT              "]
+    
+    sequences = {c: rng.choice(RESIDUE_NAMES, residues_per_chain) for c in chains}
+    
+    # Secondary structure
+    helix_lines = []
+    sheet_lines = []
+    for c in chains:
+        sequence = sequences[c]
+        position = 1
+        while position <= residues_per_chain:
+            draw = rng.random()
+            if draw < helix_density:
+                length = int(rng.integers(*HELIX_LENGTHS))
+                end = min(position + length - 1, residues_per_chain)
+                serial = len(helix_lines) + 1
+                helix_lines.append(
+                    f"HELIX  {serial % 1000:>3} {serial % 1000:>3} {sequence[position - 1]:>3} {c} {position:>4}  "
+                    f"{sequence[end - 1]:>3} {c} {end:>4}  1{'':30} {end - position + 1:>5}    "
+                )
+                position = end + 1
+            elif draw < helix_density + sheet_density:
+                length = int(rng.integers(*STRAND_LENGTHS))
+                end = min(position + length - 1, residues_per_chain)
+                serial = len(sheet_lines) + 1
+                sheet_lines.append(
+                    f"SHEET  {1:>3} {'S' + str(serial % 100):>3} 1 {sequence[position - 1]:>3} {c}{position:>4}  "
+                    f"{sequence[end - 1]:>3} {c}{end:>4}  0{'':40}"
+                )
+                position = end + 1
+            # A loop residue between segments
+            position += 1
+    
+    lines.extend(helix_lines)
+    lines.extend(sheet_lines)
+    
+    for c in chains:
+        sequence = sequences[c]
+        for i in range(0, residues_per_chain, 13):
+            lines.append(f"SEQRES {i // 13 + 1:>3} {c} {residues_per_chain:>4}  {' '.join(sequence[i:i + 13]):<51}         ")
+    
+    # Coordinates follow a random walk so neighbouring atoms are close
+    num_protein_atoms = residues_per_chain * len(RESIDUE_ATOMS) * num_chains
+    coords = np.cumsum(rng.normal(0, 1.5, (num_protein_atoms + num_hetatms, 3)), axis=0)
+    coords -= coords.mean(axis=0)
+    b_factors = rng.uniform(5, 60, num_protein_atoms + num_hetatms)
+    
+    serial = 0
+    for c in chains:
+        sequence = sequences[c]
+        for r in range(residues_per_chain):
+            for atom_name, element in RESIDUE_ATOMS:
+                x, y, z = coords[serial]
+                lines.append(
+                    f"ATOM  {(serial + 1) % 100000:>5}  {atom_name:<3} {sequence[r]:>3} {c}{(r + 1) % 10000:>4}    "
+                    f"{x:8.3f}{y:8.3f}{z:8.3f}{1.0:6.2f}{b_factors[serial]:6.2f}          {element:>2}  "
+                )
+                serial += 1
+        lines.append(f"TER   {(serial + 1) % 100000:>5}      {sequence[-1]:>3} {c}{residues_per_chain % 10000:>4}")
+    
+    # Ligands of six atoms each
+    hetatm_serials = []
+    for h in range(num_hetatms):
+        x, y, z = coords[serial]
+        lines.append(
+            f"HETATM{(serial + 1) % 100000:>5}  C{h % 6 + 1:<2} LIG X{(h // 6 + 1) % 10000:>4}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}{1.0:6.2f}{b_factors[serial]:6.2f}           C  "
+        )
+        hetatm_serials.append((serial + 1) % 100000)
+        serial += 1
+    
+    # Every connected ligand atom is bonded to the next atom of its ligand
+    for h in np.flatnonzero(rng.random(num_hetatms) < conect_fraction):
+        if h % 6 < 5 and h + 1 < num_hetatms:
+            lines.append(f"CONECT{hetatm_serials[h]:>5}{hetatm_serials[h + 1]:>5}")
+    
+    lines.append("END")
+    
+    return "\n".join(lines) + "\n"
+
+def write(file_path: str, **parameters) -> str:
+    """
+    About
+    ---------------
+    Writes a synthetic PDB file made by 'generate'.
+    
+    Parameters
+    ---------------
+    file_path : str
+        Path to write the file to
+    **parameters
+        Parameters of 'generate'
+    
+    Returns
+    ---------------
+    str
+        'file_path'
+    """
+    
+    with open(file_path, "w") as file:
+        file.write(generate(**parameters))
+    
+    return file_path
+
+def add_parameter_args(parser: argparse.ArgumentParser):
+    # Command line options for the parameters of 'generate'
+    parser.add_argument("--chains", type=int, default=4, help="number of protein chains (default: 4)")
+    parser.add_argument("--helix-density", type=float, default=0.3, help="fraction of residues in helices (default: 0.3)")
+    parser.add_argument("--sheet-density", type=float, default=0.2, help="fraction of residues in strands (default: 0.2)")
+    parser.add_argument("--hetatm-fraction", type=float, default=0.05, help="fraction of HETATM atoms (default: 0.05)")
+    parser.add_argument("--conect-fraction", type=float, default=0.5,
+                        help="fraction of HETATM atoms with a CONECT record (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator (default: 0)")
+
+def parameters_from_args(args: argparse.Namespace, num_atoms: int) -> dict:
+    return {
+        "num_atoms": num_atoms,
+        "num_chains": args.chains,
+        "helix_density": args.helix_density,
+        "sheet_density": args.sheet_density,
+        "hetatm_fraction": args.hetatm_fraction,
+        "conect_fraction": args.conect_fraction,
+        "seed": args.seed,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic PDB file")
+    parser.add_argument("file", help="path to write the file to")
+    parser.add_argument("--atoms", type=int, default=10000, help="number of atoms (default: 10000)")
+    add_parameter_args(parser)
+    args = parser.parse_args()
+    
+    write(args.file, **parameters_from_args(args, args.atoms))
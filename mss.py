@@ -1,14 +1,80 @@
 # Dakota Kosiorek
 
 # To run: 
-#   python mss.py [file path]
+#   python mss.py [--summary] [--jobs N] [--cache-dir DIR] [--manifest FILE] [--format FORMAT] [--profile] [file or directory path]
+#   python mss.py --serve [ADDRESS] [--jobs N] [--cache-dir DIR]
 
 from MySecondaryStructure.Hub import app
-import sys
+from MySecondaryStructure.Hub import Output
+from MySecondaryStructure.Hub.Manifest import Manifest
+from MySecondaryStructure.Hub import Profile
+from MySecondaryStructure.Hub import Server
+from MySecondaryStructure.Hub.Client import DEFAULT_ADDRESS
+from MySecondaryStructure.PDBparser.Cache import ParseCache
+import argparse
+import cProfile
+import os
 
-def main(pdb_file_path):
-    app.run(pdb_file_path)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find protein secondary structure information through PDB files")
+    parser.add_argument("files", nargs="*", 
+                        help="paths to PDB or mmCIF files, or directories to search for them")
+    parser.add_argument("--summary", action="store_true", 
+                        help="only parse the records needed for the summary and skip coordinates where possible")
+    parser.add_argument("-j", "--jobs", type=int, 
+                        help="number of worker processes used to read files (default: 1)")
+    parser.add_argument("--cache-dir", default=os.environ.get("MSS_CACHE_DIR"), 
+                        help="directory of the parse cache (default: $MSS_CACHE_DIR, no cache if unset)")
+    parser.add_argument("--cache-size", type=int, default=1024, 
+                        help="size limit of the parse cache in MB (default: 1024)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read from or write to the parse cache")
+    parser.add_argument("--clear-cache", action="store_true", help="remove every entry from the parse cache first")
+    parser.add_argument("--manifest", 
+                        help="file of the results of the last run, only new or changed files are parsed again")
+    parser.add_argument("--format", choices=Output.FORMATS, default="text", 
+                        help="write a printed table (text) or one JSON Lines or CSV record per file (default: text)")
+    parser.add_argument("--serve", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS", 
+                        help=f"run an analysis server on a socket path or loopback host:port (default: {DEFAULT_ADDRESS}), "
+                             "--jobs sets its worker processes (default: one per CPU)")
+    parser.add_argument("--profile", action="store_true", 
+                        help="time every stage of every file and write a JSON report")
+    parser.add_argument("--profile-output", 
+                        help="file to write the profile report to (default: standard error)")
+    parser.add_argument("--profile-dump", 
+                        help="also write cProfile statistics of this process to a file (run with --jobs 1 to include the parsing)")
+    
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    for argument in sys.argv[1:]:
-        main(argument)
\ No newline at end of file
+    args = parse_args()
+    
+    cache = None
+    if args.cache_dir is not None:
+        cache = ParseCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        if args.clear_cache:
+            cache.clear()
+        if args.no_cache:
+            cache = None
+    
+    if args.serve is not None:
+        Server.serve(args.serve, args.jobs, args.summary, cache)
+        raise SystemExit
+    
+    profiler = None
+    if args.profile_dump is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
+    manifest = None
+    if args.manifest is not None:
+        # Results of summary-only runs are not reused by full runs, and the other way around
+        manifest = Manifest(args.manifest, {"summary": args.summary})
+    
+    report = app.run_batch(app.find_files(args.files), args.jobs or 1, args.summary, cache, args.profile, args.format, manifest)
+    
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile_dump)
+    
+    if report is not None:
+        Profile.write_report(report, args.profile_output)
@@ -0,0 +1,42 @@
+# Thin client of the analysis server started with 'python mss.py --serve'.
+# It does not import the parser or pandas, so it starts as fast as Python
+# does. Every answer is printed as a JSON line in the order of the files.
+
+# To run: 
+#   python mss_client.py [--address ADDRESS] [--summary] [--stdin [--cif]] [file path]
+
+from MySecondaryStructure.Hub import Client
+import argparse
+import json
+import os
+import sys
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarize PDB files on a running mss.py server")
+    parser.add_argument("files", nargs="*", help="paths to PDB or mmCIF files")
+    parser.add_argument("--address", default=os.environ.get("MSS_SERVER", Client.DEFAULT_ADDRESS), 
+                        help=f"server address, a socket path or host:port (default: $MSS_SERVER or {Client.DEFAULT_ADDRESS})")
+    parser.add_argument("--summary", action="store_true", 
+                        help="only parse the records needed for the summary (default: what the server was started with)")
+    parser.add_argument("--stdin", action="store_true", help="send the file read from standard input")
+    parser.add_argument("--cif", action="store_true", help="the file on standard input is an mmCIF file")
+    
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    
+    # The server may run in another directory, so it is sent full paths
+    requests = [{"path": os.path.abspath(path)} for path in args.files]
+    if args.stdin:
+        requests.append({"pdb": sys.stdin.read(), "name": "<stdin>", "format": "cif" if args.cif else "pdb"})
+    
+    # Without --summary the server's own default is used
+    if args.summary:
+        for request in requests:
+            request["summary"] = True
+    
+    names = args.files + ["<stdin>"] * args.stdin
+    for name, answer in zip(names, Client.request(requests, args.address)):
+        answer["path"] = name
+        sys.stdout.write(json.dumps(answer, separators=(",", ":")) + "\n")